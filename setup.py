@@ -13,9 +13,16 @@ setup(
         "opencv-python>=4.5.0",
         "numpy>=1.19.0",
     ],
+    extras_require={
+        # Memory-mapped TIFF inputs and outputs in convert_tiled()
+        "tiff": ["tifffile"],
+    },
     entry_points={
         "console_scripts": [
             "image-to-sketch=cli:main",
+            "image-to-sketch-serve=server:main",
+            "image-to-sketch-video=video:main",
+            "image-to-sketch-sweep=sweep:main",
         ],
     },
     python_requires=">=3.7",
@@ -9,14 +9,34 @@ __version__ = "1.0.0"
 __author__ = "Your Name"
 __email__ = "your.email@example.com"
 
-from .converter import ImageToSketchConverter, convert_image_to_sketch
-from .utils import validate_image, create_output_path, display_images, get_image_info
+import importlib
 
-__all__ = [
-    'ImageToSketchConverter',
-    'convert_image_to_sketch',
-    'validate_image',
-    'create_output_path',
-    'display_images',
-    'get_image_info'
-]
\ No newline at end of file
+# Public names and the submodules defining them. They are imported on first
+# access (PEP 562), so importing the package, the CLI's argument parsing and
+# --help do not pay for loading OpenCV and numpy.
+_EXPORTS = {
+    'ImageToSketchConverter': 'converter',
+    'convert_image_to_sketch': 'converter',
+    'BatchConversionError': 'batch',
+    'ConversionResult': 'batch',
+    'validate_image': 'utils',
+    'load_image': 'utils',
+    'iter_image_files': 'utils',
+    'create_output_path': 'utils',
+    'display_images': 'utils',
+    'get_image_info': 'utils',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    # Cache it so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
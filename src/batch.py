@@ -0,0 +1,287 @@
+"""
+Worker-pool helpers for batch conversions.
+"""
+import os
+import queue
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+class ConversionResult(namedtuple('ConversionResult',
+                                  ['input_path', 'output_path', 'elapsed', 'error', 'skipped',
+                                   'input_info'],
+                                  defaults=(False, None))):
+    """
+    Outcome of converting a single image in a batch.
+
+    Attributes:
+        input_path (str): Path to the input image
+        output_path (str): Path the sketch was (or would have been) written to
+        elapsed (float): Wall-clock seconds spent on the conversion
+        error (Exception): The exception raised, or None on success
+        skipped (bool): True if an up-to-date output was reused instead
+        input_info (dict): Size, modification time and hash of the bytes that
+                           were converted (see manifest.input_info()), when a
+                           manifest asked for them
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """bool: True if the image was converted successfully."""
+        return self.error is None
+
+class BatchConversionError(Exception):
+    """
+    Raised after a batch finishes when one or more images failed to convert.
+
+    Attributes:
+        results (dict): Mapping of input paths to output paths for the images
+                        that were converted successfully
+        errors (dict): Mapping of input paths to the exception raised for them
+    """
+
+    def __init__(self, results, errors):
+        self.results = results
+        self.errors = errors
+        super().__init__(f"{len(errors)} of {len(results) + len(errors)} images failed to convert: "
+                         + ", ".join(str(path) for path in errors))
+
+def resolve_workers(workers):
+    """
+    Normalize a worker count.
+
+    Args:
+        workers (int): Requested number of workers. None means run in the
+                       calling thread, 0 or a negative value means one worker
+                       per CPU.
+
+    Returns:
+        int: Number of workers to use (at least 1)
+    """
+    if workers is None:
+        return 1
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+def run_parallel(func, items, workers=None, use_processes=False, ordered=True, max_in_flight=None):
+    """
+    Apply a function to every item, capturing errors per item.
+
+    Items are pulled lazily from the iterable and at most max_in_flight tasks
+    are queued at any time, so memory use stays flat regardless of batch size.
+
+    Args:
+        func (callable): Function called as func(item). Must be picklable when
+                         use_processes is True.
+        items (iterable): Items to process
+        workers (int, optional): Number of workers (see resolve_workers).
+                                 Defaults to None (sequential).
+        use_processes (bool, optional): Use a process pool instead of a thread
+                                        pool. Defaults to False.
+        ordered (bool, optional): Yield results in input order. If False, results
+                                  are yielded as they complete. Defaults to True.
+        max_in_flight (int, optional): Maximum number of submitted but unconsumed
+                                       tasks. Defaults to twice the worker count.
+
+    Yields:
+        tuple: (item, result, error) where exactly one of result/error is meaningful
+    """
+    workers = resolve_workers(workers)
+
+    # Sequential fast path without any pool overhead
+    if workers == 1:
+        for item in items:
+            try:
+                yield item, func(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    if max_in_flight is None:
+        max_in_flight = workers * 2
+    max_in_flight = max(max_in_flight, 1)
+
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        pending = deque()
+        iterator = iter(items)
+
+        try:
+            yield from _drain(executor, func, iterator, pending, ordered, max_in_flight)
+        finally:
+            # Drop queued work if the consumer stops iterating early
+            for _, future in pending:
+                future.cancel()
+
+def _drain(executor, func, iterator, pending, ordered, max_in_flight):
+    """Submit items from the iterator and yield finished tasks (see run_parallel)."""
+    exhausted = False
+    while pending or not exhausted:
+        # Top up the in-flight window
+        while not exhausted and len(pending) < max_in_flight:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                exhausted = True
+                break
+            pending.append((item, executor.submit(func, item)))
+
+        if not pending:
+            break
+
+        if ordered:
+            done = [pending.popleft()]
+        else:
+            finished, _ = wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+            done = [entry for entry in pending if entry[1] in finished]
+            for entry in done:
+                pending.remove(entry)
+
+        for item, future in done:
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                yield item, None, e
+
+def run_staged(stages, items, ordered=True, queue_size=4, max_in_flight=None):
+    """
+    Push items through a chain of thread pools joined by bounded queues.
+
+    Each stage has its own workers, so a slow stage (e.g. disk reads or PNG
+    encoding) overlaps with the others instead of serializing with them. The
+    output of one stage is the input of the next. Once an item fails, its
+    remaining stages are skipped and the error is yielded.
+
+    Args:
+        stages (list): (func, workers) pairs, applied in order
+        items (iterable): Items to process, pulled lazily
+        ordered (bool, optional): Yield results in input order. If False, results
+                                  are yielded as they complete. Defaults to True.
+        queue_size (int, optional): Capacity of the queue in front of each
+                                    stage. Defaults to 4.
+        max_in_flight (int, optional): Maximum number of items inside the
+                                       pipeline or waiting to be yielded.
+                                       Defaults to the total worker count plus
+                                       the capacity of all queues.
+
+    Yields:
+        tuple: (item, result, error) where exactly one of result/error is meaningful
+    """
+    if max_in_flight is None:
+        max_in_flight = sum(workers for _, workers in stages) + queue_size * len(stages)
+    max_in_flight = max(max_in_flight, 1)
+
+    cancelled = threading.Event()
+    inboxes = [queue.Queue(queue_size) for _ in stages]
+    # The last queue is unbounded so the stages can always drain into it
+    outboxes = inboxes[1:] + [queue.Queue()]
+
+    pools = []
+    for (func, workers), inbox, outbox in zip(stages, inboxes, outboxes):
+        threads = [threading.Thread(target=_stage_worker, args=(func, inbox, outbox, cancelled),
+                                    daemon=True)
+                   for _ in range(max(workers, 1))]
+        for thread in threads:
+            thread.start()
+        pools.append(threads)
+
+    try:
+        yield from _feed(items, inboxes[0], outboxes[-1], ordered, max_in_flight)
+    finally:
+        # Skip queued work if the consumer stops early, then stop each stage
+        # in order so nothing is left blocked on a full queue
+        cancelled.set()
+        for threads, inbox in zip(pools, inboxes):
+            for _ in threads:
+                inbox.put(None)
+            for thread in threads:
+                thread.join()
+
+def _stage_worker(func, inbox, outbox, cancelled):
+    """Apply one stage function to jobs until a None job arrives (see run_staged)."""
+    while True:
+        job = inbox.get()
+        if job is None:
+            return
+        index, item, value, error = job
+        if error is None and not cancelled.is_set():
+            try:
+                value = func(value)
+            except Exception as e:
+                error = e
+        outbox.put((index, item, value, error))
+
+def _feed(items, inbox, results, ordered, max_in_flight):
+    """Feed items into the first stage and yield finished jobs (see run_staged)."""
+    iterator = iter(items)
+    exhausted = False
+    in_flight = 0
+    next_index = 0
+    finished = {}
+    count = 0
+
+    while in_flight or not exhausted:
+        # Top up the pipeline
+        while not exhausted and in_flight < max_in_flight:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                exhausted = True
+                break
+            inbox.put((count, item, item, None))
+            count += 1
+            in_flight += 1
+
+        if not in_flight:
+            break
+
+        index, item, value, error = results.get()
+        if not ordered:
+            in_flight -= 1
+            yield item, value, error
+            continue
+
+        # Hold early finishers back until their predecessors are done
+        finished[index] = (item, value, error)
+        while next_index in finished:
+            in_flight -= 1
+            yield finished.pop(next_index)
+            next_index += 1
+
+async def iterate_in_thread(iterable):
+    """
+    Iterate a blocking iterable from asyncio without blocking the event loop.
+
+    Each step runs in the loop's default executor, so the iterable is advanced
+    by one thread at a time and only when the consumer asks for the next item.
+
+    Args:
+        iterable (iterable): Blocking iterable, e.g. a generator of results
+
+    Yields:
+        Items of the iterable
+    """
+    # Imported here: asyncio is slow to import and only needed by async callers
+    import asyncio
+
+    # run_in_executor rather than asyncio.to_thread, which needs Python 3.9
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterable)
+    done = object()
+    try:
+        while True:
+            item = await loop.run_in_executor(None, next, iterator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await loop.run_in_executor(None, close)
@@ -0,0 +1,385 @@
+"""
+Benchmark harness for the converter: per-stage timings, batch throughput,
+startup time, JSON baselines and regression gating.
+
+Every measurement runs warm-up iterations first and reports the median and
+minimum of several timed repetitions. Results can be saved as a JSON baseline
+and later runs compared against it; a stage that got slower than the baseline
+by more than a threshold counts as a regression.
+
+    python -m src.benchmark --save-baseline baseline.json
+    python -m src.benchmark --baseline baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+from pathlib import Path
+from .options import BLUR_METHODS
+
+# Image sizes (width, height) per profile; "full" goes up to 8K UHD
+PROFILES = {
+    'quick': {
+        'image_sizes': [(640, 480), (1920, 1080)],
+        'kernel_sizes': [21, 51],
+        'batch_workers': [1, 2],
+        'batch_images': 8,
+        'batch_size': (320, 240),
+    },
+    'full': {
+        'image_sizes': [(640, 480), (1920, 1080), (3840, 2160), (7680, 4320)],
+        'kernel_sizes': [21, 51, 101],
+        'batch_workers': [1, 2, 4, 8],
+        'batch_images': 32,
+        'batch_size': (640, 480),
+    },
+}
+
+# Relative slowdown that counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# Fresh-interpreter commands timed by benchmark_startup()
+STARTUP_COMMANDS = {
+    'python': ["-c", "pass"],
+    'import src': ["-c", "import src"],
+    'cli --help': ["-m", "src.cli", "--help"],
+    'import converter': ["-c", "import src.converter"],
+}
+
+def measure(func, repeat=5, warmup=1):
+    """
+    Time a function with warm-up runs and repeated measurements.
+
+    Args:
+        func (callable): Function to time, called without arguments
+        repeat (int, optional): Timed repetitions. Defaults to 5.
+        warmup (int, optional): Untimed runs before measuring (fills caches and
+                                scratch buffers). Defaults to 1.
+
+    Returns:
+        dict: 'median', 'min' and 'mean' in seconds, and 'repeat'
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'median': statistics.median(timings),
+        'min': min(timings),
+        'mean': statistics.mean(timings),
+        'repeat': len(timings),
+    }
+
+def synthetic_image(width, height, seed=0):
+    """
+    Create a deterministic photo-like BGR test image.
+
+    Smoothed noise compresses and blurs like a real photo, unlike raw noise.
+
+    Args:
+        width (int): Image width
+        height (int): Image height
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        numpy.ndarray: uint8 BGR image
+    """
+    rng = np.random.default_rng(seed)
+    # Upsample coarse noise so the image has structure at several scales
+    coarse = rng.integers(0, 256, (max(height // 8, 1), max(width // 8, 1), 3), dtype=np.uint8)
+    image = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.integers(-12, 13, image.shape, dtype=np.int16)
+    return np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+def benchmark_stages(image_sizes, kernel_sizes, repeat=5, warmup=1, blur_method="exact"):
+    """
+    Time the decode, compute and encode stages separately.
+
+    Args:
+        image_sizes (list): (width, height) pairs
+        kernel_sizes (list): Blur kernel sizes for the compute stage
+        repeat (int, optional): Timed repetitions per measurement. Defaults to 5.
+        warmup (int, optional): Warm-up runs per measurement. Defaults to 1.
+        blur_method (str, optional): Blur method of the compute stage.
+                                     Defaults to "exact".
+
+    Returns:
+        list: Result dicts with 'name', 'stage', 'megapixels' and the timing
+              keys from measure()
+    """
+    # Imported here to avoid a circular import with converter
+    from .converter import ImageToSketchConverter
+
+    results = []
+    for width, height in image_sizes:
+        image = synthetic_image(width, height)
+        data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+        megapixels = width * height / 1e6
+        label = f"{width}x{height}"
+
+        converter = ImageToSketchConverter()
+        results.append(dict(name=f"decode[{label}]", stage="decode", megapixels=megapixels,
+                            **measure(lambda: converter.decode(data), repeat, warmup)))
+
+        for kernel_size in kernel_sizes:
+            converter = ImageToSketchConverter(kernel_size, blur_method=blur_method)
+            results.append(dict(name=f"compute[{label},k{kernel_size}]", stage="compute",
+                                megapixels=megapixels,
+                                **measure(lambda: converter.convert_array(image), repeat, warmup)))
+
+        sketch = converter.convert_array(image)
+        results.append(dict(name=f"encode[{label}]", stage="encode", megapixels=megapixels,
+                            **measure(lambda: converter.encoder.encode(sketch), repeat, warmup)))
+    return results
+
+def benchmark_batch(worker_counts, count=16, size=(640, 480), repeat=3, warmup=1):
+    """
+    Measure end-to-end batch throughput (read, convert, write) per worker count.
+
+    Args:
+        worker_counts (list): Worker counts to test
+        count (int, optional): Images per batch. Defaults to 16.
+        size (tuple, optional): (width, height) of each image. Defaults to (640, 480).
+        repeat (int, optional): Timed repetitions. Defaults to 3.
+        warmup (int, optional): Warm-up runs. Defaults to 1.
+
+    Returns:
+        list: Result dicts with 'name', 'stage' ("batch"), 'images_per_sec' and
+              the timing keys from measure()
+    """
+    # Imported here to avoid a circular import with converter
+    from .converter import ImageToSketchConverter
+
+    converter = ImageToSketchConverter()
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for index in range(count):
+            path = os.path.join(directory, f"image_{index}.jpg")
+            cv2.imwrite(path, synthetic_image(*size, seed=index))
+            paths.append(path)
+        output_dir = os.path.join(directory, "out")
+
+        for workers in worker_counts:
+            timing = measure(lambda: converter.convert_batch(paths, output_dir, workers=workers),
+                             repeat, warmup)
+            results.append(dict(name=f"batch[{size[0]}x{size[1]},x{count},j{workers}]",
+                                stage="batch", images_per_sec=count / timing['median'],
+                                **timing))
+    return results
+
+def benchmark_startup(commands=None, repeat=5, warmup=1):
+    """
+    Measure the wall-clock time of short commands in a fresh interpreter.
+
+    The bare interpreter ('python') is included as the floor that import
+    work adds to.
+
+    Args:
+        commands (dict, optional): Names mapped to interpreter arguments.
+                                   Defaults to STARTUP_COMMANDS.
+        repeat (int, optional): Timed repetitions. Defaults to 5.
+        warmup (int, optional): Warm-up runs (fill the OS file cache and
+                                bytecode caches). Defaults to 1.
+
+    Returns:
+        list: Result dicts with 'name', 'stage' ("startup") and the timing keys
+              from measure()
+    """
+    # Run from the directory containing the package so `-m src.cli` resolves
+    root = Path(__file__).resolve().parent.parent
+    results = []
+    for name, arguments in (commands or STARTUP_COMMANDS).items():
+        command = [sys.executable] + arguments
+        timing = measure(lambda: subprocess.run(command, cwd=root, check=True,
+                                                stdout=subprocess.DEVNULL), repeat, warmup)
+        results.append(dict(name=f"startup[{name}]", stage="startup", **timing))
+    return results
+
+def run_benchmarks(profile='quick', repeat=5, warmup=1, blur_method="exact"):
+    """
+    Run the stage, batch and startup benchmarks of a profile.
+
+    Args:
+        profile (str or dict, optional): 'quick', 'full', or a dict with the same
+                                         keys as PROFILES entries. Defaults to 'quick'.
+        repeat (int, optional): Timed repetitions per measurement. Defaults to 5.
+        warmup (int, optional): Warm-up runs per measurement. Defaults to 1.
+        blur_method (str, optional): Blur method of the compute stage.
+
+    Returns:
+        list: Result dicts (see benchmark_stages, benchmark_batch and
+              benchmark_startup)
+    """
+    config = PROFILES[profile] if isinstance(profile, str) else profile
+    results = benchmark_stages(config['image_sizes'], config['kernel_sizes'], repeat, warmup,
+                               blur_method)
+    results += benchmark_batch(config['batch_workers'], config['batch_images'],
+                               config['batch_size'], max(repeat // 2, 1), warmup)
+    results += benchmark_startup(repeat=repeat, warmup=warmup)
+    return results
+
+def environment():
+    """Return a description of the machine and library versions."""
+    return {
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'opencv_threads': cv2.getNumThreads(),
+    }
+
+def save_baseline(results, path):
+    """
+    Save benchmark results as a JSON baseline.
+
+    Args:
+        results (list): Results from run_benchmarks()
+        path (str): Output path
+    """
+    baseline = {
+        'environment': environment(),
+        'results': {row['name']: {key: value for key, value in row.items() if key != 'name'}
+                    for row in results},
+    }
+    Path(path).write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+def load_baseline(path):
+    """
+    Load a JSON baseline written by save_baseline().
+
+    Args:
+        path (str): Baseline path
+
+    Returns:
+        dict: Mapping of result names to their stored values
+    """
+    return json.loads(Path(path).read_text())['results']
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD, statistic='min'):
+    """
+    Find results that are slower than the baseline by more than a threshold.
+
+    The fastest repetition is compared by default since it is the least
+    affected by other load on the machine. Results missing from the baseline
+    (new benchmarks) are ignored.
+
+    Args:
+        results (list): Results from run_benchmarks()
+        baseline (dict): Baseline from load_baseline()
+        threshold (float, optional): Allowed relative slowdown, e.g. 0.25 for
+                                     25%. Defaults to DEFAULT_THRESHOLD.
+        statistic (str, optional): Timing to compare ('median' or 'min').
+                                   Defaults to 'min'.
+
+    Returns:
+        list: One dict per regression with 'name', 'baseline', 'current' and
+              'change' (relative slowdown)
+    """
+    regressions = []
+    for row in results:
+        reference = baseline.get(row['name'])
+        if reference is None or reference[statistic] <= 0:
+            continue
+        change = row[statistic] / reference[statistic] - 1
+        if change > threshold:
+            regressions.append({
+                'name': row['name'],
+                'baseline': reference[statistic],
+                'current': row[statistic],
+                'change': change,
+            })
+    return regressions
+
+def format_benchmark_report(results, baseline=None, statistic='min'):
+    """
+    Format benchmark results as a text table.
+
+    Args:
+        results (list): Results from run_benchmarks()
+        baseline (dict, optional): Baseline to show the change against
+        statistic (str, optional): Timing the change is computed from, as in
+                                   compare_to_baseline(). Defaults to 'min'.
+
+    Returns:
+        str: The formatted table
+    """
+    width = max([len(row['name']) for row in results] + [9])
+    header = f"{'benchmark':<{width}}  {'median (ms)':>11}  {'min (ms)':>9}  {'throughput':>14}"
+    if baseline is not None:
+        header += f"  {'vs baseline':>11}"
+    lines = [header]
+
+    for row in results:
+        if row['stage'] == 'batch':
+            throughput = f"{row['images_per_sec']:.1f} img/s"
+        elif row['stage'] == 'startup':
+            throughput = "-"
+        else:
+            throughput = f"{row['megapixels'] / row['median']:.1f} MP/s"
+        line = (f"{row['name']:<{width}}  {row['median'] * 1000:>11.2f}  {row['min'] * 1000:>9.2f}  "
+                f"{throughput:>14}")
+        if baseline is not None:
+            reference = baseline.get(row['name'])
+            change = (f"{(row[statistic] / reference[statistic] - 1) * 100:+.1f}%"
+                      if reference else "new")
+            line += f"  {change:>11}"
+        lines.append(line)
+    return "\n".join(lines)
+
+def main():
+    """Run the benchmarks, optionally saving or gating against a baseline."""
+    parser = argparse.ArgumentParser(description="Benchmark the sketch converter")
+    parser.add_argument("--profile", choices=PROFILES, default="quick",
+                        help="Benchmark sizes: quick, or full with images up to 8K (default: quick)")
+    parser.add_argument("-n", "--repeat", type=int, default=5,
+                        help="Timed repetitions per measurement (default: 5)")
+    parser.add_argument("--warmup", type=int, default=1,
+                        help="Warm-up runs per measurement (default: 1)")
+    parser.add_argument("--blur-method", default="exact", choices=BLUR_METHODS,
+                        help="Blur method of the compute stage (default: exact)")
+    parser.add_argument("--save-baseline", metavar="FILE",
+                        help="Save the results as a JSON baseline")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="Compare against a JSON baseline and exit with status 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed relative slowdown (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+
+    try:
+        baseline = load_baseline(args.baseline) if args.baseline else None
+        results = run_benchmarks(args.profile, args.repeat, args.warmup, args.blur_method)
+        print(format_benchmark_report(results, baseline))
+
+        if args.save_baseline:
+            save_baseline(results, args.save_baseline)
+            print(f"Baseline saved to {args.save_baseline}")
+
+        if baseline is not None:
+            regressions = compare_to_baseline(results, baseline, args.threshold)
+            for regression in regressions:
+                print(f"Regression: {regression['name']} {regression['baseline'] * 1000:.2f} ms -> "
+                      f"{regression['current'] * 1000:.2f} ms ({regression['change'] * 100:+.1f}%)",
+                      file=sys.stderr)
+            if regressions:
+                sys.exit(1)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
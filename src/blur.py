@@ -0,0 +1,283 @@
+"""
+Blur strategies for the sketch kernel and an accuracy-vs-speed report.
+
+The cost of cv2.GaussianBlur grows with the kernel size. For large kernels two
+approximations are available:
+
+- "pyramid": blur at reduced resolution (cv2.pyrDown), then upsample with
+  cv2.pyrUp. The blur added by the pyramid levels is accounted for, so the
+  overall sigma matches the exact kernel.
+- "box": three box-filter passes whose combined variance matches the Gaussian.
+  cv2.blur runs in constant time per pixel regardless of the kernel size.
+"""
+import argparse
+import math
+import sys
+import time
+import cv2
+import numpy as np
+from .options import BLUR_METHODS
+from .utils import load_image
+
+# Number of box-filter passes used to approximate a Gaussian
+BOX_PASSES = 3
+
+# Maximum number of pyramid levels
+MAX_PYRAMID_LEVELS = 6
+
+def validate_blur_method(method):
+    """
+    Check that a blur method name is supported.
+
+    Args:
+        method (str): Blur method name
+
+    Raises:
+        ValueError: If the method is unknown
+    """
+    if method not in BLUR_METHODS:
+        raise ValueError(f"Unsupported blur method: {method}. "
+                         f"Supported methods: {', '.join(BLUR_METHODS)}")
+
+def gaussian_sigma(ksize):
+    """
+    Return the sigma OpenCV derives for a Gaussian kernel of the given size.
+
+    OpenCV uses fixed tables instead for kernels of size 7 and below.
+
+    Args:
+        ksize (int): Kernel size
+
+    Returns:
+        float: Standard deviation used by cv2.GaussianBlur when sigma is 0
+    """
+    return 0.3 * ((ksize - 1) * 0.5 - 1) + 0.8
+
+def scale_kernel_size(ksize, ratio):
+    """
+    Scale a blur kernel to an image resized by the given ratio.
+
+    Keeps the blur covering the same fraction of the image, so sketches of
+    downscaled images look like shrunk versions of full-resolution sketches.
+
+    Args:
+        ksize (int): Kernel size at full resolution
+        ratio (float): Size of the image relative to full resolution
+
+    Returns:
+        int: Odd kernel size of at least 1
+    """
+    scaled = int(round(ksize * ratio))
+    if scaled % 2 == 0:
+        scaled += 1
+    return max(scaled, 1)
+
+def _pyramid_plan(ksize):
+    """
+    Choose the number of pyramid levels and the residual blur for a kernel.
+
+    Each pyrDown/pyrUp pair adds a 5x5 binomial blur (variance 1 at its own
+    resolution). The deepest level is used that still leaves a residual sigma of
+    at least one coarse pixel.
+
+    Returns:
+        tuple: (levels, residual_sigma)
+    """
+    variance = gaussian_sigma(ksize) ** 2
+    levels = 0
+    while (levels < MAX_PYRAMID_LEVELS
+           and variance - 2 * (4 ** (levels + 1) - 1) / 3 >= 4 ** (levels + 1)):
+        levels += 1
+    residual = math.sqrt(max(variance - 2 * (4 ** levels - 1) / 3, 0) / 4 ** levels)
+    return levels, residual
+
+def _box_widths(ksize):
+    """Return the box widths whose combined variance matches the Gaussian."""
+    sigma = gaussian_sigma(ksize)
+    ideal = math.sqrt(12 * sigma * sigma / BOX_PASSES + 1)
+    lower = int(ideal)
+    if lower % 2 == 0:
+        lower -= 1
+    lower = max(lower, 1)
+    upper = lower + 2
+    lower_passes = round((12 * sigma * sigma - BOX_PASSES * lower * lower
+                          - 4 * BOX_PASSES * lower - 3 * BOX_PASSES) / (-4 * lower - 4))
+    lower_passes = min(max(lower_passes, 0), BOX_PASSES)
+    return [lower] * lower_passes + [upper] * (BOX_PASSES - lower_passes)
+
+def blur_reach(ksize, method='exact'):
+    """
+    Return how many rows of context a blur needs on each side.
+
+    Used to size the overlap between strips in tiled conversions.
+
+    Args:
+        ksize (int): Gaussian kernel size
+        method (str, optional): Blur method. Defaults to 'exact'.
+
+    Returns:
+        int: Number of rows that influence each output row on either side
+    """
+    validate_blur_method(method)
+    if method == 'box':
+        return max(sum(width // 2 for width in _box_widths(ksize)), ksize // 2)
+    if method == 'pyramid':
+        levels, residual = _pyramid_plan(ksize)
+        if levels:
+            coarse_radius = math.ceil(3 * residual) + 2 * levels + 2
+            return max(coarse_radius * 2 ** levels, ksize // 2)
+    return ksize // 2
+
+def blur_alignment(ksize, method='exact'):
+    """
+    Return the row alignment strips must respect for a blur to be seam-free.
+
+    Pyramid levels halve the resolution, so strips must start on a multiple of
+    2 ** levels to sample the same coarse grid as the whole image.
+
+    Args:
+        ksize (int): Gaussian kernel size
+        method (str, optional): Blur method. Defaults to 'exact'.
+
+    Returns:
+        int: Required alignment in rows
+    """
+    if method == 'pyramid':
+        return 2 ** _pyramid_plan(ksize)[0]
+    return 1
+
+def blur(src, ksize, method='exact', dst=None):
+    """
+    Blur an image with the selected strategy.
+
+    Args:
+        src (numpy.ndarray): Image to blur
+        ksize (int): Gaussian kernel size the result should match
+        method (str, optional): 'exact', 'pyramid' or 'box'. Defaults to 'exact'.
+        dst (numpy.ndarray, optional): Buffer to write the result to. May be src.
+
+    Returns:
+        numpy.ndarray: The blurred image
+    """
+    validate_blur_method(method)
+
+    if method == 'exact' or (method == 'pyramid' and _pyramid_plan(ksize)[0] == 0):
+        return cv2.GaussianBlur(src, (ksize, ksize), 0, dst=dst)
+
+    # The approximations reflect at every pass or pyramid level, which drifts
+    # from a single reflected Gaussian near the borders. Pad once up front so
+    # the borders behave like the exact kernel.
+    align = blur_alignment(ksize, method)
+    pad = -(-(ksize // 2) // align) * align
+    padded = cv2.copyMakeBorder(src, pad, pad, pad, pad, cv2.BORDER_REFLECT_101)
+
+    if method == 'box':
+        for width in _box_widths(ksize):
+            cv2.blur(padded, (width, width), dst=padded)
+        out = padded
+    else:
+        levels, residual = _pyramid_plan(ksize)
+        pyramid = [padded]
+        for _ in range(levels):
+            pyramid.append(cv2.pyrDown(pyramid[-1]))
+
+        coarse_ksize = 2 * math.ceil(3 * residual) + 1
+        out = cv2.GaussianBlur(pyramid[-1], (coarse_ksize, coarse_ksize), residual)
+        for level in reversed(pyramid[:-1]):
+            out = cv2.pyrUp(out, dstsize=(level.shape[1], level.shape[0]))
+
+    cropped = out[pad:pad + src.shape[0], pad:pad + src.shape[1]]
+    if dst is None:
+        return cropped.copy()
+    np.copyto(dst, cropped)
+    return dst
+
+def compare_blur_methods(image, kernel_sizes=(21, 51, 101), scale=256.0, repeat=3):
+    """
+    Measure the speed and accuracy of each blur method on an image.
+
+    Accuracy is measured on the final sketch, relative to the exact method.
+
+    Args:
+        image (numpy.ndarray): BGR or grayscale uint8 image
+        kernel_sizes (tuple, optional): Kernel sizes to test. Defaults to (21, 51, 101).
+        scale (float, optional): Scale factor for the sketch. Defaults to 256.0.
+        repeat (int, optional): Timed repetitions per measurement (after one
+                                warm-up run). Defaults to 3.
+
+    Returns:
+        list: One dict per (kernel_size, method) with keys 'kernel_size', 'method',
+              'seconds' (best of repeat), 'speedup' (vs exact), 'max_error',
+              'mean_error' and 'psnr' (dB, inf when identical)
+    """
+    # Imported here to avoid a circular import with converter
+    from .converter import ImageToSketchConverter
+
+    rows = []
+    for kernel_size in kernel_sizes:
+        reference = None
+        exact_seconds = None
+        for method in BLUR_METHODS:
+            converter = ImageToSketchConverter(kernel_size, scale, blur_method=method)
+            sketch = converter.convert_array(image)
+
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                converter.convert_array(image)
+                timings.append(time.perf_counter() - start)
+            seconds = min(timings)
+
+            if reference is None:
+                reference, exact_seconds = sketch, seconds
+
+            error = np.abs(sketch.astype(np.int16) - reference.astype(np.int16))
+            mse = float(np.mean(error.astype(np.float64) ** 2))
+            rows.append({
+                'kernel_size': kernel_size,
+                'method': method,
+                'seconds': seconds,
+                'speedup': exact_seconds / seconds if seconds > 0 else float('inf'),
+                'max_error': int(error.max()),
+                'mean_error': float(error.mean()),
+                'psnr': 10 * math.log10(255 ** 2 / mse) if mse > 0 else float('inf'),
+            })
+    return rows
+
+def format_blur_report(rows):
+    """
+    Format the rows returned by compare_blur_methods() as a text table.
+
+    Args:
+        rows (list): Report rows
+
+    Returns:
+        str: The formatted table
+    """
+    lines = [f"{'kernel':>6}  {'method':<8}  {'time (ms)':>9}  {'speedup':>7}  "
+             f"{'max err':>7}  {'mean err':>8}  {'PSNR (dB)':>9}"]
+    for row in rows:
+        lines.append(f"{row['kernel_size']:>6}  {row['method']:<8}  {row['seconds'] * 1000:>9.1f}  "
+                     f"{row['speedup']:>6.1f}x  {row['max_error']:>7}  {row['mean_error']:>8.3f}  "
+                     f"{row['psnr']:>9.1f}")
+    return "\n".join(lines)
+
+def main():
+    """Print an accuracy-vs-speed report for the blur methods on an image."""
+    parser = argparse.ArgumentParser(description="Compare sketch blur methods on an image")
+    parser.add_argument("input", help="Path to the input image")
+    parser.add_argument("-k", "--kernel-sizes", type=int, nargs="+", default=[21, 51, 101],
+                        help="Kernel sizes to compare (default: 21 51 101)")
+    parser.add_argument("-n", "--repeat", type=int, default=3,
+                        help="Timed repetitions per measurement (default: 3)")
+    args = parser.parse_args()
+
+    try:
+        image = load_image(args.input)
+        print(format_blur_report(compare_blur_methods(image, args.kernel_sizes, repeat=args.repeat)))
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Content-addressed cache for conversion results.
+
+Results are keyed by a hash of the encoded input image plus the converter
+parameters, so re-submitting the same image with the same settings skips
+decoding, the sketch computation and (for PNG outputs) encoding.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import cv2
+import numpy as np
+
+class SketchCache:
+    """
+    Two-tier sketch cache: an in-memory LRU and an optional on-disk store.
+
+    The memory tier holds decoded sketches and is bounded by a byte budget.
+    The disk tier stores PNG-encoded sketches under cache_dir and evicts the
+    least recently used files once its size budget is exceeded.
+
+    Attributes:
+        memory_bytes (int): Byte budget of the memory tier
+        cache_dir (str): Directory of the disk tier, or None
+        disk_bytes (int): Byte budget of the disk tier
+        hits (int): Number of lookups served from either tier
+        misses (int): Number of lookups not found in the cache
+    """
+
+    def __init__(self, memory_bytes=256 * 1024 * 1024, cache_dir=None, disk_bytes=1024 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            memory_bytes (int, optional): Byte budget of the memory tier. 0 disables
+                                          it. Defaults to 256 MB.
+            cache_dir (str, optional): Directory for the disk tier. None disables it.
+            disk_bytes (int, optional): Byte budget of the disk tier. Defaults to 1 GB.
+        """
+        self.memory_bytes = memory_bytes
+        self.cache_dir = str(cache_dir) if cache_dir else None
+        self.disk_bytes = disk_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._disk_used = None
+
+    def __getstate__(self):
+        # Worker processes get their own (empty) memory tier and lock
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_memory'] = OrderedDict()
+        state['_memory_used'] = 0
+        state['_disk_used'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(data, params):
+        """
+        Build a cache key from encoded image bytes and converter parameters.
+
+        Args:
+            data (bytes): Encoded input image
+            params (dict): JSON-serializable converter parameters
+
+        Returns:
+            str: Hex digest identifying the result
+        """
+        digest = hashlib.blake2b(data, digest_size=20)
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Look up a sketch.
+
+        Args:
+            key (str): Key from make_key()
+
+        Returns:
+            tuple: (sketch, png_bytes) on a hit, where sketch is a fresh copy and
+                   png_bytes may be None if only the memory tier had the entry;
+                   None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0].copy(), entry[1]
+
+        png_bytes = self._disk_read(key)
+        if png_bytes is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        sketch = cv2.imdecode(np.frombuffer(png_bytes, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if sketch is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Promote to the memory tier
+        self._memory_put(key, sketch.copy(), png_bytes)
+        with self._lock:
+            self.hits += 1
+        return sketch, png_bytes
+
+    def put(self, key, sketch, png_bytes=None):
+        """
+        Store a sketch in both tiers.
+
+        Args:
+            key (str): Key from make_key()
+            sketch (numpy.ndarray): The sketch image
+            png_bytes (bytes, optional): The sketch already encoded as PNG, to
+                                         avoid encoding it again for the disk tier
+        """
+        if self.cache_dir and png_bytes is None:
+            success, encoded = cv2.imencode(".png", sketch)
+            png_bytes = encoded.tobytes() if success else None
+
+        # Keep a private copy so callers can modify their array freely
+        self._memory_put(key, sketch.copy(), png_bytes)
+        if png_bytes is not None:
+            self._disk_write(key, png_bytes)
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+        for path, _, _ in self._disk_entries():
+            os.unlink(path)
+        self._disk_used = 0
+
+    def _memory_put(self, key, sketch, png_bytes):
+        """Insert into the memory tier and evict least recently used entries."""
+        size = sketch.nbytes + (len(png_bytes) if png_bytes else 0)
+        if size > self.memory_bytes:
+            return
+
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_used -= old[0].nbytes + (len(old[1]) if old[1] else 0)
+
+            self._memory[key] = (sketch, png_bytes)
+            self._memory_used += size
+
+            while self._memory_used > self.memory_bytes:
+                _, (old_sketch, old_png) = self._memory.popitem(last=False)
+                self._memory_used -= old_sketch.nbytes + (len(old_png) if old_png else 0)
+
+    def _disk_path(self, key):
+        """Return the disk tier path for a key."""
+        return Path(self.cache_dir) / key[:2] / f"{key}.png"
+
+    def _disk_read(self, key):
+        """Read an entry from the disk tier, refreshing its access time."""
+        if not self.cache_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        # Mark as recently used for eviction
+        os.utime(path)
+        return data
+
+    def _disk_write(self, key, png_bytes):
+        """Write an entry to the disk tier and enforce the size budget."""
+        if not self.cache_dir or len(png_bytes) > self.disk_bytes:
+            return
+
+        path = self._disk_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary name first so readers never see partial files
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temp_path.write_bytes(png_bytes)
+        with self._lock:
+            # An overwritten entry only changes the total by the difference
+            try:
+                replaced = path.stat().st_size
+            except OSError:
+                replaced = 0
+            os.replace(temp_path, path)
+            if self._disk_used is None:
+                self._disk_used = sum(size for _, size, _ in self._disk_entries())
+            else:
+                self._disk_used += len(png_bytes) - replaced
+            if self._disk_used <= self.disk_bytes:
+                return
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Delete least recently used disk entries until within budget (lock held)."""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+        self._disk_used = total
+
+    def _disk_entries(self):
+        """Return (path, size, mtime) for every disk tier entry."""
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return []
+
+        entries = []
+        for path in Path(self.cache_dir).glob("*/*.png"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
@@ -1,11 +1,110 @@
 import argparse
+import glob
+import importlib
+import os
 import sys
+import time
 from pathlib import Path
-from .converter import ImageToSketchConverter, convert_image_to_sketch
-from .utils import validate_image, display_images, create_output_path
+from .manifest import BatchManifest
+from .metrics import ConversionMetrics
+from .options import BLUR_METHODS, OUTPUT_FORMATS, PNG_STRATEGY_NAMES, PRESET_NAMES
+
+# Modules that load OpenCV and numpy are imported where they are first needed,
+# so --help and argument errors return without paying for them.
+
+# Subcommands (`image-to-sketch serve ...`) and the modules whose main() they
+# run. An input named like one is converted when it follows `--`.
+SUBCOMMANDS = {
+    'serve': 'server',
+    'video': 'video',
+    'sweep': 'sweep',
+}
+
+def _has_glob_magic(pattern):
+    """Return True if a path contains glob wildcards."""
+    return any(char in pattern for char in "*?[")
+
+def _glob_base(pattern):
+    """Return the leading directory of a glob pattern that contains no wildcards."""
+    parts = []
+    for part in Path(pattern).parts:
+        if _has_glob_magic(part):
+            break
+        parts.append(part)
+    return str(Path(*parts)) if parts else "."
+
+def expand_inputs(inputs, recursive=False):
+    """
+    Expand CLI inputs into individual image paths.
+
+    Inputs may be image files, directories, glob patterns or @filelist files
+    containing one input per line. Paths are yielded lazily.
+
+    Args:
+        inputs (list): Input arguments as given on the command line
+        recursive (bool, optional): Descend into subdirectories and let "**" in
+                                    glob patterns match nested directories.
+                                    Defaults to False.
+
+    Yields:
+        tuple: (image_path, base_dir) where base_dir is the directory the image
+               was found under, or None for explicitly listed files
+    """
+    for entry in inputs:
+        if entry.startswith("@"):
+            # One input per line, blank lines and comments ignored
+            with open(entry[1:]) as f:
+                lines = [line.strip() for line in f]
+            lines = [line for line in lines if line and not line.startswith("#")]
+            yield from expand_inputs(lines, recursive)
+        elif os.path.isdir(entry):
+            from .utils import iter_image_files
+            for image_path in iter_image_files(entry, recursive):
+                yield image_path, entry
+        elif _has_glob_magic(entry):
+            base_dir = _glob_base(entry)
+            for image_path in sorted(glob.iglob(entry, recursive=recursive)):
+                if os.path.isfile(image_path):
+                    yield image_path, base_dir
+        else:
+            yield entry, None
+
+def batch_output_path(image_path, base_dir, output_dir, extension=".png"):
+    """
+    Choose the output path for an image found by expand_inputs().
+
+    With an output directory, the layout below base_dir is mirrored into it.
+
+    Args:
+        image_path (str): Path to the input image
+        base_dir (str): Directory the image was found under, or None
+        output_dir (str): Output directory, or None to write next to the input
+        extension (str, optional): Output format extension. Defaults to ".png".
+
+    Returns:
+        str: Output path for the sketch
+    """
+    from .utils import create_output_path
+
+    if not output_dir:
+        return create_output_path(image_path, extension=extension)
+
+    relative_dir = Path(os.path.relpath(Path(image_path).parent, base_dir)) if base_dir else Path()
+    return create_output_path(str(Path(output_dir) / relative_dir / Path(image_path).name),
+                              extension=extension)
 
 def main():
     """Command-line interface for the Image to Pencil Sketch converter."""
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command in SUBCOMMANDS:
+        # serve runs the HTTP server, video converts videos and image
+        # sequences, sweep renders a grid of kernel sizes and scales
+        if os.path.exists(command):
+            print(f"Note: running the '{command}' subcommand; to convert the file "
+                  f"'{command}', use: -- {command}", file=sys.stderr)
+        module = importlib.import_module(f".{SUBCOMMANDS[command]}", __package__)
+        return module.main(sys.argv[2:])
+
     parser = argparse.ArgumentParser(
         description="Convert images to pencil sketches using OpenCV",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -14,50 +113,215 @@ Examples:
   python -m image_to_pencil_sketch.cli input.jpg
   python -m image_to_pencil_sketch.cli input.jpg -o sketch.png
   python -m image_to_pencil_sketch.cli input.jpg -b 31 -s 300.0 --display
+  python -m image_to_pencil_sketch.cli input.jpg --preset ink --save-preset my_ink.json
+  python -m image_to_pencil_sketch.cli photos/ --preset my_ink.json --output-dir sketches/
+  python -m image_to_pencil_sketch.cli photos/ -r --output-dir sketches/ -j 8
+  python -m image_to_pencil_sketch.cli "photos/*.jpg" @more_files.txt --skip-existing
+  python -m image_to_pencil_sketch.cli photos/ --format webp --webp-quality 85
+  python -m image_to_pencil_sketch.cli photos/ --output-dir thumbs/ --max-size 256
+  python -m image_to_pencil_sketch.cli photos/ --profile --metrics sketch.prom
+  python -m image_to_pencil_sketch.cli photos/ --output-dir sketches/ -j 4 --threads 8
+  python -m image_to_pencil_sketch.cli --sysinfo
+  python -m image_to_pencil_sketch.cli serve --port 8000 -j 4
+  python -m image_to_pencil_sketch.cli video clip.mp4 -o sketch.mp4 --incremental
+  python -m image_to_pencil_sketch.cli sweep input.jpg -b 11 21 31 -s 192 256 --sheet sheet.png
+  python -m image_to_pencil_sketch.cli -- video    (an input file named "video")
         """
     )
-    
-    parser.add_argument("input", help="Path to the input image")
-    parser.add_argument("-o", "--output", help="Path to save the output sketch")
-    parser.add_argument("-b", "--blur", type=int, default=21, 
+
+    parser.add_argument("inputs", nargs="*", metavar="input",
+                        help="Input image, directory, glob pattern or @filelist")
+    parser.add_argument("-o", "--output", help="Path to save the output sketch (single input only)")
+    parser.add_argument("--output-dir",
+                        help="Directory to save sketches in, mirroring the input directory layout")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Search input directories recursively and let ** match subdirectories")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of images to convert in parallel (0 = all CPUs, default: 1)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Overlap reading, converting and writing in separate thread pools; "
+                             "-j sets the converting threads")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="Skip images whose output sketch already exists")
+    parser.add_argument("--manifest",
+                        help="Manifest file recording finished conversions; reruns only convert "
+                             "new or changed images (also resumes interrupted runs)")
+    parser.add_argument("--cache-dir",
+                        help="Directory of a persistent result cache; unchanged images converted "
+                             "with the same settings are served from it")
+    parser.add_argument("--cache-size", type=int, default=1024,
+                        help="Maximum size of the cache directory in MB (default: 1024)")
+    parser.add_argument("--preset", metavar="NAME|FILE",
+                        help="Start from a built-in preset (" + ", ".join(PRESET_NAMES) + ") or a "
+                             "JSON preset file; -b, -s and --blur-method override its settings")
+    parser.add_argument("--save-preset", metavar="FILE",
+                        help="Save the resulting sketch settings as a JSON preset file")
+    parser.add_argument("-b", "--blur", type=int,
                         help="Kernel size for Gaussian blur (must be odd, default: 21)")
-    parser.add_argument("-s", "--scale", type=float, default=256.0,
+    parser.add_argument("--blur-method", choices=BLUR_METHODS,
+                        help="Blur strategy: exact Gaussian, or the faster pyramid/box "
+                             "approximations for large kernels (default: exact)")
+    parser.add_argument("-s", "--scale", type=float,
                         help="Scale factor for the division operation (default: 256.0)")
+    parser.add_argument("--max-size", type=int, metavar="PIXELS",
+                        help="Cap the longest side of sketches; larger inputs are decoded at "
+                             "reduced resolution and the blur kernel is scaled to match")
+    parser.add_argument("-f", "--format", choices=[fmt[1:] for fmt in OUTPUT_FORMATS], default="png",
+                        help="Output format of generated output paths; with -o the extension "
+                             "decides (default: png)")
+    parser.add_argument("--png-compression", type=int, choices=range(10), metavar="{0-9}",
+                        help="PNG zlib level: 0-1 write fastest, 9 gives the smallest files")
+    parser.add_argument("--png-strategy", choices=PNG_STRATEGY_NAMES,
+                        help="PNG zlib strategy; rle is fast and compact for sketches")
+    parser.add_argument("--jpeg-quality", type=int, metavar="{0-100}",
+                        help="JPEG quality (default: OpenCV's 95)")
+    parser.add_argument("--webp-quality", type=int, metavar="{1-100}",
+                        help="Lossy WebP quality")
+    parser.add_argument("--lossless", action="store_true",
+                        help="Write lossless WebP")
     parser.add_argument("-d", "--display", action="store_true",
-                        help="Display the original and sketch images side by side")
+                        help="Display the original and sketch images side by side (single input only)")
     parser.add_argument("-v", "--verbose", action="store_true",
                         help="Verbose output")
-    
+    parser.add_argument("--profile", action="store_true",
+                        help="Print the time spent in each stage (read, decode, grayscale, blur, "
+                             "divide, encode, write) and the bytes and pixels processed")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="Write stage timings and counters to FILE after the run: JSON for "
+                             ".json files, Prometheus text format otherwise")
+    parser.add_argument("--threads", type=int,
+                        help="OpenCV internal threads; with -j they are shared between the "
+                             "workers (default: OpenCV's, one per CPU)")
+    parser.add_argument("--no-pin-threads", action="store_true",
+                        help="With -j, let every worker use all of OpenCV's threads")
+    parser.add_argument("--umat", action="store_true",
+                        help="Run the blur and divide on cv2.UMat, offloading them to an OpenCL "
+                             "device when one is available")
+    parser.add_argument("--no-optimized", action="store_true",
+                        help="Disable OpenCV's SIMD and IPP code paths, e.g. to measure their effect")
+    parser.add_argument("--sysinfo", action="store_true",
+                        help="Print the CPU features, threading backend and OpenCL support "
+                             "OpenCV uses, then exit")
+
     args = parser.parse_args()
-    
+
+    if args.sysinfo:
+        from .runtime import format_system_info, system_info
+        print(format_system_info(system_info()))
+        return
+    if not args.inputs:
+        parser.error("the following arguments are required: input")
+
+    single_file = (len(args.inputs) == 1 and not args.inputs[0].startswith("@")
+                   and not os.path.isdir(args.inputs[0]) and not _has_glob_magic(args.inputs[0]))
+    if args.output and not single_file:
+        parser.error("--output can only be used with a single input image; use --output-dir instead")
+    if args.display and not single_file:
+        parser.error("--display can only be used with a single input image")
+
+    from .cache import SketchCache
+    from .converter import ImageToSketchConverter
+    from .encoding import SketchEncoder
+
     try:
-        # Validate input image
-        validate_image(args.input)
-        
-        if args.verbose:
-            print(f"Processing image: {args.input}")
-        
-        # Determine output path
-        output_path = args.output if args.output else create_output_path(args.input)
-        
-        # Convert image to sketch
-        sketch = convert_image_to_sketch(
-            args.input, 
-            output_path, 
-            args.blur, 
-            args.scale
-        )
-        
-        if args.verbose:
-            print(f"Sketch saved to: {output_path}")
-        
+        cache = None
+        if args.cache_dir:
+            cache = SketchCache(cache_dir=args.cache_dir, disk_bytes=args.cache_size * 1024 * 1024)
+
+        encoder = SketchEncoder(args.format, args.png_compression, args.png_strategy,
+                                args.jpeg_quality, args.webp_quality, args.lossless)
+        metrics = ConversionMetrics() if args.profile or args.metrics else None
+        # Explicit options override the preset, which defaults to the classic sketch
+        settings = {'blur_kernel_size': args.blur, 'scale': args.scale,
+                    'blur_method': args.blur_method}
+        settings = {key: value for key, value in settings.items() if value is not None}
+        converter = ImageToSketchConverter.from_preset(args.preset or 'classic', cache=cache,
+                                                       encoder=encoder, max_dimension=args.max_size,
+                                                       metrics=metrics, threads=args.threads,
+                                                       use_umat=args.umat,
+                                                       pin_threads=not args.no_pin_threads,
+                                                       **settings)
+        if args.no_optimized:
+            from .runtime import configure_opencv
+            configure_opencv(optimized=False)
+        if args.save_preset:
+            converter.save_preset(args.save_preset)
+            print(f"Preset saved to: {args.save_preset}")
+
+        manifest = None
+        if args.manifest:
+            manifest = BatchManifest(args.manifest)
+            if len(manifest):
+                print(f"Resuming with {args.manifest}: {len(manifest)} image(s) already recorded")
+
+        skipped = 0
+
+        def items():
+            nonlocal skipped
+            for image_path, base_dir in expand_inputs(args.inputs, args.recursive):
+                output_path = args.output or batch_output_path(image_path, base_dir, args.output_dir,
+                                                               encoder.format)
+
+                if args.skip_existing and os.path.exists(output_path):
+                    skipped += 1
+                    continue
+
+                if args.verbose:
+                    print(f"Processing image: {image_path}")
+                yield image_path, output_path
+
+        converted = 0
+        failed = 0
+        up_to_date = 0
+        start = time.perf_counter()
+
+        # Convert images to sketches (each input is validated and decoded once)
+        workers = None if args.jobs == 1 else args.jobs
+        results = converter.iter_convert(items(), workers=workers, ordered=False, manifest=manifest,
+                                         pipeline=args.pipeline)
+        for result in results:
+            if result.skipped:
+                up_to_date += 1
+            elif result.ok:
+                converted += 1
+                if args.verbose:
+                    print(f"Sketch saved to: {result.output_path}")
+            else:
+                failed += 1
+                print(f"Error: {result.input_path}: {result.error}", file=sys.stderr)
+
+        elapsed = time.perf_counter() - start
+        if manifest is not None:
+            manifest.close()
+
+        if converted + failed + skipped + up_to_date == 0:
+            raise ValueError("No input images found")
+
+        if not single_file or args.verbose:
+            rate = converted / elapsed if elapsed > 0 else 0.0
+            print(f"Converted {converted} image(s) in {elapsed:.2f}s ({rate:.1f} images/sec), "
+                  f"{failed} failed, {skipped} skipped")
+            if manifest is not None:
+                print(f"Manifest: {up_to_date} image(s) up to date, {manifest.recorded} newly recorded")
+            if cache is not None:
+                print(f"Cache: {cache.hits} hit(s), {cache.misses} miss(es)")
+
+        if args.profile:
+            print(metrics.format_profile(elapsed))
+        if args.metrics:
+            metrics.write(args.metrics)
+
         # Display images if requested
-        if args.display:
-            display_images(args.input, output_path)
-            
+        if args.display and converted:
+            from .utils import display_images
+            display_images(args.inputs[0], result.output_path)
+
+        if failed:
+            sys.exit(1)
+
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,255 @@
+"""
+Output encoder settings and a write-time vs file-size report.
+
+PNG compression is often the slowest step for large sketches. Sketches are
+smooth grayscale images, so low zlib levels or the RLE strategy usually cost
+little in file size; lossy JPEG and WebP trade exactness for much smaller files.
+"""
+import argparse
+import sys
+import time
+import cv2
+import numpy as np
+from pathlib import Path
+from .options import OUTPUT_FORMATS
+
+# zlib strategies for PNG output (keys match options.PNG_STRATEGY_NAMES)
+PNG_STRATEGIES = {
+    'default': cv2.IMWRITE_PNG_STRATEGY_DEFAULT,
+    'filtered': cv2.IMWRITE_PNG_STRATEGY_FILTERED,
+    'huffman': cv2.IMWRITE_PNG_STRATEGY_HUFFMAN_ONLY,
+    'rle': cv2.IMWRITE_PNG_STRATEGY_RLE,
+    'fixed': cv2.IMWRITE_PNG_STRATEGY_FIXED,
+}
+
+# Settings compared by the report when none are given
+DEFAULT_SETTINGS = (
+    {'format': '.png', 'png_compression': 0},
+    {'format': '.png', 'png_compression': 1},
+    {'format': '.png', 'png_compression': 1, 'png_strategy': 'rle'},
+    {'format': '.png', 'png_compression': 3},
+    {'format': '.png', 'png_compression': 6},
+    {'format': '.png', 'png_compression': 9},
+    {'format': '.jpg', 'jpeg_quality': 75},
+    {'format': '.jpg', 'jpeg_quality': 95},
+    {'format': '.webp', 'webp_quality': 80},
+    {'format': '.webp', 'webp_lossless': True},
+)
+
+def normalize_format(format):
+    """
+    Normalize an output format name such as "jpg" or ".PNG" to an extension.
+
+    Args:
+        format (str): Format name or extension
+
+    Returns:
+        str: Lower-case extension with a leading dot
+
+    Raises:
+        ValueError: If the format is not supported
+    """
+    extension = format.lower() if format.startswith(".") else f".{format.lower()}"
+    if extension not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {format}. "
+                         f"Supported formats: {', '.join(OUTPUT_FORMATS)}")
+    return extension
+
+class SketchEncoder:
+    """
+    Encoder settings for writing sketches.
+
+    Settings left as None use OpenCV's defaults. Each setting only applies to
+    its own format, so one encoder can serve outputs of mixed formats.
+
+    Attributes:
+        format (str): Extension of default output paths, e.g. ".png"
+        png_compression (int): zlib level 0-9 for PNG output
+        png_strategy (str): zlib strategy for PNG output (see PNG_STRATEGIES)
+        jpeg_quality (int): JPEG quality 0-100
+        webp_quality (int): Lossy WebP quality 1-100
+        webp_lossless (bool): Write lossless WebP
+    """
+
+    def __init__(self, format=".png", png_compression=None, png_strategy=None, jpeg_quality=None,
+                 webp_quality=None, webp_lossless=False):
+        """
+        Initialize the encoder settings.
+
+        Args:
+            format (str, optional): Format of default output paths. Defaults to ".png".
+            png_compression (int, optional): zlib level 0 (fastest) to 9 (smallest)
+            png_strategy (str, optional): 'default', 'filtered', 'huffman', 'rle'
+                                          or 'fixed'
+            jpeg_quality (int, optional): JPEG quality 0-100
+            webp_quality (int, optional): Lossy WebP quality 1-100
+            webp_lossless (bool, optional): Write lossless WebP. Defaults to False.
+        """
+        if png_compression is not None and not 0 <= png_compression <= 9:
+            raise ValueError("png_compression must be between 0 and 9")
+        if png_strategy is not None and png_strategy not in PNG_STRATEGIES:
+            raise ValueError(f"Unsupported PNG strategy: {png_strategy}. "
+                             f"Supported strategies: {', '.join(PNG_STRATEGIES)}")
+        if jpeg_quality is not None and not 0 <= jpeg_quality <= 100:
+            raise ValueError("jpeg_quality must be between 0 and 100")
+        if webp_quality is not None and not 1 <= webp_quality <= 100:
+            raise ValueError("webp_quality must be between 1 and 100")
+
+        self.format = normalize_format(format)
+        self.png_compression = png_compression
+        self.png_strategy = png_strategy
+        self.jpeg_quality = jpeg_quality
+        self.webp_quality = webp_quality
+        self.webp_lossless = webp_lossless
+
+    def __repr__(self):
+        settings = ", ".join(f"{name}={value!r}" for name, value in self.to_dict().items())
+        return f"SketchEncoder({settings})"
+
+    def to_dict(self):
+        """Return the settings that differ from the defaults, for cache keys and manifests."""
+        settings = {
+            'format': self.format,
+            'png_compression': self.png_compression,
+            'png_strategy': self.png_strategy,
+            'jpeg_quality': self.jpeg_quality,
+            'webp_quality': self.webp_quality,
+            'webp_lossless': self.webp_lossless,
+        }
+        defaults = {'format': '.png', 'webp_lossless': False}
+        return {name: value for name, value in settings.items()
+                if value is not None and value != defaults.get(name)}
+
+    def params(self, extension):
+        """
+        Return cv2.imwrite/imencode parameters for an output extension.
+
+        Args:
+            extension (str): Output extension, e.g. ".png"
+
+        Returns:
+            list: Flat list of (flag, value) pairs
+        """
+        extension = extension.lower()
+        params = []
+        if extension == ".png":
+            if self.png_compression is not None:
+                params += [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+            if self.png_strategy is not None:
+                params += [cv2.IMWRITE_PNG_STRATEGY, PNG_STRATEGIES[self.png_strategy]]
+        elif extension in (".jpg", ".jpeg"):
+            if self.jpeg_quality is not None:
+                params += [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        elif extension == ".webp":
+            # OpenCV switches to lossless WebP for qualities above 100
+            if self.webp_lossless:
+                params += [cv2.IMWRITE_WEBP_QUALITY, 101]
+            elif self.webp_quality is not None:
+                params += [cv2.IMWRITE_WEBP_QUALITY, self.webp_quality]
+        return params
+
+    def encode(self, image, extension=None):
+        """
+        Encode an image.
+
+        Args:
+            image (numpy.ndarray): Image to encode
+            extension (str, optional): Output extension. Defaults to self.format.
+
+        Returns:
+            bytes: The encoded image
+        """
+        extension = normalize_format(extension or self.format)
+        success, encoded = cv2.imencode(extension, image, self.params(extension))
+        if not success:
+            raise ValueError(f"Could not encode sketch as {extension}")
+        return encoded.tobytes()
+
+    def write(self, image, output_path):
+        """
+        Write an image in the format given by the path's extension.
+
+        Args:
+            image (numpy.ndarray): Image to write
+            output_path (str): Output path
+        """
+        if not cv2.imwrite(str(output_path), image, self.params(Path(output_path).suffix)):
+            raise ValueError(f"Could not write sketch to {output_path}")
+
+def compare_encoders(image, settings=DEFAULT_SETTINGS, repeat=3):
+    """
+    Measure encode time and output size for a list of encoder settings.
+
+    Args:
+        image (numpy.ndarray): Image to encode (typically a sketch)
+        settings (iterable, optional): Keyword arguments for SketchEncoder, one
+                                       dict per setting. Defaults to DEFAULT_SETTINGS.
+        repeat (int, optional): Timed repetitions per setting (after one
+                                warm-up run). Defaults to 3.
+
+    Returns:
+        list: One dict per setting with keys 'settings' (label), 'seconds'
+              (best of repeat), 'bytes', 'ratio' (size relative to the raw
+              pixels) and 'max_error' (largest pixel change after decoding)
+    """
+    rows = []
+    for options in settings:
+        encoder = SketchEncoder(**options)
+        data = encoder.encode(image)
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            encoder.encode(image)
+            timings.append(time.perf_counter() - start)
+
+        flags = cv2.IMREAD_GRAYSCALE if image.ndim == 2 else cv2.IMREAD_UNCHANGED
+        decoded = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+        rows.append({
+            'settings': " ".join(f"{name}={value}" for name, value in options.items()),
+            'seconds': min(timings),
+            'bytes': len(data),
+            'ratio': len(data) / image.nbytes,
+            'max_error': int(np.abs(decoded.astype(np.int16) - image.astype(np.int16)).max()),
+        })
+    return rows
+
+def format_encoding_report(rows):
+    """
+    Format the rows returned by compare_encoders() as a text table.
+
+    Args:
+        rows (list): Report rows
+
+    Returns:
+        str: The formatted table
+    """
+    width = max([len(row['settings']) for row in rows] + [8])
+    lines = [f"{'settings':<{width}}  {'time (ms)':>9}  {'size (KB)':>9}  {'ratio':>6}  {'max err':>7}"]
+    for row in rows:
+        lines.append(f"{row['settings']:<{width}}  {row['seconds'] * 1000:>9.1f}  "
+                     f"{row['bytes'] / 1024:>9.1f}  {row['ratio']:>6.3f}  {row['max_error']:>7}")
+    return "\n".join(lines)
+
+def main():
+    """Print a write-time vs file-size report for the sketch of an image."""
+    parser = argparse.ArgumentParser(description="Compare output encoder settings on the sketch of an image")
+    parser.add_argument("input", help="Path to the input image")
+    parser.add_argument("-b", "--blur", type=int, default=21,
+                        help="Kernel size for Gaussian blur (default: 21)")
+    parser.add_argument("-n", "--repeat", type=int, default=3,
+                        help="Timed repetitions per setting (default: 3)")
+    args = parser.parse_args()
+
+    # Imported here to avoid a circular import with converter
+    from .converter import ImageToSketchConverter
+
+    try:
+        sketch = ImageToSketchConverter(args.blur).convert(args.input, save=False)
+        print(format_encoding_report(compare_encoders(sketch, repeat=args.repeat)))
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,44 @@
 """
 GUI module for the Image to Pencil Sketch converter using Tkinter.
 """
+import functools
+import queue
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
-import cv2
 from pathlib import Path
-from .converter import ImageToSketchConverter
-from .utils import validate_image, create_output_path
+from .options import BLUR_METHODS, PRESET_NAMES
+
+# OpenCV-backed modules are imported on first use so the window opens without
+# waiting for OpenCV and numpy to load.
+
+# Longest side of the preview thumbnails
+PREVIEW_SIZE = 300
+
+# Delay before re-rendering the live preview after a parameter change (ms)
+PREVIEW_DELAY = 30
+
+# Interval at which the main thread checks on a running conversion (ms)
+POLL_INTERVAL = 50
+
+# Status shown while each conversion stage runs, keyed by the stage before it
+STAGE_STATUS = {
+    None: "Reading image...",
+    'read': "Decoding image...",
+    'decode': "Converting to grayscale...",
+    'grayscale': "Blurring...",
+    'blur': "Dividing...",
+    'divide': "Encoding sketch...",
+    'encode': "Writing sketch...",
+    'write': "Finishing...",
+}
+
+# Status shown after a pipeline stage (clahe, edges, ...), which has no fixed slot
+PIPELINE_STATUS = "Applying sketch stages..."
+
+class ConversionCancelled(Exception):
+    """Raised inside the worker thread when the user cancels a conversion."""
 
 class SketchConverterGUI:
     def __init__(self, root):
@@ -21,9 +52,26 @@ class SketchConverterGUI:
         self.output_path = tk.StringVar()
         self.blur_kernel_size = tk.IntVar(value=21)
         self.scale = tk.DoubleVar(value=256.0)
+        self.blur_method = tk.StringVar(value="exact")
+        self.preset = tk.StringVar(value="classic")
+        self.status = tk.StringVar(value="Ready")
+        
+        # Live preview of the input and the pending re-render
+        self.preview = None
+        self._preview_job = None
+        
+        # Background conversion state
+        self._worker = None
+        self._events = queue.Queue()
+        self._cancel = threading.Event()
         
         self.setup_ui()
         
+        # Re-render the sketch preview whenever a parameter changes
+        for variable in (self.blur_kernel_size, self.scale, self.blur_method):
+            variable.trace_add("write", self.schedule_preview)
+        self.preset.trace_add("write", self.apply_preset)
+    
     def setup_ui(self):
         # Main frame
         main_frame = ttk.Frame(self.root, padding="10")
@@ -49,17 +97,33 @@ class SketchConverterGUI:
         ttk.Label(params_frame, text="Scale Factor:").grid(row=1, column=0, sticky=tk.W, pady=5)
         ttk.Spinbox(params_frame, from_=1, to=1000, increment=10, textvariable=self.scale, width=10).grid(row=1, column=1, padx=5)
         
+        ttk.Label(params_frame, text="Blur Method:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        ttk.Combobox(params_frame, values=BLUR_METHODS, textvariable=self.blur_method, state="readonly", width=8).grid(row=2, column=1, padx=5)
+        
+        ttk.Label(params_frame, text="Preset:").grid(row=3, column=0, sticky=tk.W, pady=5)
+        ttk.Combobox(params_frame, values=PRESET_NAMES, textvariable=self.preset, state="readonly", width=14).grid(row=3, column=1, padx=5)
+        
         # Buttons
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=3, column=0, columnspan=3, pady=10)
         
-        ttk.Button(button_frame, text="Convert", command=self.convert).pack(side=tk.LEFT, padx=5)
+        self.convert_button = ttk.Button(button_frame, text="Convert", command=self.convert)
+        self.convert_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Reset", command=self.reset).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Exit", command=self.root.quit).pack(side=tk.LEFT, padx=5)
         
+        # Progress
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E))
+        self.progress = ttk.Progressbar(progress_frame, maximum=1.0, length=300)
+        self.progress.pack(side=tk.LEFT, padx=5)
+        ttk.Label(progress_frame, textvariable=self.status).pack(side=tk.LEFT, padx=5)
+        
         # Image preview
         preview_frame = ttk.LabelFrame(main_frame, text="Preview", padding="10")
-        preview_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
+        preview_frame.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
         
         self.original_label = ttk.Label(preview_frame, text="Original Image")
         self.original_label.pack(side=tk.LEFT, padx=10, pady=10)
@@ -71,7 +135,7 @@ class SketchConverterGUI:
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
         main_frame.columnconfigure(1, weight=1)
-        
+    
     def browse_input(self):
         file_path = filedialog.askopenfilename(
             title="Select Input Image",
@@ -80,9 +144,10 @@ class SketchConverterGUI:
         if file_path:
             self.input_path.set(file_path)
             # Auto-generate output path
+            from .utils import create_output_path
             if not self.output_path.get():
                 self.output_path.set(create_output_path(file_path))
-            self.preview_image(file_path, self.original_label)
+            self.load_preview(file_path)
     
     def browse_output(self):
         file_path = filedialog.asksaveasfilename(
@@ -93,51 +158,208 @@ class SketchConverterGUI:
         if file_path:
             self.output_path.set(file_path)
     
-    def preview_image(self, image_path, label):
+    def load_preview(self, image_path):
+        """Decode a downscaled copy of the input once and show both previews."""
         try:
-            image = Image.open(image_path)
-            image.thumbnail((300, 300))
-            photo = ImageTk.PhotoImage(image)
-            label.configure(image=photo)
-            label.image = photo
+            from .converter import SketchPreview
+            
+            # Decode at reduced resolution instead of thumbnailing the full image
+            self.preview = SketchPreview.from_file(image_path, PREVIEW_SIZE, stages=self._stages())
+            self.show_array(self.preview.image, self.original_label)
+            self.update_preview()
         except Exception as e:
+            self.preview = None
             messagebox.showerror("Error", f"Could not preview image: {e}")
     
+    def _stages(self):
+        """Return the stages of the selected preset."""
+        from .converter import load_preset
+        
+        return load_preset(self.preset.get()).get('stages', [])
+    
+    def apply_preset(self, *args):
+        """Load the selected preset's parameters and re-render the preview with its stages."""
+        from .converter import load_preset
+        
+        settings = load_preset(self.preset.get())
+        # Setting the variables schedules a preview re-render
+        self.blur_kernel_size.set(settings.get('blur_kernel_size', 21))
+        self.scale.set(settings.get('scale', 256.0))
+        self.blur_method.set(settings.get('blur_method', "exact"))
+        if self.preview is not None:
+            self.load_preview(self.input_path.get())
+    
+    def schedule_preview(self, *args):
+        """Re-render the sketch preview shortly, coalescing rapid changes."""
+        if self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+        self._preview_job = self.root.after(PREVIEW_DELAY, self.update_preview)
+    
+    def update_preview(self):
+        """Render the sketch preview from the cached grayscale and blur."""
+        self._preview_job = None
+        if self.preview is None:
+            return
+        try:
+            sketch = self.preview.render(self.blur_kernel_size.get(), self.scale.get(),
+                                         self.blur_method.get())
+        except (tk.TclError, ValueError):
+            # Half-typed or even values in the Spinboxes; keep the last preview
+            return
+        self.show_array(sketch, self.sketch_label)
+    
+    def show_array(self, image, label):
+        """Show a BGR or grayscale array in a label, shrunk to the preview size."""
+        import cv2
+        
+        longest = max(image.shape[:2])
+        if longest > PREVIEW_SIZE:
+            factor = PREVIEW_SIZE / longest
+            image = cv2.resize(image, (max(round(image.shape[1] * factor), 1),
+                                       max(round(image.shape[0] * factor), 1)),
+                               interpolation=cv2.INTER_AREA)
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGB if image.shape[2] == 4 else cv2.COLOR_BGR2RGB)
+        photo = ImageTk.PhotoImage(Image.fromarray(image))
+        label.configure(image=photo)
+        label.image = photo
+    
     def convert(self):
+        if self._worker is not None:
+            return
+        
+        input_path = self.input_path.get()
+        output_path = self.output_path.get()
+        
+        if not input_path:
+            messagebox.showerror("Error", "Please select an input image")
+            return
+        
+        if not output_path:
+            messagebox.showerror("Error", "Please select an output path")
+            return
+        
+        # Each conversion gets its own cancel flag and event queue, so a job that
+        # reset() abandoned can never report into the one that replaced it
+        cancel = threading.Event()
+        events = queue.Queue()
+        
         try:
-            input_path = self.input_path.get()
-            output_path = self.output_path.get()
-            
-            if not input_path:
-                messagebox.showerror("Error", "Please select an input image")
-                return
-            
-            if not output_path:
-                messagebox.showerror("Error", "Please select an output path")
-                return
-            
-            validate_image(input_path)
+            from .converter import ImageToSketchConverter
+            from .metrics import ConversionMetrics
             
+            # Stage callbacks report progress and are where cancellation takes effect
             converter = ImageToSketchConverter(
                 self.blur_kernel_size.get(),
-                self.scale.get()
+                self.scale.get(),
+                blur_method=self.blur_method.get(),
+                metrics=ConversionMetrics(callback=functools.partial(self._on_stage, cancel, events)),
+                stages=self._stages()
             )
-            
+        except Exception as e:
+            messagebox.showerror("Error", f"Conversion failed: {e}")
+            return
+        
+        # Run the conversion off the Tk thread so the window stays responsive
+        self._cancel = cancel
+        self._events = events
+        self._worker = threading.Thread(target=self._run_conversion,
+                                        args=(converter, input_path, output_path, events),
+                                        daemon=True)
+        self.convert_button.configure(state=tk.DISABLED)
+        self.cancel_button.configure(state=tk.NORMAL)
+        self.progress['value'] = 0.0
+        self.status.set(STAGE_STATUS[None])
+        self._worker.start()
+        self.root.after(POLL_INTERVAL, self._poll_worker, events)
+    
+    def cancel(self):
+        """Ask the running conversion to stop at the next stage boundary."""
+        if self._worker is not None:
+            self._cancel.set()
+            self.status.set("Cancelling...")
+    
+    def _on_stage(self, cancel, events, stage, seconds):
+        """Metrics callback, run in the worker thread after each stage of one job."""
+        # Once written, the sketch is kept even if cancel was pressed late
+        if cancel.is_set() and stage != 'write':
+            raise ConversionCancelled()
+        events.put(('stage', stage))
+    
+    def _run_conversion(self, converter, input_path, output_path, events):
+        """Worker thread: convert the image and report the outcome to the main thread."""
+        try:
+            # convert() validates and decodes the input in a single pass
             sketch = converter.convert(input_path, output_path)
+            events.put(('done', sketch, output_path))
+        except ConversionCancelled:
+            events.put(('cancelled',))
+        except Exception as e:
+            events.put(('error', e))
+    
+    def _poll_worker(self, events):
+        """Apply events from the worker thread; Tk may only be used from the main thread."""
+        from .metrics import STAGES
+        
+        # reset() superseded this job: drop whatever its worker still reports
+        if events is not self._events:
+            return
+        
+        while True:
+            try:
+                event = events.get_nowait()
+            except queue.Empty:
+                break
             
-            # Preview the sketch
-            self.preview_image(output_path, self.sketch_label)
-            
-            messagebox.showinfo("Success", f"Sketch saved to {output_path}")
+            if event[0] == 'stage':
+                if not self._cancel.is_set():
+                    # Pipeline stages keep the progress of the built-in stage before them
+                    if event[1] in STAGES:
+                        self.progress['value'] = (STAGES.index(event[1]) + 1) / len(STAGES)
+                    self.status.set(STAGE_STATUS.get(event[1], PIPELINE_STATUS))
+                continue
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Conversion failed: {e}")
+            self._finish_conversion()
+            if event[0] == 'done':
+                _, sketch, output_path = event
+                self.progress['value'] = 1.0
+                self.status.set(f"Saved {Path(output_path).name}")
+                # Preview the sketch straight from the array
+                self.show_array(sketch, self.sketch_label)
+                messagebox.showinfo("Success", f"Sketch saved to {output_path}")
+            elif event[0] == 'cancelled':
+                self.progress['value'] = 0.0
+                self.status.set("Cancelled")
+            else:
+                self.progress['value'] = 0.0
+                self.status.set("Failed")
+                messagebox.showerror("Error", f"Conversion failed: {event[1]}")
+            return
+        
+        self.root.after(POLL_INTERVAL, self._poll_worker, events)
+    
+    def _finish_conversion(self):
+        """Re-enable the controls after the worker thread has finished."""
+        self._worker = None
+        self.convert_button.configure(state=tk.NORMAL)
+        self.cancel_button.configure(state=tk.DISABLED)
     
     def reset(self):
+        if self._worker is not None:
+            # Stop the running job at its next stage and detach it right away,
+            # so its late "Cancelled" or result cannot overwrite the reset state
+            self._cancel.set()
+            self._events = queue.Queue()
+            self._finish_conversion()
         self.input_path.set("")
         self.output_path.set("")
         self.blur_kernel_size.set(21)
         self.scale.set(256.0)
+        self.blur_method.set("exact")
+        self.preview = None
+        self.preset.set("classic")
+        self.progress['value'] = 0.0
+        self.status.set("Ready")
         self.original_label.configure(image='', text="Original Image")
         self.sketch_label.configure(image='', text="Sketch Image")
 
@@ -148,4 +370,4 @@ def create_gui():
     root.mainloop()
 
 if __name__ == "__main__":
-    create_gui()
\ No newline at end of file
+    create_gui()
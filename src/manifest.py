@@ -0,0 +1,199 @@
+"""
+Persistent manifest of completed conversions for incremental batches.
+"""
+import hashlib
+import json
+import os
+
+# Read size used when hashing input files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_hash(path):
+    """
+    Hash the contents of a file.
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def input_info(stat, data=None):
+    """
+    Describe an input as the manifest records it.
+
+    Args:
+        stat (os.stat_result): Status of the input, taken before it was read
+        data (bytes, optional): The bytes that were read, to hash
+
+    Returns:
+        dict: 'size', 'mtime_ns' and 'hash' (None without data)
+    """
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': hashlib.blake2b(data, digest_size=20).hexdigest() if data is not None else None,
+    }
+
+class BatchManifest:
+    """
+    Record of which inputs have been converted, with which settings, to where.
+
+    Each completed conversion is appended to the manifest file as one JSON line
+    and flushed immediately, so an interrupted run loses nothing it finished.
+    Later entries for the same input replace earlier ones; close() compacts the
+    file to one line per input.
+
+    An input is up to date when its output exists, the converter parameters and
+    output path match, and its size and modification time are unchanged. If
+    only the modification time changed (e.g. the file was touched or copied),
+    the recorded content hash decides.
+
+    Attributes:
+        path (str): Path of the manifest file
+        up_to_date (int): Number of inputs found up to date since opening
+        recorded (int): Number of conversions recorded since opening
+    """
+
+    def __init__(self, path, hash_inputs=True):
+        """
+        Open (or create) a manifest.
+
+        Args:
+            path (str): Path of the manifest file
+            hash_inputs (bool, optional): Record a content hash of each input so
+                                          touched-but-unchanged files are still
+                                          recognized. Defaults to True.
+        """
+        self.path = str(path)
+        self.hash_inputs = hash_inputs
+        self.up_to_date = 0
+        self.recorded = 0
+        self._entries = {}
+        self._file = None
+        self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _load(self):
+        """Read existing entries, ignoring a truncated last line from a crash."""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._entries[entry['input']] = entry
+
+    def is_up_to_date(self, image_path, output_path, params):
+        """
+        Check whether an input can reuse its recorded output.
+
+        Args:
+            image_path (str): Path to the input image
+            output_path (str): Path the sketch would be written to
+            params (dict): Converter parameters that affect the sketch
+
+        Returns:
+            bool: True if the recorded output can be reused
+        """
+        entry = self._entries.get(os.path.abspath(image_path))
+        if entry is None:
+            return False
+        if entry['params'] != params or entry['output'] != os.path.abspath(output_path):
+            return False
+        if not os.path.exists(output_path):
+            return False
+
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return False
+        if stat.st_size != entry['size']:
+            return False
+
+        if stat.st_mtime_ns != entry['mtime_ns']:
+            if not entry.get('hash') or file_hash(image_path) != entry['hash']:
+                return False
+            # Same content, new timestamp: remember it to skip hashing next time
+            self._append(dict(entry, mtime_ns=stat.st_mtime_ns))
+
+        self.up_to_date += 1
+        return True
+
+    def record(self, image_path, output_path, params, info=None):
+        """
+        Record a completed conversion.
+
+        Args:
+            image_path (str): Path to the input image
+            output_path (str): Path the sketch was written to
+            params (dict): Converter parameters used
+            info (dict, optional): input_info() of the bytes that were
+                                   converted. Without it the input is read
+                                   again to hash it, which also misses changes
+                                   made since the conversion.
+        """
+        if info is None:
+            stat = os.stat(image_path)
+            info = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'hash': file_hash(image_path) if self.hash_inputs else None,
+            }
+        elif not self.hash_inputs:
+            info = dict(info, hash=None)
+        self._append({
+            'input': os.path.abspath(image_path),
+            'output': os.path.abspath(output_path),
+            'size': info['size'],
+            'mtime_ns': info['mtime_ns'],
+            'hash': info['hash'],
+            'params': params,
+        })
+        self.recorded += 1
+
+    def _append(self, entry):
+        """Store an entry and append it to the manifest file."""
+        self._entries[entry['input']] = entry
+
+        if self._file is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a+')
+            # Terminate a line left truncated by an interrupted run
+            if self._file.tell() > 0:
+                self._file.seek(self._file.tell() - 1)
+                if self._file.read(1) != '\n':
+                    self._file.write('\n')
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+
+    def close(self):
+        """Compact the manifest to one line per input and close it."""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry) + '\n')
+        os.replace(temp_path, self.path)
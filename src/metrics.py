@@ -0,0 +1,229 @@
+"""
+Per-stage timings and counters for conversions.
+
+Attach a ConversionMetrics to a converter to see where time goes (reading,
+decoding, grayscale conversion, blur, divide, encoding, writing) and how much
+data was processed. The collected numbers can be printed as a breakdown or
+exported as JSON or in the Prometheus text exposition format.
+"""
+import json
+import os
+import threading
+import time
+
+# Stages timed by the converter, in pipeline order
+STAGES = ('read', 'decode', 'grayscale', 'blur', 'divide', 'encode', 'write')
+
+# Counters kept by the converter, with their descriptions
+COUNTERS = {
+    'bytes_read': "Encoded input bytes read",
+    'bytes_written': "Encoded output bytes written",
+    'pixels_processed': "Pixels run through the sketch computation",
+    'images_processed': "Sketches computed (cache hits excluded)",
+}
+
+class _StageTimer:
+    """Context manager recording the time spent in its block."""
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+
+class ConversionMetrics:
+    """
+    Thread-safe stage timings and counters.
+
+    One instance can be shared by every thread of a batch. Worker processes
+    (use_processes=True) update their own copy, so their numbers are not
+    collected.
+
+    Attributes:
+        callback (callable): Called as callback(stage, seconds) after every
+                             timed stage, from the thread that ran it, or None
+    """
+
+    def __init__(self, callback=None):
+        """
+        Initialize empty metrics.
+
+        Args:
+            callback (callable, optional): Called as callback(stage, seconds)
+                                           after every timed stage, e.g. to
+                                           feed an external tracer
+        """
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = dict.fromkeys(COUNTERS, 0)
+
+    def __getstate__(self):
+        # Locks cannot be pickled; worker processes get their own
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """
+        Time a block of code as a stage.
+
+        Usage:
+            with metrics.stage("decode"):
+                ...
+
+        Args:
+            name (str): Stage name
+
+        Returns:
+            Context manager recording the block's duration
+        """
+        return _StageTimer(self, name)
+
+    def record(self, name, seconds):
+        """
+        Add one timed call to a stage.
+
+        Args:
+            name (str): Stage name
+            seconds (float): Duration of the call
+        """
+        with self._lock:
+            calls, total = self._stages.get(name, (0, 0.0))
+            self._stages[name] = (calls + 1, total + seconds)
+        if self.callback is not None:
+            self.callback(name, seconds)
+
+    def count(self, name, amount=1):
+        """
+        Increase a counter.
+
+        Args:
+            name (str): Counter name, e.g. 'bytes_read'
+            amount (int, optional): Amount to add. Defaults to 1.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def reset(self):
+        """Clear all timings and counters."""
+        with self._lock:
+            self._stages = {}
+            self._counters = dict.fromkeys(COUNTERS, 0)
+
+    def to_dict(self):
+        """
+        Return a snapshot of the metrics.
+
+        Returns:
+            dict: {'stages': {name: {'calls', 'seconds'}}, 'counters': {name: value}}
+                  with stages in pipeline order
+        """
+        with self._lock:
+            stages = dict(self._stages)
+            counters = dict(self._counters)
+        order = [name for name in STAGES if name in stages] + \
+                [name for name in stages if name not in STAGES]
+        return {
+            'stages': {name: {'calls': stages[name][0], 'seconds': stages[name][1]} for name in order},
+            'counters': counters,
+        }
+
+    def to_json(self, indent=None):
+        """
+        Export the metrics as JSON.
+
+        Args:
+            indent (int, optional): Indentation passed to json.dumps
+
+        Returns:
+            str: JSON document (see to_dict)
+        """
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self, prefix="sketch"):
+        """
+        Export the metrics in the Prometheus text exposition format.
+
+        Args:
+            prefix (str, optional): Metric name prefix. Defaults to "sketch".
+
+        Returns:
+            str: Exposition text, e.g. for the node exporter textfile collector
+        """
+        snapshot = self.to_dict()
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Time spent in each conversion stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        for name, stage in snapshot['stages'].items():
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{name}"}} {stage["seconds"]:.6f}')
+        lines += [
+            f"# HELP {prefix}_stage_calls_total Number of timed calls of each conversion stage.",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        for name, stage in snapshot['stages'].items():
+            lines.append(f'{prefix}_stage_calls_total{{stage="{name}"}} {stage["calls"]}')
+        for name, value in snapshot['counters'].items():
+            lines += [
+                f"# HELP {prefix}_{name}_total {COUNTERS.get(name, name)}.",
+                f"# TYPE {prefix}_{name}_total counter",
+                f"{prefix}_{name}_total {value}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Write the metrics to a file: JSON for .json paths, Prometheus text otherwise.
+
+        The file is replaced atomically so scrapers never read a partial file.
+
+        Args:
+            path (str): Output path
+        """
+        path = str(path)
+        text = self.to_json(indent=2) + "\n" if path.lower().endswith(".json") else self.to_prometheus()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+    def format_profile(self, elapsed=None):
+        """
+        Format the stage breakdown as a text table.
+
+        Args:
+            elapsed (float, optional): Wall-clock time of the run, for throughput
+
+        Returns:
+            str: The formatted table followed by the counters
+        """
+        snapshot = self.to_dict()
+        total = sum(stage['seconds'] for stage in snapshot['stages'].values())
+        width = max([len(name) for name in snapshot['stages']] + [5])
+        lines = [f"{'stage':<{width}}  {'calls':>6}  {'total (ms)':>10}  {'mean (ms)':>9}  {'share':>6}"]
+        for name, stage in snapshot['stages'].items():
+            share = stage['seconds'] / total if total > 0 else 0.0
+            lines.append(f"{name:<{width}}  {stage['calls']:>6}  {stage['seconds'] * 1000:>10.1f}  "
+                         f"{stage['seconds'] * 1000 / stage['calls']:>9.2f}  {share:>6.1%}")
+        lines.append(f"{'total':<{width}}  {'':>6}  {total * 1000:>10.1f}")
+
+        counters = snapshot['counters']
+        summary = (f"Read {counters['bytes_read'] / 1e6:.1f} MB, wrote {counters['bytes_written'] / 1e6:.1f} MB, "
+                   f"processed {counters['pixels_processed'] / 1e6:.1f} MP in "
+                   f"{counters['images_processed']} image(s)")
+        if elapsed:
+            summary += f" ({counters['pixels_processed'] / 1e6 / elapsed:.1f} MP/s)"
+        lines.append(summary)
+        return "\n".join(lines)
@@ -0,0 +1,18 @@
+"""
+Option values shared by the library, CLI and GUI.
+
+This module has no third-party dependencies, so argument parsing and
+`--help` can use these values without loading OpenCV or numpy.
+"""
+
+# Blur strategies of the sketch kernel (see blur.py)
+BLUR_METHODS = ('exact', 'pyramid', 'box')
+
+# Formats sketches can be written as (see encoding.py)
+OUTPUT_FORMATS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tif', '.tiff')
+
+# zlib strategies for PNG output (see encoding.PNG_STRATEGIES)
+PNG_STRATEGY_NAMES = ('default', 'filtered', 'huffman', 'rle', 'fixed')
+
+# Built-in sketch presets (see converter.PRESETS)
+PRESET_NAMES = ('classic', 'high-contrast', 'ink', 'textured-paper', 'colored-pencil')
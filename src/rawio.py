@@ -0,0 +1,200 @@
+"""
+Memory-mapped image arrays: raw files with a JSON sidecar, NPY and TIFF.
+
+Scientific and remote-sensing images are often too large to decode into RAM.
+Mapping them lets tiled conversions touch one strip at a time; the operating
+system pages rows in as they are read and out as they are released.
+
+A raw file is headerless pixel data. Its layout lives in a sidecar next to it
+(image.raw -> image.raw.json):
+
+    {"shape": [40000, 60000], "dtype": "uint8", "offset": 0}
+
+TIFF files need the optional tifffile package, and only uncompressed,
+contiguous TIFFs can be mapped.
+"""
+import json
+import mmap
+from pathlib import Path
+import numpy as np
+
+# Extensions of the formats that can be memory-mapped
+RAW_FORMATS = ('.raw',)
+TIFF_FORMATS = ('.tif', '.tiff')
+MEMMAP_FORMATS = RAW_FORMATS + ('.npy',) + TIFF_FORMATS
+
+def _tifffile():
+    """Import tifffile, explaining how to get it when it is missing."""
+    try:
+        import tifffile
+    except ImportError:
+        raise ImportError("Memory-mapped TIFF files need the tifffile package "
+                          "(pip install tifffile)") from None
+    return tifffile
+
+def has_tifffile():
+    """Return True if the optional tifffile package is installed."""
+    try:
+        _tifffile()
+    except ImportError:
+        return False
+    return True
+
+def is_mappable(path):
+    """
+    Return True if a path has a format open_memmap() can map.
+
+    TIFF files only count when tifffile is installed; without it they are
+    decoded as usual.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix in TIFF_FORMATS:
+        return has_tifffile()
+    return suffix in MEMMAP_FORMATS
+
+def sidecar_path(path):
+    """Return the path of the JSON sidecar describing a raw file."""
+    return Path(f"{path}.json")
+
+def read_sidecar(path):
+    """
+    Read the layout of a raw file from its sidecar.
+
+    Args:
+        path (str): Path to the raw file
+
+    Returns:
+        dict: {'shape': tuple, 'dtype': numpy.dtype, 'offset': int}
+
+    Raises:
+        FileNotFoundError: If the sidecar doesn't exist
+        ValueError: If the sidecar has no shape or dtype
+    """
+    sidecar = sidecar_path(path)
+    if not sidecar.exists():
+        raise FileNotFoundError(f"Raw file {path} has no sidecar; expected {sidecar} with its "
+                                "shape and dtype")
+    with open(sidecar) as f:
+        header = json.load(f)
+    if 'shape' not in header or 'dtype' not in header:
+        raise ValueError(f"Sidecar {sidecar} must give 'shape' and 'dtype'")
+    return {
+        'shape': tuple(header['shape']),
+        'dtype': np.dtype(header['dtype']),
+        'offset': header.get('offset', 0),
+    }
+
+def write_sidecar(path, shape, dtype, offset=0):
+    """
+    Write the sidecar describing a raw file.
+
+    Args:
+        path (str): Path to the raw file
+        shape (tuple): Array shape, e.g. (height, width) or (height, width, 3)
+        dtype (numpy.dtype): Pixel type
+        offset (int, optional): Bytes before the pixel data. Defaults to 0.
+    """
+    header = {'shape': list(shape), 'dtype': np.dtype(dtype).str, 'offset': offset}
+    with open(sidecar_path(path), "w") as f:
+        json.dump(header, f)
+        f.write("\n")
+
+def open_raw(path, shape=None, dtype=None, offset=0, mode='r'):
+    """
+    Map a raw file.
+
+    Args:
+        path (str): Path to the raw file
+        shape (tuple, optional): Array shape. Read from the sidecar if omitted.
+        dtype (numpy.dtype, optional): Pixel type. Read from the sidecar if omitted.
+        offset (int, optional): Bytes before the pixel data. Defaults to 0, or
+                                the sidecar's value when the shape comes from it.
+        mode (str, optional): numpy.memmap mode. Defaults to 'r'.
+
+    Returns:
+        numpy.memmap: The mapped array
+    """
+    if shape is None or dtype is None:
+        header = read_sidecar(path)
+        shape = shape or header['shape']
+        dtype = dtype or header['dtype']
+        offset = offset or header['offset']
+    return np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=tuple(shape))
+
+def open_memmap(path, mode='r'):
+    """
+    Map an existing raw, NPY or TIFF file.
+
+    Args:
+        path (str): Path to the file
+        mode (str, optional): 'r' for read-only, 'r+' to modify in place.
+                              Defaults to 'r'.
+
+    Returns:
+        numpy.memmap: The mapped array
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+        ValueError: If the format cannot be mapped (e.g. a compressed TIFF)
+    """
+    if not Path(path).exists():
+        raise FileNotFoundError(f"Image file not found: {path}")
+    suffix = Path(path).suffix.lower()
+    if suffix in RAW_FORMATS:
+        return open_raw(path, mode=mode)
+    if suffix == '.npy':
+        return np.load(path, mmap_mode=mode)
+    if suffix in TIFF_FORMATS:
+        return _tifffile().memmap(str(path), mode=mode)
+    raise ValueError(f"Cannot memory-map {suffix} files. Supported: {', '.join(MEMMAP_FORMATS)}")
+
+def create_memmap(path, shape, dtype=np.uint8):
+    """
+    Create a raw, NPY or TIFF file and map it for writing.
+
+    Args:
+        path (str): Output path; the extension selects the format
+        shape (tuple): Array shape
+        dtype (numpy.dtype, optional): Pixel type. Defaults to numpy.uint8.
+
+    Returns:
+        numpy.memmap: The mapped, zero-filled array
+    """
+    suffix = Path(path).suffix.lower()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    if suffix in RAW_FORMATS:
+        write_sidecar(path, shape, dtype)
+        return np.memmap(path, dtype=dtype, mode='w+', shape=tuple(shape))
+    if suffix == '.npy':
+        return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+    if suffix in TIFF_FORMATS:
+        return _tifffile().memmap(str(path), shape=tuple(shape), dtype=dtype)
+    raise ValueError(f"Cannot memory-map {suffix} files. Supported: {', '.join(MEMMAP_FORMATS)}")
+
+def release_rows(array, start, stop):
+    """
+    Drop the resident pages holding rows of a memory-mapped array.
+
+    The data stays in the file (and the page cache), so the rows can still be
+    read; they are just paged in again on access. Does nothing for arrays that
+    are not shared memory maps or on platforms without madvise.
+
+    Args:
+        array (numpy.ndarray): Mapped array, or a view of one
+        start (int): First row to release
+        stop (int): Row after the last one to release
+    """
+    mapping = getattr(array, '_mmap', None)
+    if (mapping is None or stop <= start or getattr(array, 'mode', 'c') == 'c'
+            or not hasattr(mapping, 'madvise') or not hasattr(mmap, 'MADV_DONTNEED')):
+        return
+
+    # Views share the mapping but not its offset, so locate the rows by address
+    base = np.frombuffer(mapping, dtype=np.uint8).__array_interface__['data'][0]
+    begin = array.__array_interface__['data'][0] - base + start * array.strides[0]
+    end = begin + (stop - start) * array.strides[0]
+    # Only pages entirely inside the rows are released
+    begin = -(-begin // mmap.PAGESIZE) * mmap.PAGESIZE
+    end = min(end // mmap.PAGESIZE * mmap.PAGESIZE, len(mapping))
+    if end > begin:
+        mapping.madvise(mmap.MADV_DONTNEED, begin, end - begin)
@@ -0,0 +1,230 @@
+"""
+OpenCV runtime settings and a report of the host's capabilities.
+
+OpenCV runs many operations on an internal thread pool and picks SIMD code
+paths (SSE, AVX2, AVX-512, NEON, ...) at run time. Both are process-wide.
+When conversions already run on an outer pool of workers, every worker
+starting a full-size OpenCV pool oversubscribes the cores. Pinning gives
+each worker an equal share instead. The system report shows what a host
+offers, to help tune each deployment:
+
+    python -m src.runtime
+    python -m src.runtime --json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import threading
+import cv2
+import numpy as np
+
+# Build information sections reported by system_info()
+BUILD_INFO_KEYS = ('Parallel framework', 'Baseline', 'Dispatched code generation', 'Intel IPP',
+                   'Lapack', 'OpenCL')
+
+# Nesting depth and saved settings of active pinned_threads() contexts
+_pin_lock = threading.Lock()
+_pin_depth = 0
+_pin_saved = None
+
+def opencv_settings():
+    """
+    Return OpenCV's current runtime settings.
+
+    Returns:
+        dict: {'threads': int, 'optimized': bool, 'opencl': bool}
+    """
+    return {
+        'threads': cv2.getNumThreads(),
+        'optimized': cv2.useOptimized(),
+        'opencl': cv2.ocl.useOpenCL(),
+    }
+
+def configure_opencv(threads=None, optimized=None, opencl=None):
+    """
+    Change OpenCV's process-wide runtime settings.
+
+    Settings left as None are not touched, and settings that already have the
+    requested value are not set again (resizing the thread pool is not free).
+
+    Args:
+        threads (int, optional): Threads of OpenCV's internal pool. 1 runs
+                                 every operation in the calling thread; a
+                                 negative value restores OpenCV's default.
+        optimized (bool, optional): Use the SIMD and IPP code paths
+        opencl (bool, optional): Run UMat operations on an OpenCL device when
+                                 one is available
+
+    Returns:
+        dict: The previous settings, for restoring them later
+    """
+    previous = opencv_settings()
+    if threads is not None and threads != previous['threads']:
+        cv2.setNumThreads(threads)
+    if optimized is not None and optimized != previous['optimized']:
+        cv2.setUseOptimized(optimized)
+    if opencl is not None and opencl != previous['opencl']:
+        cv2.ocl.setUseOpenCL(opencl)
+    return previous
+
+@contextlib.contextmanager
+def opencv_runtime(threads=None, optimized=None, opencl=None):
+    """Apply OpenCV runtime settings for the duration of a with block (see configure_opencv)."""
+    previous = configure_opencv(threads, optimized, opencl)
+    try:
+        yield
+    finally:
+        configure_opencv(**previous)
+
+def usable_cpus():
+    """Return the number of CPUs this process may run on (its affinity mask where known)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def pool_threads(workers, threads=None):
+    """
+    Return OpenCV threads per worker that keep a pool from oversubscribing.
+
+    Args:
+        workers (int): Workers in the outer pool
+        threads (int, optional): Threads to share between them. Defaults to
+                                 one per usable CPU.
+
+    Returns:
+        int: OpenCV threads for each worker (at least 1)
+    """
+    return max((threads or usable_cpus()) // max(workers, 1), 1)
+
+@contextlib.contextmanager
+def pinned_threads(threads):
+    """
+    Limit OpenCV's internal threads while an outer worker pool runs.
+
+    Contexts may overlap (e.g. concurrent batches); OpenCV's previous setting
+    is restored when the last one exits.
+
+    Args:
+        threads (int): OpenCV threads while the context is active, or None to
+                       leave the setting alone
+    """
+    global _pin_depth, _pin_saved
+    if threads is None:
+        yield
+        return
+    with _pin_lock:
+        previous = configure_opencv(threads=threads)
+        if _pin_depth == 0:
+            _pin_saved = previous['threads']
+        _pin_depth += 1
+    try:
+        yield
+    finally:
+        with _pin_lock:
+            _pin_depth -= 1
+            if _pin_depth == 0:
+                configure_opencv(threads=_pin_saved)
+
+def threads_pinned():
+    """Return whether a pinned_threads() context is active."""
+    return _pin_depth > 0
+
+def _build_info():
+    """Return selected lines of cv2.getBuildInformation() by key."""
+    info = {}
+    for line in cv2.getBuildInformation().splitlines():
+        key, _, value = line.strip().partition(':')
+        if key in BUILD_INFO_KEYS and key not in info and value.strip():
+            info[key] = value.strip()
+    return info
+
+def cpu_features():
+    """
+    Return the SIMD features of the CPU that OpenCV can use.
+
+    Returns:
+        list: Feature names such as 'SSE4.2', 'AVX2' or 'NEON'
+    """
+    features = []
+    for feature in range(512):
+        name = cv2.getHardwareFeatureName(feature)
+        if name and cv2.checkHardwareSupport(feature):
+            features.append(name)
+    return features
+
+def opencl_device():
+    """Return the name of the default OpenCL device, or None without one."""
+    if not cv2.ocl.haveOpenCL():
+        return None
+    try:
+        return cv2.ocl.Device.getDefault().name() or None
+    except cv2.error:
+        return None
+
+def system_info():
+    """
+    Describe the host, the OpenCV build and its runtime settings.
+
+    Returns:
+        dict: Versions, CPU count, SIMD features, threading backend, OpenCL
+              availability and the current OpenCV settings
+    """
+    build = _build_info()
+    return {
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'usable_cpus': usable_cpus(),
+        'parallel_framework': build.get('Parallel framework'),
+        'simd_baseline': build.get('Baseline'),
+        'simd_dispatched': build.get('Dispatched code generation'),
+        'cpu_features': cpu_features(),
+        'ipp': build.get('Intel IPP'),
+        'lapack': build.get('Lapack'),
+        'opencl_build': build.get('OpenCL'),
+        'opencl_available': cv2.ocl.haveOpenCL(),
+        'opencl_device': opencl_device(),
+        **{f'opencv_{key}': value for key, value in opencv_settings().items()},
+    }
+
+def format_system_info(info):
+    """
+    Format system_info() as aligned text.
+
+    Args:
+        info (dict): Result of system_info()
+
+    Returns:
+        str: One line per entry, values aligned
+    """
+    width = max(len(key) for key in info)
+    lines = []
+    for key, value in info.items():
+        if isinstance(value, list):
+            value = " ".join(value) or "none"
+        lines.append(f"{key:<{width}}  {'n/a' if value is None else value}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    """Print the system report from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Report the CPU features, threading backend and OpenCL support OpenCV uses"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        info = system_info()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(info, indent=2) if args.json else format_system_info(info))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""
+Long-running HTTP conversion server with a warm worker pool.
+
+Starting a process per image re-imports OpenCV and numpy and rebuilds the
+converter for every request. The server pays that once: a fixed pool of worker
+threads converts uploads while their scratch buffers and OpenCV's thread pool
+stay warm. Uploads wait in a bounded queue; when it is full, requests are
+rejected immediately with 503 so clients can back off instead of piling up.
+
+    python -m src.server --port 8000 -j 4
+    curl --data-binary @photo.jpg "http://127.0.0.1:8000/sketch?blur_kernel_size=31" -o sketch.png
+
+Endpoints:
+    POST /sketch   Raw image bytes in the body; parameters in the query string
+    GET  /healthz  Liveness and queue status as JSON
+    GET  /metrics  Stage timings and server counters (Prometheus text, or JSON
+                   with ?format=json)
+"""
+import argparse
+import contextlib
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import cv2
+import numpy as np
+from .batch import resolve_workers
+from .converter import ImageToSketchConverter
+from .encoding import normalize_format
+from .metrics import ConversionMetrics
+from .runtime import pinned_threads, pool_threads
+
+# Query parameters accepted by POST /sketch and their types
+SKETCH_PARAMS = {
+    'blur_kernel_size': int,
+    'scale': float,
+    'blur_method': str,
+    'max_dimension': int,
+}
+
+# Accepted (min, max) of the numeric parameters; the blur cost grows with the
+# kernel, so one request must not be able to tie up a worker for long
+SKETCH_LIMITS = {
+    'blur_kernel_size': (1, 255),
+    'scale': (1.0, 1000.0),
+    'max_dimension': (1, 65535),
+}
+
+# Content types of the output formats
+CONTENT_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp',
+    '.bmp': 'image/bmp',
+    '.tif': 'image/tiff',
+    '.tiff': 'image/tiff',
+}
+
+class SketchServer(ThreadingHTTPServer):
+    """
+    HTTP server converting uploaded images with a pool of warm worker threads.
+
+    Each connection is handled in its own thread, but only `workers` threads
+    convert images; the others wait for their job to finish.
+
+    Attributes:
+        workers (int): Number of conversion threads
+        queue_size (int): Maximum number of uploads waiting for a worker
+        max_upload_bytes (int): Largest accepted request body
+        request_timeout (float): Seconds a request waits for its sketch
+        metrics (ConversionMetrics): Stage timings and counters of all conversions
+        stats (dict): Request counters ('requests', 'converted', 'rejected',
+                      'failed') and 'request_seconds'
+    """
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 8000), workers=None, queue_size=16,
+                 max_upload_bytes=64 * 1024 * 1024, request_timeout=60.0, encoder=None,
+                 verbose=False, threads=None, pin_threads=True):
+        """
+        Bind the server and start the worker pool.
+
+        Args:
+            address (tuple, optional): (host, port) to listen on; port 0 picks a
+                                       free port. Defaults to ("127.0.0.1", 8000).
+            workers (int, optional): Conversion threads; 0 or None uses one per
+                                     CPU. Defaults to None.
+            queue_size (int, optional): Uploads that may wait for a worker before
+                                        requests are rejected with 503. Defaults to 16.
+            max_upload_bytes (int, optional): Largest accepted upload. Defaults to 64 MB.
+            request_timeout (float, optional): Seconds to wait for a conversion
+                                               before answering 504. Defaults to 60.
+            encoder (SketchEncoder, optional): Output settings of every converter
+            verbose (bool, optional): Log every request to stderr. Defaults to False.
+            threads (int, optional): OpenCV threads shared by the workers.
+                                     Defaults to None (one per usable CPU).
+            pin_threads (bool, optional): Give each worker an equal share of
+                                          OpenCV's threads so the pool does not
+                                          oversubscribe the cores. Defaults to True.
+        """
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        super().__init__(address, SketchRequestHandler)
+        self.workers = resolve_workers(workers or 0)
+        self.queue_size = queue_size
+        self.max_upload_bytes = max_upload_bytes
+        self.request_timeout = request_timeout
+        self.encoder = encoder
+        self.verbose = verbose
+        self.metrics = ConversionMetrics()
+        self.stats = {'requests': 0, 'converted': 0, 'rejected': 0, 'failed': 0,
+                      'request_seconds': 0.0}
+
+        # OpenCV's pool is process-wide; it is restored in server_close()
+        self._runtime = contextlib.ExitStack()
+        if pin_threads and self.workers > 1:
+            threads = pool_threads(self.workers, threads)
+        self._runtime.enter_context(pinned_threads(threads))
+
+        self._jobs = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._pool = [threading.Thread(target=self._work, name=f"sketch-worker-{index}", daemon=True)
+                      for index in range(self.workers)]
+        for thread in self._pool:
+            thread.start()
+        try:
+            self._warm_up()
+        except BaseException:
+            # Stop the workers and release the socket and OpenCV's setting
+            self.server_close()
+            raise
+
+    def converter(self, **params):
+        """
+        Create a converter for a request's parameters.
+
+        Converters are cheap to build; what stays warm are the worker threads
+        with their scratch buffers and OpenCV's thread pool.
+
+        Args:
+            **params: ImageToSketchConverter arguments (see SKETCH_PARAMS)
+
+        Returns:
+            ImageToSketchConverter: Converter reporting to the server's metrics
+
+        Raises:
+            ValueError: If a parameter is invalid
+        """
+        return ImageToSketchConverter(**params, encoder=self.encoder, metrics=self.metrics)
+
+    def submit(self, converter, data, format=None):
+        """
+        Queue an encoded image for conversion without blocking.
+
+        Args:
+            converter (ImageToSketchConverter): Converter to use
+            data (bytes): Encoded input image
+            format (str, optional): Output format. Defaults to the encoder's.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the encoded sketch
+
+        Raises:
+            queue.Full: If queue_size uploads are already waiting
+        """
+        future = Future()
+        self._jobs.put_nowait((converter, data, format, future))
+        return future
+
+    @property
+    def queue_depth(self):
+        """Number of uploads waiting for a worker."""
+        return self._jobs.qsize()
+
+    def count(self, name, amount=1):
+        """Increase a request counter."""
+        with self._lock:
+            self.stats[name] += amount
+
+    def server_close(self):
+        """Stop the worker pool and close the socket."""
+        for _ in self._pool:
+            # Block so every worker gets its sentinel even with a full queue
+            self._jobs.put(None)
+        for thread in self._pool:
+            thread.join()
+        self._runtime.close()
+        super().server_close()
+
+    def _work(self):
+        """Worker loop: convert queued uploads until a None sentinel arrives."""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            converter, data, format, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(converter.convert_bytes(data, format))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _warm_up(self):
+        """Run one small conversion per worker so the first requests are not slower."""
+        sample = cv2.imencode(".jpg", np.full((64, 64, 3), 128, dtype=np.uint8))[1].tobytes()
+        converter = ImageToSketchConverter(encoder=self.encoder)
+        futures = [self.submit(converter, sample) for _ in range(min(self.workers, self.queue_size))]
+        for future in futures:
+            future.result()
+
+    def prometheus_text(self):
+        """Return the conversion metrics and server counters in Prometheus text format."""
+        with self._lock:
+            stats = dict(self.stats)
+        lines = [self.metrics.to_prometheus().rstrip("\n")]
+        for name, help_text in (('requests', "Conversion requests received"),
+                                ('converted', "Conversion requests answered with a sketch"),
+                                ('rejected', "Conversion requests rejected because the queue was full"),
+                                ('failed', "Conversion requests that failed"),
+                                ('request_seconds', "Time spent answering conversion requests")):
+            lines += [
+                f"# HELP sketch_server_{name}_total {help_text}.",
+                f"# TYPE sketch_server_{name}_total counter",
+                f"sketch_server_{name}_total {stats[name]}",
+            ]
+        for name, help_text, value in (('queue_depth', "Uploads waiting for a worker", self.queue_depth),
+                                       ('queue_size', "Capacity of the upload queue", self.queue_size),
+                                       ('workers', "Conversion worker threads", self.workers)):
+            lines += [
+                f"# HELP sketch_server_{name} {help_text}.",
+                f"# TYPE sketch_server_{name} gauge",
+                f"sketch_server_{name} {value}",
+            ]
+        return "\n".join(lines) + "\n"
+
+def parse_sketch_params(query):
+    """
+    Parse and range-check the converter parameters of a request.
+
+    Args:
+        query (dict): Parsed query string (see urllib.parse.parse_qs)
+
+    Returns:
+        dict: ImageToSketchConverter arguments
+
+    Raises:
+        ValueError: If a parameter cannot be parsed or is out of range
+    """
+    params = {}
+    for name, values in query.items():
+        if name not in SKETCH_PARAMS:
+            continue
+        try:
+            value = SKETCH_PARAMS[name](values[-1])
+        except ValueError:
+            raise ValueError(f"Invalid {name}: {values[-1]!r}") from None
+        if name in SKETCH_LIMITS:
+            low, high = SKETCH_LIMITS[name]
+            if not low <= value <= high:
+                raise ValueError(f"{name} must be between {low} and {high}")
+        params[name] = value
+    return params
+
+class SketchRequestHandler(BaseHTTPRequestHandler):
+    """Request handler of SketchServer."""
+    server_version = "SketchServer/1.0"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/healthz":
+            self._send_json(200, {'status': 'ok', 'workers': self.server.workers,
+                                  'queue_depth': self.server.queue_depth,
+                                  'queue_size': self.server.queue_size})
+        elif url.path == "/metrics":
+            if parse_qs(url.query).get('format') == ['json']:
+                with self.server._lock:
+                    stats = dict(self.server.stats)
+                self._send_json(200, dict(self.server.metrics.to_dict(), server=stats))
+            else:
+                self._send(200, self.server.prometheus_text().encode(),
+                           "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._send_json(404, {'error': f"Unknown path: {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/sketch":
+            self._send_json(404, {'error': f"Unknown path: {url.path}"})
+            return
+
+        start = time.perf_counter()
+        self.server.count('requests')
+        try:
+            self._convert(parse_qs(url.query))
+        finally:
+            self.server.count('request_seconds', time.perf_counter() - start)
+
+    def _convert(self, query):
+        """Validate a conversion request, queue it and send the sketch."""
+        length = self.headers.get('Content-Length', "")
+        if not length.isdigit():
+            self.server.count('failed')
+            self.close_connection = True
+            self._send_json(411, {'error': "Content-Length is required"})
+            return
+        if int(length) > self.server.max_upload_bytes:
+            # The body is not read, so the connection cannot be reused
+            self.server.count('failed')
+            self.close_connection = True
+            self._send_json(413, {'error': f"Upload larger than {self.server.max_upload_bytes} bytes"})
+            return
+        data = self.rfile.read(int(length))
+
+        try:
+            params = parse_sketch_params(query)
+            format = normalize_format(query['format'][-1]) if 'format' in query else None
+            converter = self.server.converter(**params)
+        except ValueError as e:
+            self.server.count('failed')
+            self._send_json(400, {'error': str(e)})
+            return
+
+        try:
+            future = self.server.submit(converter, data, format)
+        except queue.Full:
+            # Backpressure: tell the client to retry rather than queueing unboundedly
+            self.server.count('rejected')
+            self._send_json(503, {'error': "Server busy, retry later"}, {'Retry-After': "1"})
+            return
+
+        try:
+            sketch = future.result(self.server.request_timeout)
+        except TimeoutError:
+            future.cancel()
+            self.server.count('failed')
+            self._send_json(504, {'error': "Conversion timed out"})
+            return
+        except ValueError as e:
+            # Undecodable uploads
+            self.server.count('failed')
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self.server.count('failed')
+            self._send_json(500, {'error': str(e)})
+            return
+
+        self.server.count('converted')
+        self._send(200, sketch, CONTENT_TYPES[format or converter.encoder.format])
+
+    def _send(self, status, body, content_type, headers=None):
+        """Send a complete response."""
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload, headers=None):
+        """Send a JSON response."""
+        self._send(status, json.dumps(payload).encode(), 'application/json', headers)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def main(argv=None):
+    """Run the conversion server until interrupted."""
+    parser = argparse.ArgumentParser(description="Serve pencil sketch conversions over HTTP")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("-p", "--port", type=int, default=8000,
+                        help="Port to listen on (default: 8000)")
+    parser.add_argument("-j", "--jobs", type=int, default=0,
+                        help="Conversion worker threads (0 = all CPUs, default: 0)")
+    parser.add_argument("--queue-size", type=int, default=16,
+                        help="Uploads that may wait for a worker before requests are rejected "
+                             "with 503 (default: 16)")
+    parser.add_argument("--max-upload", type=int, default=64,
+                        help="Largest accepted upload in MB (default: 64)")
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="Seconds a request waits for its sketch (default: 60)")
+    parser.add_argument("--threads", type=int,
+                        help="OpenCV threads shared by the workers (default: one per CPU)")
+    parser.add_argument("--no-pin-threads", action="store_true",
+                        help="Let every worker use all of OpenCV's threads")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="Log every request")
+    args = parser.parse_args(argv)
+
+    try:
+        server = SketchServer((args.host, args.port), args.jobs, args.queue_size,
+                              args.max_upload * 1024 * 1024, args.timeout, verbose=args.verbose,
+                              threads=args.threads, pin_threads=not args.no_pin_threads)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    host, port = server.server_address[:2]
+    print(f"Serving sketches on http://{host}:{port} with {server.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
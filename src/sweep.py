@@ -0,0 +1,215 @@
+"""
+Parameter sweeps: sketch one image with every blur kernel size and scale.
+
+Converting each combination from scratch repeats the decode, the grayscale
+conversion and the blur. A sweep decodes and converts to grayscale once,
+blurs once per kernel size and derives every scale from that blur with a
+single divide. An N x M sweep therefore costs about N blurs instead of N x M
+conversions. The results go to a contact sheet (one row per kernel size, one
+column per scale), to individual files, or both.
+
+    python -m src.sweep photo.jpg -b 11 21 31 51 -s 192 224 256 --sheet sheet.png
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+from .converter import SketchPreview, load_preset
+from .encoding import SketchEncoder
+from .options import BLUR_METHODS, OUTPUT_FORMATS, PRESET_NAMES
+from .utils import create_output_path
+
+def sweep(preview, kernel_sizes, scales, blur_method="exact"):
+    """
+    Render every combination of kernel size and scale.
+
+    Kernel sizes are the outer loop, so each blur is computed once and then
+    reused for all scales.
+
+    Args:
+        preview (SketchPreview): Image to sweep, with its grayscale version
+        kernel_sizes (iterable): Blur kernel sizes (odd)
+        scales (iterable): Scale factors of the divide
+        blur_method (str, optional): Blur strategy. Defaults to "exact".
+
+    Yields:
+        tuple: (blur_kernel_size, scale, sketch)
+    """
+    scales = list(scales)
+    for blur_kernel_size in kernel_sizes:
+        for scale in scales:
+            yield blur_kernel_size, scale, preview.render(blur_kernel_size, scale, blur_method)
+
+def sweep_label(blur_kernel_size, scale):
+    """Return the label of a sweep cell, e.g. 'b21 s256'."""
+    return f"b{blur_kernel_size} s{scale:g}"
+
+def contact_sheet(sketches, kernel_sizes, scales, cell_size=256, padding=8):
+    """
+    Lay out sweep results in a labelled grid.
+
+    Each sketch is shrunk to its cell as it arrives, so only the sheet is kept
+    in memory, not the full-size sketches.
+
+    Args:
+        sketches (iterable): (blur_kernel_size, scale, sketch) tuples, e.g. from sweep()
+        kernel_sizes (list): Kernel sizes, one row each
+        scales (list): Scales, one column each
+        cell_size (int, optional): Longest side of each cell. Defaults to 256.
+        padding (int, optional): Space between cells. Defaults to 8.
+
+    Returns:
+        numpy.ndarray: The contact sheet as a uint8 image, 3-channel if the
+                       sketches are
+    """
+    rows = {blur_kernel_size: i for i, blur_kernel_size in enumerate(kernel_sizes)}
+    columns = {scale: i for i, scale in enumerate(scales)}
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    font_scale = max(cell_size / 512, 0.35)
+    label_height = cv2.getTextSize("b0", font, font_scale, 1)[0][1] + 2 * padding
+
+    sheet = None
+    for blur_kernel_size, scale, sketch in sketches:
+        if sheet is None:
+            height, width = sketch.shape[:2]
+            factor = min(cell_size / max(height, width), 1.0)
+            cell_width = max(round(width * factor), 1)
+            cell_height = max(round(height * factor), 1)
+            step_x = cell_width + padding
+            step_y = cell_height + label_height
+            sheet = np.full((len(rows) * step_y + padding, len(columns) * step_x + padding)
+                            + sketch.shape[2:], 255, dtype=np.uint8)
+
+        if sketch.shape[:2] != (cell_height, cell_width):
+            sketch = cv2.resize(sketch, (cell_width, cell_height), interpolation=cv2.INTER_AREA)
+        top = padding + rows[blur_kernel_size] * step_y
+        left = padding + columns[scale] * step_x
+        sheet[top:top + cell_height, left:left + cell_width] = sketch
+        cv2.putText(sheet, sweep_label(blur_kernel_size, scale),
+                    (left, top + cell_height + label_height - padding), font, font_scale,
+                    (0, 0, 0), 1, cv2.LINE_AA)
+
+    if sheet is None:
+        raise ValueError("Nothing to lay out: kernel_sizes and scales must not be empty")
+    return sheet
+
+def sweep_image(image_path, kernel_sizes, scales, output_dir=None, sheet_path=None,
+                blur_method="exact", max_dimension=None, exact=True, encoder=None, cell_size=256,
+                stages=None):
+    """
+    Sweep an image file and write the results.
+
+    Args:
+        image_path (str): Path to the input image
+        kernel_sizes (list): Blur kernel sizes (odd)
+        scales (list): Scale factors of the divide
+        output_dir (str, optional): Directory to write one sketch per combination
+                                    to, named <stem>_b<kernel>_s<scale>
+        sheet_path (str, optional): Path to write the contact sheet to
+        blur_method (str, optional): Blur strategy. Defaults to "exact".
+        max_dimension (int, optional): Sweep a copy of the image reduced to this
+                                       longest side; kernel sizes still refer to
+                                       the full resolution. Defaults to None.
+        exact (bool, optional): Match the converter's exact mode. Defaults to True.
+        encoder (SketchEncoder, optional): Encoder settings for the written files
+        cell_size (int, optional): Longest side of each contact sheet cell.
+                                   Defaults to 256.
+        stages (SketchPipeline or list, optional): Extra stages applied to every
+                                                   combination. Defaults to None.
+
+    Returns:
+        dict: Mapping of (blur_kernel_size, scale) to the written sketch path
+              (empty without output_dir)
+    """
+    if output_dir is None and sheet_path is None:
+        raise ValueError("Give an output_dir, a sheet_path or both")
+    for blur_kernel_size in kernel_sizes:
+        if blur_kernel_size % 2 == 0:
+            raise ValueError(f"blur_kernel_size must be an odd number, got {blur_kernel_size}")
+
+    encoder = encoder or SketchEncoder()
+    preview = SketchPreview.from_file(image_path, max_dimension, exact, stages)
+    # Kernel sizes are swept in order, so one cached blur is enough
+    preview.max_cached = 1
+    paths = {}
+
+    def results():
+        for blur_kernel_size, scale, sketch in sweep(preview, kernel_sizes, scales, blur_method):
+            if output_dir is not None:
+                path = Path(output_dir) / (f"{Path(image_path).stem}_b{blur_kernel_size}"
+                                           f"_s{scale:g}{encoder.format}")
+                path.parent.mkdir(parents=True, exist_ok=True)
+                encoder.write(sketch, str(path))
+                paths[blur_kernel_size, scale] = str(path)
+            yield blur_kernel_size, scale, sketch
+
+    if sheet_path is None:
+        for _ in results():
+            pass
+    else:
+        sheet = contact_sheet(results(), kernel_sizes, scales, cell_size)
+        Path(sheet_path).parent.mkdir(parents=True, exist_ok=True)
+        encoder.write(sheet, str(sheet_path))
+    return paths
+
+def main(argv=None):
+    """Sweep blur kernel sizes and scales from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Sketch an image with every combination of blur kernel size and scale",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m src.sweep photo.jpg
+  python -m src.sweep photo.jpg -b 11 21 31 51 -s 192 224 256 --sheet sheet.png
+  python -m src.sweep photo.jpg -b 21 41 --output-dir sweep/ --format jpg --max-size 1024
+        """
+    )
+    parser.add_argument("input", help="Input image")
+    parser.add_argument("-b", "--blur", type=int, nargs="+", default=[11, 21, 31, 51],
+                        help="Blur kernel sizes (odd, default: 11 21 31 51)")
+    parser.add_argument("-s", "--scale", type=float, nargs="+", default=[192.0, 224.0, 256.0],
+                        help="Scale factors (default: 192 224 256)")
+    parser.add_argument("--blur-method", choices=BLUR_METHODS, default="exact",
+                        help="Blur strategy (default: exact)")
+    parser.add_argument("--preset", metavar="NAME|FILE",
+                        help="Apply the stages of a preset (" + ", ".join(PRESET_NAMES) + ") or preset "
+                             "file to every combination")
+    parser.add_argument("--sheet",
+                        help="Path of the contact sheet (default: <input>_sweep.png unless "
+                             "--output-dir is given)")
+    parser.add_argument("--output-dir", help="Also write every combination as its own file here")
+    parser.add_argument("-f", "--format", choices=[fmt[1:] for fmt in OUTPUT_FORMATS], default="png",
+                        help="Format of the files written to --output-dir (default: png)")
+    parser.add_argument("--max-size", type=int, metavar="PIXELS",
+                        help="Sweep a copy reduced to this longest side; kernel sizes still refer "
+                             "to the full resolution")
+    parser.add_argument("--cell-size", type=int, default=256,
+                        help="Longest side of each contact sheet cell (default: 256)")
+    args = parser.parse_args(argv)
+
+    sheet_path = args.sheet
+    if sheet_path is None and args.output_dir is None:
+        sheet_path = create_output_path(args.input, suffix="_sweep")
+
+    try:
+        stages = load_preset(args.preset).get('stages') if args.preset else None
+        start = time.perf_counter()
+        paths = sweep_image(args.input, args.blur, args.scale, args.output_dir, sheet_path,
+                            args.blur_method, args.max_size, encoder=SketchEncoder(args.format),
+                            cell_size=args.cell_size, stages=stages)
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"Swept {len(args.blur) * len(args.scale)} combination(s) with {len(args.blur)} blur(s) "
+          f"in {elapsed:.2f}s")
+    if sheet_path is not None:
+        print(f"Contact sheet saved to: {sheet_path}")
+    if paths:
+        print(f"{len(paths)} sketch(es) saved to: {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Strip planning and streaming writers for tiled (strip-wise) conversion.
+"""
+import struct
+import zlib
+import cv2
+import numpy as np
+from pathlib import Path
+from .rawio import RAW_FORMATS, TIFF_FORMATS, create_memmap, has_tifffile, release_rows
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# zlib equivalents of the PNG strategies in encoding.PNG_STRATEGIES
+ZLIB_STRATEGIES = {
+    'default': zlib.Z_DEFAULT_STRATEGY,
+    'filtered': zlib.Z_FILTERED,
+    'huffman': zlib.Z_HUFFMAN_ONLY,
+    'rle': zlib.Z_RLE,
+    'fixed': zlib.Z_FIXED,
+}
+
+# OpenCV's PNG defaults (cv2.imwrite), used when an encoder leaves them unset;
+# like cv2.imwrite, an explicit level without a strategy uses 'default'
+PNG_DEFAULT_COMPRESSION = 1
+PNG_DEFAULT_STRATEGY = 'rle'
+
+def plan_strips(height, strip_height, overlap, align=1):
+    """
+    Split an image into full-width horizontal strips with overlapping context.
+
+    Args:
+        height (int): Image height in rows
+        strip_height (int): Number of output rows per strip
+        overlap (int): Extra context rows read above and below each strip
+        align (int, optional): Round each read start down to a multiple of this
+                               many rows. Defaults to 1.
+
+    Returns:
+        list: (read_start, read_stop, keep_start, keep_stop) tuples. Rows
+              [read_start, read_stop) are processed and rows
+              [keep_start, keep_stop) of the result are kept, both in image
+              coordinates.
+    """
+    if strip_height < 1:
+        raise ValueError("strip_height must be at least 1")
+
+    strips = []
+    for keep_start in range(0, height, strip_height):
+        keep_stop = min(keep_start + strip_height, height)
+        read_start = max(keep_start - overlap, 0) // align * align
+        read_stop = min(keep_stop + overlap, height)
+        strips.append((read_start, read_stop, keep_start, keep_stop))
+    return strips
+
+def _png_chunk(chunk_type, data):
+    """Serialize a single PNG chunk."""
+    return (struct.pack(">I", len(data)) + chunk_type + data
+            + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+class PNGStripWriter:
+    """
+    Write an 8-bit grayscale or RGB PNG incrementally, a strip of rows at a time.
+
+    Rows are filtered (PNG "Sub" filter) and deflated as they arrive, so only
+    the current strip and the compressor state are ever held in memory.
+    """
+
+    def __init__(self, path, width, height, compression=PNG_DEFAULT_COMPRESSION,
+                 strategy=PNG_DEFAULT_STRATEGY, channels=1):
+        """
+        Open the output file and write the PNG header.
+
+        Args:
+            path (str): Output path
+            width (int): Image width
+            height (int): Image height
+            compression (int, optional): zlib compression level (0-9). Defaults to 1,
+                                         like cv2.imwrite.
+            strategy (str, optional): zlib strategy (see ZLIB_STRATEGIES).
+                                      Defaults to 'rle', like cv2.imwrite.
+            channels (int, optional): 1 for grayscale rows, 3 for BGR rows.
+                                      Defaults to 1.
+        """
+        if channels not in (1, 3):
+            raise ValueError("channels must be 1 or 3")
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.compression = compression
+        self.strategy = strategy
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compression, strategy=ZLIB_STRATEGIES[strategy])
+        self._file = open(path, "wb")
+        self._file.write(PNG_SIGNATURE)
+        color_type = 0 if channels == 1 else 2
+        self._file.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type,
+                                                          0, 0, 0)))
+
+    def write(self, rows):
+        """
+        Append rows to the image.
+
+        Args:
+            rows (numpy.ndarray): uint8 array of shape (n, width), or
+                                  (n, width, 3) in BGR order for RGB images
+        """
+        if self.channels == 3:
+            rows = rows[:, :, ::-1]
+        rows = rows.reshape(rows.shape[0], self.width * self.channels)
+        # Sub filter: each byte stores the difference to the same channel of its
+        # left neighbour
+        step = self.channels
+        filtered = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 1
+        filtered[:, 1:1 + step] = rows[:, :step]
+        np.subtract(rows[:, step:], rows[:, :-step], out=filtered[:, 1 + step:])
+
+        data = self._compressor.compress(filtered.tobytes())
+        if data:
+            self._file.write(_png_chunk(b"IDAT", data))
+        self.rows_written += rows.shape[0]
+
+    def close(self):
+        """Finish the compressed stream and close the file."""
+        if self._file.closed:
+            return
+        if self.rows_written != self.height:
+            self._file.close()
+            raise ValueError(f"Expected {self.height} rows, got {self.rows_written}")
+        self._file.write(_png_chunk(b"IDAT", self._compressor.flush()))
+        self._file.write(_png_chunk(b"IEND", b""))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Leave the partial file behind but release the handle
+            self._file.close()
+
+class ArrayStripWriter:
+    """
+    Collect strips into a full-size array and write it with cv2.imwrite on close.
+
+    Used for output formats that cannot be written incrementally.
+    """
+
+    def __init__(self, path, width, height, encoder=None, channels=1):
+        """
+        Args:
+            path (str): Output path
+            width (int): Image width
+            height (int): Image height
+            encoder (SketchEncoder, optional): Encoder settings for the output
+            channels (int, optional): Channels per pixel. Defaults to 1.
+        """
+        self.path = path
+        self.encoder = encoder
+        self.array = np.empty((height, width) + ((channels,) if channels > 1 else ()), dtype=np.uint8)
+        self.rows_written = 0
+
+    def write(self, rows):
+        """Copy rows into the output array."""
+        self.array[self.rows_written:self.rows_written + rows.shape[0]] = rows
+        self.rows_written += rows.shape[0]
+
+    def close(self):
+        """Encode and write the collected image."""
+        if self.encoder is not None:
+            self.encoder.write(self.array, self.path)
+        elif not cv2.imwrite(str(self.path), self.array):
+            raise ValueError(f"Could not write sketch to {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+class MemmapStripWriter:
+    """
+    Write strips straight into a memory-mapped raw, NPY or TIFF file.
+
+    Written rows are flushed and released from memory as they are written,
+    so the output never has to fit in RAM.
+    """
+
+    def __init__(self, path, width, height, channels=1):
+        """
+        Args:
+            path (str): Output path (see rawio.MEMMAP_FORMATS)
+            width (int): Image width
+            height (int): Image height
+            channels (int, optional): Channels per pixel. Defaults to 1.
+        """
+        self.array = create_memmap(path, (height, width) + ((channels,) if channels > 1 else ()))
+        self.rows_written = 0
+
+    def write(self, rows):
+        """Copy rows into the mapped file and release them."""
+        start = self.rows_written
+        self.array[start:start + rows.shape[0]] = rows
+        self.rows_written += rows.shape[0]
+        release_rows(self.array, start, self.rows_written)
+
+    def close(self):
+        """Flush the file and unmap it."""
+        if self.array is None:
+            return
+        if self.rows_written != self.array.shape[0]:
+            raise ValueError(f"Expected {self.array.shape[0]} rows, got {self.rows_written}")
+        self.array.flush()
+        self.array = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.array = None
+
+def open_strip_writer(path, width, height, encoder=None, channels=1):
+    """
+    Open the most memory-efficient strip writer for an output path.
+
+    PNG outputs are streamed, and raw, NPY and (with tifffile) TIFF outputs
+    are memory-mapped; other formats are assembled in memory first.
+
+    Args:
+        path (str): Output path
+        width (int): Image width
+        height (int): Image height
+        encoder (SketchEncoder, optional): Encoder settings for the output
+        channels (int, optional): 1 for grayscale, 3 for BGR color. Defaults to 1.
+
+    Returns:
+        PNGStripWriter, MemmapStripWriter or ArrayStripWriter: Writer with
+        write(rows) and close()
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix in RAW_FORMATS or suffix == ".npy" or (suffix in TIFF_FORMATS and has_tifffile()):
+        return MemmapStripWriter(path, width, height, channels)
+    if suffix == ".png":
+        compression = PNG_DEFAULT_COMPRESSION
+        strategy = PNG_DEFAULT_STRATEGY
+        if encoder is not None:
+            if encoder.png_compression is not None:
+                # cv2.imwrite drops its RLE default once a level is given
+                compression = encoder.png_compression
+                strategy = 'default'
+            strategy = encoder.png_strategy or strategy
+        return PNGStripWriter(str(path), width, height, compression, strategy, channels)
+    return ArrayStripWriter(path, width, height, encoder, channels)
@@ -1,10 +1,37 @@
 import os
+import struct
 import cv2
+import numpy as np
 from pathlib import Path
 
+# Supported input extensions
+SUPPORTED_FORMATS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']
+
+# Leading bytes of each supported container format. Checking these is enough
+# to reject non-image files without paying for a full decode.
+IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff',       # JPEG
+    b'\x89PNG\r\n\x1a\n',  # PNG
+    b'BM',                 # BMP
+    b'II*\x00',            # TIFF (little-endian)
+    b'MM\x00*',            # TIFF (big-endian)
+)
+
+# Decode flags that read at 1/2, 1/4 or 1/8 resolution. For JPEG the scaling
+# happens in the DCT, so full-resolution pixels are never produced.
+REDUCED_FLAGS = {
+    cv2.IMREAD_COLOR: {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                       8: cv2.IMREAD_REDUCED_COLOR_8},
+    cv2.IMREAD_GRAYSCALE: {2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+                           8: cv2.IMREAD_REDUCED_GRAYSCALE_8},
+}
+
 def validate_image(image_path):
     """
-    Validate that an image file exists and is readable.
+    Validate that an image file exists and looks like a supported image.
+    
+    Only the file header is inspected, so this is cheap even for very large
+    images. Use load_image() to validate and decode in a single step.
     
     Args:
         image_path (str): Path to the image file
@@ -17,30 +44,247 @@ def validate_image(image_path):
         raise FileNotFoundError(f"Image file not found: {image_path}")
     
     # Check if the file is a supported image format
-    supported_formats = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']
-    if Path(image_path).suffix.lower() not in supported_formats:
+    if Path(image_path).suffix.lower() not in SUPPORTED_FORMATS:
         raise ValueError(f"Unsupported image format: {Path(image_path).suffix}. "
-                         f"Supported formats: {', '.join(supported_formats)}")
+                         f"Supported formats: {', '.join(SUPPORTED_FORMATS)}")
+    
+    # Probe the header instead of decoding the whole file
+    with open(image_path, 'rb') as f:
+        header = f.read(8)
+    if not header.startswith(IMAGE_SIGNATURES):
+        raise ValueError(f"Could not read image from {image_path}. File may be corrupted.")
+
+def load_image(image_path, flags=cv2.IMREAD_COLOR, max_dimension=None):
+    """
+    Validate an image file and decode it exactly once.
     
-    # Try to read the image to verify it's valid
-    img = cv2.imread(image_path)
-    if img is None:
+    Args:
+        image_path (str): Path to the image file
+        flags (int, optional): cv2.imread flags. Defaults to cv2.IMREAD_COLOR.
+        max_dimension (int, optional): Longest side of the returned image. Larger
+                                       images are decoded at reduced resolution
+                                       and shrunk (see decode_image_reduced).
+    
+    Returns:
+        numpy.ndarray: The decoded image
+    
+    Raises:
+        FileNotFoundError: If the image file doesn't exist
+        ValueError: If the file is not a supported image format or cannot be decoded
+    """
+    validate_image(image_path)
+    
+    if max_dimension:
+        try:
+            return decode_image_reduced(Path(image_path).read_bytes(), max_dimension, flags)[0]
+        except ValueError:
+            raise ValueError(f"Could not read image from {image_path}. "
+                             "File may be corrupted.") from None
+    
+    image = cv2.imread(str(image_path), flags)
+    if image is None:
         raise ValueError(f"Could not read image from {image_path}. File may be corrupted.")
+    return image
+
+def decode_image(data, flags=cv2.IMREAD_COLOR, max_dimension=None):
+    """
+    Decode an encoded image held in memory.
+    
+    Args:
+        data (bytes): Encoded image (JPEG, PNG, BMP, TIFF, ...)
+        flags (int, optional): cv2.imdecode flags. Defaults to cv2.IMREAD_COLOR.
+        max_dimension (int, optional): Longest side of the returned image (see
+                                       decode_image_reduced)
+    
+    Returns:
+        numpy.ndarray: The decoded image
+    
+    Raises:
+        ValueError: If the data cannot be decoded
+    """
+    if max_dimension:
+        return decode_image_reduced(data, max_dimension, flags)[0]
+    
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if image is None:
+        raise ValueError("Could not decode image from bytes")
+    return image
+
+def decode_image_reduced(data, max_dimension, flags=cv2.IMREAD_COLOR):
+    """
+    Decode an image so that its longest side is at most max_dimension.
+    
+    The image size is read from the header first. When it is large enough, the
+    image is decoded at 1/2, 1/4 or 1/8 resolution (JPEG scales in the DCT, so
+    full-resolution pixels are never produced), and the remainder is shrunk
+    with area interpolation. Smaller images are returned unchanged.
+    
+    Args:
+        data (bytes): Encoded image
+        max_dimension (int): Maximum length of the longest side
+        flags (int, optional): cv2.imdecode flags. Defaults to cv2.IMREAD_COLOR.
+    
+    Returns:
+        tuple: (image, ratio) where ratio is the size of the returned image
+               relative to the full-resolution image
+    
+    Raises:
+        ValueError: If the data cannot be decoded
+    """
+    if max_dimension < 1:
+        raise ValueError("max_dimension must be at least 1")
+    
+    size = read_image_size(data)
+    reduced_flags = flags
+    if size is not None and flags in REDUCED_FLAGS:
+        for factor in (8, 4, 2):
+            if max(size) // factor >= max_dimension:
+                reduced_flags = REDUCED_FLAGS[flags][factor]
+                break
+    
+    image = decode_image(data, reduced_flags)
+    # Compare longest sides, which are unaffected by EXIF rotation
+    original = max(size) if size is not None else max(image.shape[:2])
+    
+    longest = max(image.shape[:2])
+    if longest > max_dimension:
+        factor = max_dimension / longest
+        image = cv2.resize(image, (max(round(image.shape[1] * factor), 1),
+                                   max(round(image.shape[0] * factor), 1)),
+                           interpolation=cv2.INTER_AREA)
+    return image, max(image.shape[:2]) / original
+
+def read_image_size(data):
+    """
+    Read the pixel dimensions of a JPEG, PNG or BMP image from its header.
+    
+    Args:
+        data (bytes): Encoded image, or at least its leading bytes
+    
+    Returns:
+        tuple: (width, height), or None if the format is not recognized
+    """
+    if data.startswith(b'\x89PNG\r\n\x1a\n') and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if data.startswith(b'BM') and len(data) >= 26:
+        width, height = struct.unpack('<ii', data[18:26])
+        return width, abs(height)
+    if data.startswith(b'\xff\xd8'):
+        frame = _jpeg_frame(data)
+        return frame[:2] if frame else None
+    return None
+
+def is_grayscale_encoded(data):
+    """
+    Check from the header whether an encoded image has no color channels.
+    
+    Decoding such an image straight to grayscale gives exactly the pixels a
+    color decode followed by cv2.cvtColor would.
+    
+    Args:
+        data (bytes): Encoded image, or at least its leading bytes
+    
+    Returns:
+        bool: True for grayscale PNGs (with or without alpha, any bit depth)
+              and single-component JPEGs, False otherwise
+    """
+    if data.startswith(b'\x89PNG\r\n\x1a\n') and len(data) >= 26:
+        # PNG color types 0 (gray) and 4 (gray + alpha)
+        return data[25] in (0, 4)
+    if data.startswith(b'\xff\xd8'):
+        frame = _jpeg_frame(data)
+        return frame is not None and frame[2] == 1
+    return False
+
+def _jpeg_frame(data):
+    """Return (width, height, components) from the first JPEG frame header, or None."""
+    index = 2
+    while index + 4 <= len(data):
+        if data[index] != 0xFF:
+            return None
+        marker = data[index + 1]
+        if marker == 0xFF:
+            # Fill byte
+            index += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length field
+            index += 2
+            continue
+        # SOF0-SOF15, excluding DHT, JPG and DAC which share the range
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if index + 10 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[index + 5:index + 9])
+            return width, height, data[index + 9]
+        index += 2 + struct.unpack('>H', data[index + 2:index + 4])[0]
+    return None
+
+def iter_image_files(directory, recursive=True):
+    """
+    Lazily yield the supported image files in a directory.
+    
+    Files are yielded while the directory is being walked, so even very large
+    trees never have to be listed in memory.
+    
+    Args:
+        directory (str): Directory to search
+        recursive (bool, optional): Descend into subdirectories. Defaults to True.
+    
+    Yields:
+        str: Path to each image file, in sorted order within each directory
+    """
+    with os.scandir(directory) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+    
+    for entry in entries:
+        if entry.is_dir():
+            if recursive:
+                yield from iter_image_files(entry.path, recursive)
+        elif Path(entry.name).suffix.lower() in SUPPORTED_FORMATS:
+            yield entry.path
+
+def bucket_by_shape(images, max_bucket=None):
+    """
+    Group same-sized images into stacks for vectorized processing.
+    
+    Args:
+        images (iterable): Image arrays of any mix of shapes
+        max_bucket (int, optional): Maximum number of images per stack, to bound
+                                    memory. Defaults to None (no limit).
+    
+    Returns:
+        list: (indices, stack) tuples, where stack is an array of shape
+              (len(indices), ...) holding the images at those input positions
+    """
+    groups = {}
+    for index, image in enumerate(images):
+        groups.setdefault((image.shape, image.dtype), []).append((index, image))
+    
+    buckets = []
+    for members in groups.values():
+        step = max_bucket or len(members)
+        for start in range(0, len(members), step):
+            chunk = members[start:start + step]
+            buckets.append(([index for index, _ in chunk],
+                            np.stack([image for _, image in chunk])))
+    return buckets
 
-def create_output_path(input_path, suffix="_sketch"):
+def create_output_path(input_path, suffix="_sketch", extension=".png"):
     """
     Create a default output path based on the input path.
     
     Args:
         input_path (str): Path to the input image
         suffix (str, optional): Suffix to add to the filename. Defaults to "_sketch".
+        extension (str, optional): Output format extension. Defaults to ".png"
+                                   (lossless, for best quality).
     
     Returns:
         str: Output path for the sketch
     """
     path = Path(input_path)
-    # Use PNG format by default for better quality
-    output_path = path.parent / f"{path.stem}{suffix}.png"
+    output_path = path.parent / f"{path.stem}{suffix}{extension}"
     return str(output_path)
 
 def display_images(original_path, sketch_path, window_name='Image Comparison'):
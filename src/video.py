@@ -0,0 +1,518 @@
+"""
+Sketch videos and image sequences frame by frame.
+
+Frames are read with cv2.VideoCapture in a background thread and converted by
+a pool of workers. The sketches are then written in order with
+cv2.VideoWriter, or as numbered images. Frames and sketches live in a fixed
+ring of preallocated buffers, so a clip of any length runs without per-frame
+allocations.
+
+    python -m src.video clip.mp4 -o clip_sketch.mp4 -j 4
+    python -m src.video "frames/%04d.png" -o "sketches/%04d.png" --incremental
+
+In incremental mode only the parts of a frame that changed since the previous
+frame are recomputed (see ChangedRegionSketcher). Static shots, screen
+recordings and animation then cost a fraction of a full conversion per frame.
+"""
+import argparse
+import copy
+import os
+import queue
+import sys
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+import cv2
+import numpy as np
+from .batch import resolve_workers, run_parallel
+from .blur import blur_alignment, blur_reach
+from .converter import ImageToSketchConverter, SketchPipeline, _stage, _to_grayscale
+from .metrics import ConversionMetrics
+from .options import BLUR_METHODS, PRESET_NAMES
+from .runtime import pinned_threads
+from .utils import create_output_path
+
+# Codecs used for video outputs, by extension
+VIDEO_FOURCCS = {
+    '.mp4': 'mp4v',
+    '.m4v': 'mp4v',
+    '.mov': 'mp4v',
+    '.avi': 'MJPG',
+    '.mkv': 'FFV1',
+}
+
+# Frame rate assumed when the source does not report one (image sequences)
+DEFAULT_FPS = 25.0
+
+class VideoConversionResult(namedtuple('VideoConversionResult',
+                                       ['output_path', 'frames', 'elapsed', 'recomputed'])):
+    """
+    Outcome of converting a video.
+
+    Attributes:
+        output_path (str): Path or pattern the sketches were written to
+        frames (int): Number of frames converted
+        elapsed (float): Wall-clock seconds spent on the conversion
+        recomputed (float): Fraction of the pixels that were recomputed; below
+                            1.0 only in incremental mode
+    """
+    __slots__ = ()
+
+    @property
+    def fps(self):
+        """float: Frames converted per second."""
+        return self.frames / self.elapsed if self.elapsed > 0 else 0.0
+
+def is_sequence_pattern(path):
+    """Return True if a path is a printf-style image sequence pattern such as frames/%04d.png."""
+    return '%' in os.path.basename(str(path))
+
+class FrameSequenceWriter:
+    """
+    Write frames as numbered images, e.g. sketches/0000.png, sketches/0001.png, ...
+
+    Has the write()/release() interface of cv2.VideoWriter.
+    """
+
+    def __init__(self, pattern, encoder=None, start=0):
+        """
+        Args:
+            pattern (str): printf-style path pattern with one integer field
+            encoder (SketchEncoder, optional): Encoder settings for the images
+            start (int, optional): Number of the first frame. Defaults to 0.
+        """
+        self.pattern = str(pattern)
+        self.encoder = encoder
+        self.index = start
+        self.bytes_written = 0
+        Path(self.pattern % start).parent.mkdir(parents=True, exist_ok=True)
+
+    def write(self, frame):
+        """Write the next frame."""
+        path = self.pattern % self.index
+        if self.encoder is not None:
+            self.encoder.write(frame, path)
+        elif not cv2.imwrite(path, frame):
+            raise ValueError(f"Could not write frame to {path}")
+        self.bytes_written += os.path.getsize(path)
+        self.index += 1
+
+    def release(self):
+        """Nothing to flush; every frame is a complete file."""
+
+def open_video_writer(path, fps, width, height, encoder=None, fourcc=None, channels=1):
+    """
+    Open a writer for grayscale (or, with channels=3, BGR) sketch frames.
+
+    Args:
+        path (str): Output video path, or a printf-style pattern such as
+                    sketches/%04d.png to write numbered images
+        fps (float): Frame rate of the output video
+        width (int): Frame width
+        height (int): Frame height
+        encoder (SketchEncoder, optional): Encoder settings for image sequences
+        fourcc (str, optional): Four-character codec code, e.g. 'avc1'. Defaults
+                                to the entry for the extension in VIDEO_FOURCCS.
+        channels (int, optional): Channels of the frames. Defaults to 1.
+
+    Returns:
+        cv2.VideoWriter or FrameSequenceWriter: Writer with write(frame) and release()
+    """
+    if is_sequence_pattern(path):
+        return FrameSequenceWriter(path, encoder)
+
+    extension = Path(path).suffix.lower()
+    if fourcc is None:
+        if extension not in VIDEO_FOURCCS:
+            raise ValueError(f"Unsupported video format: {extension}. Pass a fourcc or use one "
+                             f"of {', '.join(VIDEO_FOURCCS)}")
+        fourcc = VIDEO_FOURCCS[extension]
+    if len(fourcc) != 4:
+        raise ValueError(f"fourcc must be four characters, got {fourcc!r}")
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*fourcc), fps, (width, height),
+                             isColor=channels == 3)
+    if not writer.isOpened():
+        raise ValueError(f"Could not open {path} for writing with codec {fourcc}")
+    return writer
+
+class ChangedRegionSketcher:
+    """
+    Convert consecutive frames, recomputing only the regions that changed.
+
+    Each frame is compared with the previous one in blocks of block_size
+    pixels. A changed block can only affect sketch pixels within the blur
+    reach of it, so only those are recomputed; the rest of the previous
+    sketch is kept. Each recomputed region gets another blur reach of
+    context, as in tiled conversions, so with threshold=0 every sketch is
+    identical to a full conversion of its frame.
+
+    Decoded video is noisy, so a small threshold (e.g. 4 for compressed
+    sources) is usually needed for blocks to count as unchanged. A pixel is
+    then recomputed once it differs from the frame its sketch was computed
+    from by more than the threshold, so errors never accumulate beyond it.
+
+    Frames depend on their predecessor, so frames must be converted in order
+    and one at a time. Sketch and color stages are applied to the whole
+    sketch of every frame; gray stages (CLAHE) depend on the whole frame and
+    are not supported.
+
+    Attributes:
+        converter (ImageToSketchConverter): Converter computing the regions
+        threshold (int): Largest per-pixel change still treated as unchanged
+        block_size (int): Side of the blocks frames are compared in
+        max_changed (float): Share of changed blocks above which the whole
+                             frame is recomputed in one pass
+        pixels_total (int): Pixels of all frames converted so far
+        pixels_recomputed (int): Pixels that were actually recomputed
+    """
+
+    def __init__(self, converter, threshold=0, block_size=32, max_changed=0.5):
+        """
+        Args:
+            converter (ImageToSketchConverter): Converter computing the sketches
+            threshold (int, optional): Largest per-pixel change (0-255) treated as
+                                       no change. Defaults to 0 (exact).
+            block_size (int, optional): Side of the compared blocks in pixels.
+                                        Defaults to 32.
+            max_changed (float, optional): Recompute the whole frame when more
+                                           than this share of blocks changed.
+                                           Defaults to 0.5.
+        """
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        if converter.stages.has_gray_stages:
+            raise ValueError("Gray stages depend on the whole frame and cannot be updated "
+                             "incrementally")
+        self.converter = converter
+        self.threshold = threshold
+        self.block_size = block_size
+        self.max_changed = max_changed
+        self.pixels_total = 0
+        self.pixels_recomputed = 0
+        self._reach = blur_reach(converter.blur_kernel_size, converter.blur_method)
+        self._align = blur_alignment(converter.blur_kernel_size, converter.blur_method)
+        self._stages = converter.stages
+        # The regions are the plain dodge; the stages run on the whole sketch
+        self._core = converter
+        if converter.stages:
+            self._core = copy.copy(converter)
+            self._core.stages = SketchPipeline()
+        self._gray = None
+        self._diff = None
+        self._staged = None
+        self.reset()
+
+    def reset(self):
+        """Forget the previous frame, e.g. after seeking; the next frame is converted in full."""
+        self._reference = None
+        self._sketch = None
+
+    @property
+    def recomputed(self):
+        """float: Fraction of the pixels converted so far that were recomputed."""
+        return self.pixels_recomputed / self.pixels_total if self.pixels_total else 1.0
+
+    def convert(self, frame, out=None):
+        """
+        Convert the next frame.
+
+        Args:
+            frame (numpy.ndarray): BGR, BGRA or grayscale uint8 frame
+            out (numpy.ndarray, optional): 2D uint8 array to write the sketch to
+                                           ((H, W, 3) with a color stage)
+
+        Returns:
+            numpy.ndarray: The sketch of the frame
+        """
+        metrics = self.converter.metrics
+        with _stage(metrics, "grayscale"):
+            if frame.ndim == 3 and (self._gray is None or self._gray.shape != frame.shape[:2]):
+                self._gray = np.empty(frame.shape[:2], dtype=np.uint8)
+            gray = _to_grayscale(frame, self._gray if frame.ndim == 3 else None)
+
+        height, width = gray.shape
+        self.pixels_total += height * width
+        if self._reference is None or self._reference.shape != gray.shape:
+            self._reference = gray.copy()
+            self._diff = np.empty_like(gray)
+            self._sketch = self._core.convert_array(gray)
+            self.pixels_recomputed += height * width
+        else:
+            with _stage(metrics, "diff"):
+                regions = self._changed_regions(gray)
+            for region in regions:
+                self._recompute(gray, *region)
+
+        if self._stages.channels == 3:
+            if self._staged is None or self._staged.shape != gray.shape:
+                self._staged = np.empty_like(gray)
+            np.copyto(self._staged, self._sketch)
+            return self._stages.finish(frame, gray, self._staged, out, metrics=metrics)
+        if out is None:
+            out = self._sketch.copy()
+        else:
+            np.copyto(out, self._sketch)
+        return self._stages.finish(frame, gray, out, metrics=metrics)
+
+    def _changed_regions(self, gray):
+        """Return (top, bottom, left, right) boxes covering the blocks that changed."""
+        height, width = gray.shape
+        size = self.block_size
+        diff = cv2.absdiff(gray, self._reference, dst=self._diff)
+        blocks = np.maximum.reduceat(np.maximum.reduceat(diff, np.arange(0, height, size), axis=0),
+                                     np.arange(0, width, size), axis=1) > self.threshold
+        changed = np.count_nonzero(blocks)
+        if not changed:
+            return []
+        if changed > self.max_changed * blocks.size:
+            return [(0, height, 0, width)]
+
+        # One box per group of touching changed blocks
+        _, _, stats, _ = cv2.connectedComponentsWithStats(blocks.view(np.uint8), connectivity=8)
+        return [(y * size, min((y + h) * size, height), x * size, min((x + w) * size, width))
+                for x, y, w, h, _ in stats[1:]]
+
+    def _recompute(self, gray, top, bottom, left, right):
+        """Recompute the sketch pixels a changed box can affect."""
+        height, width = gray.shape
+        reach = self._reach
+        align = self._align
+        # Pixels whose sketch depends on the box, and the context they need
+        keep_top, keep_bottom = max(top - reach, 0), min(bottom + reach, height)
+        keep_left, keep_right = max(left - reach, 0), min(right + reach, width)
+        read_top = max(keep_top - reach, 0) // align * align
+        read_left = max(keep_left - reach, 0) // align * align
+        read_bottom, read_right = min(keep_bottom + reach, height), min(keep_right + reach, width)
+
+        sketch = self._core.convert_array(gray[read_top:read_bottom, read_left:read_right])
+        self._sketch[keep_top:keep_bottom, keep_left:keep_right] = \
+            sketch[keep_top - read_top:keep_bottom - read_top, keep_left - read_left:keep_right - read_left]
+        self._reference[top:bottom, left:right] = gray[top:bottom, left:right]
+        self.pixels_recomputed += (read_bottom - read_top) * (read_right - read_left)
+
+def _read_frames(capture, frames, free, ready, stop, max_frames, metrics):
+    """Read frames into free buffers and pass their indices on (see convert_video)."""
+    try:
+        count = 0
+        while max_frames is None or count < max_frames:
+            slot = free.get()
+            if slot is None or stop.is_set():
+                break
+            with _stage(metrics, "decode"):
+                ok, frame = capture.read(frames[slot])
+            if not ok:
+                break
+            if frame is not frames[slot]:
+                raise ValueError(f"Frame {count} is {frame.shape}, expected {frames[slot].shape}")
+            ready.put(slot)
+            count += 1
+        ready.put(None)
+    except Exception as e:
+        ready.put(e)
+
+def convert_video(converter, source, output_path=None, workers=None, incremental=False,
+                  threshold=0, block_size=32, fourcc=None, fps=None, max_frames=None,
+                  progress=None):
+    """
+    Convert a video or image sequence to a sketch video or image sequence.
+
+    Reading, converting and writing overlap: a background thread decodes
+    frames into a ring of preallocated buffers, `workers` threads convert
+    them into a second ring, and the calling thread writes the sketches in
+    order and hands both buffers back.
+
+    Args:
+        converter (ImageToSketchConverter): Converter with the sketch settings
+        source (str or int): Video file, printf-style image pattern such as
+                             frames/%04d.png, or camera index
+        output_path (str, optional): Output video, or a printf-style pattern to
+                                     write numbered images. Defaults to the
+                                     source name with a _sketch suffix.
+        workers (int, optional): Conversion threads (see resolve_workers).
+                                 Ignored in incremental mode, where frames are
+                                 converted in order. Defaults to None.
+        incremental (bool, optional): Only recompute the regions that changed
+                                      since the previous frame. Defaults to False.
+        threshold (int, optional): Per-pixel change still treated as no change
+                                   in incremental mode. Defaults to 0 (exact).
+        block_size (int, optional): Block size of the change detection.
+                                    Defaults to 32.
+        fourcc (str, optional): Codec of the output video (see open_video_writer)
+        fps (float, optional): Frame rate of the output video. Defaults to the
+                               source's.
+        max_frames (int, optional): Stop after this many frames
+        progress (callable, optional): Called as progress(frames_done) after
+                                       each written frame
+
+    Returns:
+        VideoConversionResult: Output path, frame count, time and recomputed share
+    """
+    if max_frames is not None and max_frames < 1:
+        raise ValueError("max_frames must be at least 1")
+    if isinstance(source, str) and not is_sequence_pattern(source) and not os.path.isfile(source):
+        raise FileNotFoundError(f"Video file not found: {source}")
+    if output_path is None:
+        if isinstance(source, int) or is_sequence_pattern(source):
+            raise ValueError("output_path is required for image sequence and camera sources")
+        extension = Path(source).suffix.lower()
+        output_path = create_output_path(source, extension=extension if extension in VIDEO_FOURCCS
+                                         else ".mp4")
+
+    start = time.perf_counter()
+    metrics = converter.metrics
+    capture = cv2.VideoCapture(source)
+    writer = None
+    stop = threading.Event()
+    free = queue.Queue()
+    reader = None
+    count = 0
+    try:
+        if not capture.isOpened():
+            raise ValueError(f"Could not open video: {source}")
+        with _stage(metrics, "decode"):
+            ok, first = capture.read()
+        if not ok:
+            raise ValueError(f"Video has no frames: {source}")
+        height, width = first.shape[:2]
+        fps = fps or capture.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        writer = open_video_writer(output_path, fps, width, height, converter.encoder, fourcc,
+                                   converter.stages.channels)
+        if isinstance(source, str) and os.path.isfile(source) and metrics is not None:
+            metrics.count("bytes_read", os.path.getsize(source))
+
+        pinned = None
+        if incremental:
+            sketcher = ChangedRegionSketcher(converter, threshold, block_size)
+            workers = None
+            convert = sketcher.convert
+        else:
+            sketcher = None
+            convert = converter.convert_array
+            if converter.pin_threads and resolve_workers(workers) > 1:
+                # Share OpenCV's threads between the frame workers
+                pinned = converter.pinned(resolve_workers(workers))
+                convert = pinned.convert_array
+
+        # Enough buffers for every frame in flight plus a couple read ahead
+        max_in_flight = resolve_workers(workers) * 2
+        frames = [first] + [np.empty_like(first) for _ in range(max_in_flight + 1)]
+        shape = (height, width) + ((3,) if converter.stages.channels == 3 else ())
+        sketches = [np.empty(shape, dtype=np.uint8) for _ in frames]
+        for slot in range(1, len(frames)):
+            free.put(slot)
+        ready = queue.Queue()
+        ready.put(0)
+        limit = None if max_frames is None else max_frames - 1
+        reader = threading.Thread(target=_read_frames,
+                                  args=(capture, frames, free, ready, stop, limit, metrics),
+                                  daemon=True)
+        reader.start()
+
+        def slots():
+            while True:
+                slot = ready.get()
+                if slot is None:
+                    return
+                if isinstance(slot, Exception):
+                    raise slot
+                yield slot
+
+        def compute(slot):
+            convert(frames[slot], sketches[slot])
+            return slot
+
+        with pinned_threads((pinned or converter)._opencv_threads):
+            for slot, _, error in run_parallel(compute, slots(), workers,
+                                               max_in_flight=max_in_flight):
+                if error is not None:
+                    raise error
+                with _stage(metrics, "write"):
+                    writer.write(sketches[slot])
+                free.put(slot)
+                count += 1
+                if progress is not None:
+                    progress(count)
+    finally:
+        stop.set()
+        free.put(None)
+        if reader is not None:
+            reader.join()
+        capture.release()
+        if writer is not None:
+            writer.release()
+
+    if metrics is not None:
+        if isinstance(writer, FrameSequenceWriter):
+            metrics.count("bytes_written", writer.bytes_written)
+        else:
+            metrics.count("bytes_written", os.path.getsize(output_path))
+    recomputed = sketcher.recomputed if sketcher is not None else 1.0
+    return VideoConversionResult(str(output_path), count, time.perf_counter() - start, recomputed)
+
+def main(argv=None):
+    """Convert a video or image sequence from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Convert a video or image sequence to pencil sketches",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python -m src.video clip.mp4
+  python -m src.video clip.mp4 -o sketch.avi -j 4 -b 31
+  python -m src.video "frames/%04d.png" -o "sketches/%04d.png" --incremental --threshold 4
+        """
+    )
+    parser.add_argument("input", help="Video file, printf-style image pattern or camera index")
+    parser.add_argument("-o", "--output",
+                        help="Output video, or printf-style image pattern (default: <input>_sketch)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Frames to convert in parallel (0 = all CPUs, default: 1)")
+    parser.add_argument("--preset", metavar="NAME|FILE",
+                        help="Start from a preset (" + ", ".join(PRESET_NAMES) + ") or preset file; "
+                             "-b, -s and --blur-method override its settings")
+    parser.add_argument("-b", "--blur", type=int,
+                        help="Kernel size for Gaussian blur (must be odd, default: 21)")
+    parser.add_argument("--blur-method", choices=BLUR_METHODS,
+                        help="Blur strategy (default: exact)")
+    parser.add_argument("-s", "--scale", type=float,
+                        help="Scale factor for the division operation (default: 256.0)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only recompute regions that changed since the previous frame")
+    parser.add_argument("--threshold", type=int, default=0,
+                        help="Per-pixel change ignored by --incremental; use a few levels for "
+                             "compressed sources (default: 0, exact)")
+    parser.add_argument("--fourcc", help="Codec of the output video, e.g. avc1 (default: by extension)")
+    parser.add_argument("--fps", type=float, help="Frame rate of the output video (default: the input's)")
+    parser.add_argument("--max-frames", type=int, help="Stop after this many frames")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print the time spent in each stage")
+    args = parser.parse_args(argv)
+
+    try:
+        metrics = ConversionMetrics() if args.profile else None
+        settings = {'blur_kernel_size': args.blur, 'scale': args.scale,
+                    'blur_method': args.blur_method}
+        settings = {key: value for key, value in settings.items() if value is not None}
+        converter = ImageToSketchConverter.from_preset(args.preset or 'classic', metrics=metrics,
+                                                       **settings)
+        source = int(args.input) if args.input.isdigit() else args.input
+        workers = None if args.jobs == 1 else args.jobs
+        result = convert_video(converter, source, args.output, workers, args.incremental,
+                               args.threshold, fourcc=args.fourcc, fps=args.fps,
+                               max_frames=args.max_frames)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    summary = (f"Converted {result.frames} frame(s) in {result.elapsed:.2f}s "
+               f"({result.fps:.1f} frames/sec) to {result.output_path}")
+    if args.incremental:
+        summary += f", recomputed {result.recomputed:.0%} of the pixels"
+    print(summary)
+    if args.profile:
+        print(metrics.format_profile(result.elapsed))
+
+if __name__ == "__main__":
+    main()
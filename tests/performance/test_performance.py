@@ -1,64 +1,103 @@
 import pytest
-import time
-import cv2
-import numpy as np
-import tempfile
 import os
-from pathlib import Path
-from src.converter import ImageToSketchConverter
+import subprocess
+import sys
+from src.benchmark import (
+    benchmark_batch,
+    benchmark_stages,
+    benchmark_startup,
+    compare_to_baseline,
+    format_benchmark_report,
+    load_baseline,
+    measure,
+    run_benchmarks,
+    save_baseline,
+    synthetic_image,
+)
 
-def create_test_image(size, tmp_path):
-    """Create a test image of specified size."""
-    img = np.random.randint(0, 255, (size, size, 3), dtype=np.uint8)
-    
-    test_image_path = tmp_path / f"test_{size}.jpg"
-    cv2.imwrite(str(test_image_path), img)
-    return str(test_image_path)
-
-@pytest.mark.parametrize("image_size", [256, 512, 1024])
-def test_conversion_performance(image_size, tmp_path):
-    """Test conversion performance with different image sizes."""
-    # Create test image
-    test_image = create_test_image(image_size, tmp_path)
-    
-    # Time the conversion
-    converter = ImageToSketchConverter()
-    
-    start_time = time.time()
-    output_path = tmp_path / f"perf_test_{image_size}.png"
-    converter.convert(test_image, str(output_path))
-    end_time = time.time()
-    
-    conversion_time = end_time - start_time
-    
-    # Verify the conversion completed and output was created
-    assert output_path.exists()
-    
-    # Log performance (this could be used for benchmarking)
-    print(f"Conversion time for {image_size}x{image_size} image: {conversion_time:.3f}s")
-
-def test_batch_performance(tmp_path):
-    """Test batch conversion performance."""
-    # Create multiple test images
-    image_paths = []
-    for i in range(5):
-        img = np.random.randint(0, 255, (100, 100, 3), dtype=np.uint8)
-        temp_path = tmp_path / f"perf_batch_{i}.jpg"
-        cv2.imwrite(str(temp_path), img)
-        image_paths.append(str(temp_path))
-    
-    # Time the batch conversion
-    converter = ImageToSketchConverter()
-    
-    start_time = time.time()
-    results = converter.convert_batch(image_paths, str(tmp_path))
-    end_time = time.time()
-    
-    batch_time = end_time - start_time
-    
-    # Verify all conversions completed
-    assert len(results) == 5
-    for output_path in results.values():
-        assert Path(output_path).exists()
+def test_measure_runs_warmup_and_repeats():
+    """Test that warm-up runs are not timed."""
+    calls = []
+    timing = measure(lambda: calls.append(1), repeat=4, warmup=2)
+
+    assert len(calls) == 6
+    assert timing['repeat'] == 4
+    assert 0 <= timing['min'] <= timing['median']
+
+def test_synthetic_image_is_deterministic():
+    """Test that benchmark inputs are reproducible."""
+    image = synthetic_image(64, 48, seed=3)
+
+    assert image.shape == (48, 64, 3)
+    assert (image == synthetic_image(64, 48, seed=3)).all()
+
+def test_stage_benchmarks_cover_each_stage_and_kernel():
+    """Test that decode, compute and encode are timed per size and kernel size."""
+    results = benchmark_stages([(128, 96)], [5, 21], repeat=2, warmup=1)
+    names = [row['name'] for row in results]
+
+    assert names == ["decode[128x96]", "compute[128x96,k5]", "compute[128x96,k21]", "encode[128x96]"]
+    assert all(row['median'] > 0 for row in results)
+
+def test_batch_benchmark_reports_throughput():
+    """Test batch throughput at several worker counts."""
+    results = benchmark_batch([1, 2], count=3, size=(64, 48), repeat=1, warmup=0)
+
+    assert [row['name'] for row in results] == ["batch[64x48,x3,j1]", "batch[64x48,x3,j2]"]
+    assert all(row['images_per_sec'] > 0 for row in results)
+
+def test_startup_benchmark_runs_fresh_interpreters():
+    """Test that startup commands are timed in a new process."""
+    results = benchmark_startup({'cli --help': ["-m", "src.cli", "--help"]}, repeat=1, warmup=0)
     
-    print(f"Batch conversion time for 5 images: {batch_time:.3f}s")
\ No newline at end of file
+    assert [row['name'] for row in results] == ["startup[cli --help]"]
+    assert results[0]['median'] > 0
+    assert "-" in format_benchmark_report(results)
+
+def test_unknown_blur_method_is_rejected():
+    """Test that --blur-method only accepts the converter's blur methods."""
+    result = subprocess.run([sys.executable, "-m", "src.benchmark", "--blur-method", "median"],
+                            capture_output=True, text=True)
+
+    assert result.returncode == 2
+    assert "invalid choice" in result.stderr
+
+def test_baseline_round_trip_and_regression_gate(tmp_path):
+    """Test that only stages slower than the threshold are reported."""
+    results = [
+        {'name': "decode[8x8]", 'stage': "decode", 'megapixels': 0.01, 'median': 0.010, 'min': 0.009},
+        {'name': "compute[8x8,k21]", 'stage': "compute", 'megapixels': 0.01, 'median': 0.020, 'min': 0.019},
+    ]
+    baseline_path = tmp_path / "baseline.json"
+    save_baseline(results, baseline_path)
+    baseline = load_baseline(baseline_path)
+
+    slower = [dict(results[0], median=0.011, min=0.010), dict(results[1], median=0.030, min=0.0285),
+              dict(results[1], name="compute[8x8,k51]", median=1.0, min=1.0)]
+    regressions = compare_to_baseline(slower, baseline, threshold=0.25)
+
+    # Within threshold, regressed, and new (ignored)
+    assert [regression['name'] for regression in regressions] == ["compute[8x8,k21]"]
+    assert regressions[0]['change'] == pytest.approx(0.5)
+    # The report shows the change of the statistic the gate uses
+    assert "+50.0%" in format_benchmark_report(slower, baseline)
+    assert "+11.1%" in format_benchmark_report(slower, baseline)
+    assert "+10.0%" in format_benchmark_report(slower, baseline, statistic='median')
+    assert "new" in format_benchmark_report(slower, baseline)
+
+@pytest.mark.skipif(not os.environ.get("SKETCH_BENCHMARK_BASELINE"),
+                    reason="set SKETCH_BENCHMARK_BASELINE to a baseline saved on this machine")
+def test_no_regressions_against_baseline():
+    """
+    Fail when a stage is slower than the stored baseline beyond the threshold.
+
+    Save the baseline with `python -m src.benchmark --save-baseline FILE` (quick profile).
+    """
+    baseline = load_baseline(os.environ["SKETCH_BENCHMARK_BASELINE"])
+    threshold = float(os.environ.get("SKETCH_BENCHMARK_THRESHOLD", 0.25))
+    results = run_benchmarks('quick', repeat=5, warmup=1)
+    print(format_benchmark_report(results, baseline))
+
+    regressions = compare_to_baseline(results, baseline, threshold)
+    assert not regressions, "\n".join(
+        f"{regression['name']}: {regression['change'] * 100:+.1f}%" for regression in regressions)
@@ -0,0 +1,63 @@
+import pytest
+import cv2
+import numpy as np
+from src.blur import (BLUR_METHODS, blur, blur_reach, compare_blur_methods,
+                      format_blur_report, gaussian_sigma)
+from src.converter import ImageToSketchConverter
+
+@pytest.fixture
+def smooth_image():
+    """Create a smooth grayscale test image."""
+    rng = np.random.default_rng(0)
+    coarse = rng.integers(0, 256, (12, 16), dtype=np.uint8)
+    return cv2.resize(coarse, (320, 240), interpolation=cv2.INTER_CUBIC)
+
+def test_gaussian_sigma_matches_opencv():
+    """Test that gaussian_sigma reproduces OpenCV's kernel sigma."""
+    for ksize in [9, 21, 51]:
+        expected = cv2.getGaussianKernel(ksize, 0)
+        actual = cv2.getGaussianKernel(ksize, gaussian_sigma(ksize))
+        assert np.allclose(expected, actual, atol=1e-2)
+
+@pytest.mark.parametrize("method", ["pyramid", "box"])
+@pytest.mark.parametrize("ksize", [21, 51, 101])
+def test_approximate_blurs_are_close(smooth_image, method, ksize):
+    """Test that the approximations stay within a few levels of the exact blur."""
+    exact = blur(smooth_image, ksize)
+    approx = blur(smooth_image, ksize, method)
+    
+    error = np.abs(exact.astype(int) - approx.astype(int))
+    assert approx.shape == exact.shape
+    assert error.mean() < 1.5
+    assert error.max() <= 10
+
+def test_blur_reach_grows_with_kernel():
+    """Test that every method reports at least the exact kernel radius."""
+    for method in BLUR_METHODS:
+        assert blur_reach(101, method) >= blur_reach(21, method)
+    assert blur_reach(21) == 10
+
+def test_invalid_blur_method():
+    """Test that unknown blur methods are rejected."""
+    with pytest.raises(ValueError, match="Unsupported blur method"):
+        ImageToSketchConverter(blur_method="median")
+
+@pytest.mark.parametrize("method", ["pyramid", "box"])
+def test_tiled_conversion_with_approximate_blur(smooth_image, tmp_path, method):
+    """Test that strips stay seam-free with the approximate blurs."""
+    converter = ImageToSketchConverter(blur_kernel_size=51, blur_method=method)
+    output_path = tmp_path / "tiled.png"
+    
+    converter.convert_tiled(smooth_image, str(output_path), strip_height=37)
+    
+    expected = converter.convert_array(smooth_image)
+    assert np.array_equal(cv2.imread(str(output_path), cv2.IMREAD_UNCHANGED), expected)
+
+def test_compare_blur_methods_report(smooth_image):
+    """Test the accuracy-vs-speed report."""
+    rows = compare_blur_methods(smooth_image, kernel_sizes=(21,), repeat=1)
+    
+    assert [row['method'] for row in rows] == list(BLUR_METHODS)
+    assert rows[0]['max_error'] == 0
+    assert rows[0]['speedup'] == 1.0
+    assert "pyramid" in format_blur_report(rows)
@@ -0,0 +1,101 @@
+import pytest
+import cv2
+import numpy as np
+from pathlib import Path
+from src.cache import SketchCache
+from src.converter import ImageToSketchConverter
+
+@pytest.fixture
+def sample_image(tmp_path):
+    """Create a sample test image."""
+    img = np.ones((100, 100, 3), dtype=np.uint8) * 255
+    cv2.circle(img, (50, 50), 30, (0, 0, 255), -1)
+    
+    image_path = tmp_path / "test_image.jpg"
+    cv2.imwrite(str(image_path), img)
+    return str(image_path)
+
+def test_cache_key_depends_on_content_and_params():
+    """Test that keys change with either the data or the parameters."""
+    key = SketchCache.make_key(b"image", {"blur_kernel_size": 21})
+    
+    assert key == SketchCache.make_key(b"image", {"blur_kernel_size": 21})
+    assert key != SketchCache.make_key(b"other", {"blur_kernel_size": 21})
+    assert key != SketchCache.make_key(b"image", {"blur_kernel_size": 23})
+
+def test_memory_tier_lru_budget():
+    """Test that the memory tier evicts least recently used entries."""
+    cache = SketchCache(memory_bytes=250)
+    for name in ["a", "b"]:
+        cache.put(name, np.zeros((10, 10), dtype=np.uint8))
+    
+    assert cache.get("a") is not None  # "a" is now the most recent entry
+    cache.put("c", np.zeros((10, 10), dtype=np.uint8))
+    
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+def test_disk_tier_eviction(tmp_path):
+    """Test that the disk tier stays within its size budget."""
+    cache = SketchCache(memory_bytes=0, cache_dir=str(tmp_path / "cache"), disk_bytes=2500)
+    rng = np.random.default_rng(0)
+    for i in range(5):
+        cache.put(f"{i:02d}key", rng.integers(0, 256, (30, 30), dtype=np.uint8))
+    
+    files = list((tmp_path / "cache").glob("*/*.png"))
+    assert sum(path.stat().st_size for path in files) <= 2500
+    assert cache.get("04key") is not None
+
+def test_disk_tier_overwrite_keeps_budget(tmp_path, monkeypatch):
+    """Test that rewriting a key counts only its size difference against the budget."""
+    cache = SketchCache(memory_bytes=0, cache_dir=str(tmp_path / "cache"), disk_bytes=2500)
+    cache.put("00key", np.zeros((4, 4), dtype=np.uint8), b"x" * 1000)
+    cache.put("01key", np.zeros((4, 4), dtype=np.uint8), b"y" * 500)
+    monkeypatch.setattr(cache, "_evict_disk", lambda: pytest.fail("evicted within budget"))
+    
+    for size in (1000, 1200, 900):
+        cache.put("00key", np.zeros((4, 4), dtype=np.uint8), b"x" * size)
+    
+    assert cache._disk_used == 1400
+    assert cache._disk_used == sum(path.stat().st_size
+                                   for path in (tmp_path / "cache").glob("*/*.png"))
+
+def test_convert_uses_cache(sample_image, tmp_path, monkeypatch):
+    """Test that a cache hit skips decoding and computation."""
+    cache = SketchCache(cache_dir=str(tmp_path / "cache"))
+    converter = ImageToSketchConverter(cache=cache)
+    first_output = tmp_path / "first.png"
+    second_output = tmp_path / "second.png"
+    
+    expected = converter.convert(sample_image, str(first_output))
+    assert cache.misses == 1
+    
+    # A fresh converter sharing only the disk tier must not decode or compute
+    monkeypatch.setattr(ImageToSketchConverter, "convert_array", None)
+    fresh = ImageToSketchConverter(cache=SketchCache(cache_dir=str(tmp_path / "cache")))
+    sketch = fresh.convert(sample_image, str(second_output))
+    
+    assert np.array_equal(sketch, expected)
+    assert fresh.cache.hits == 1
+    assert second_output.read_bytes() == first_output.read_bytes()
+
+def test_cache_respects_parameters(sample_image):
+    """Test that different converter settings do not share results."""
+    cache = SketchCache()
+    ImageToSketchConverter(blur_kernel_size=21, cache=cache).convert(sample_image, save=False)
+    ImageToSketchConverter(blur_kernel_size=31, cache=cache).convert(sample_image, save=False)
+    
+    assert cache.misses == 2
+    assert cache.hits == 0
+
+def test_convert_bytes_uses_cache(sample_image):
+    """Test that convert_bytes serves repeated requests from the cache."""
+    converter = ImageToSketchConverter(cache=SketchCache())
+    data = Path(sample_image).read_bytes()
+    
+    first = converter.convert_bytes(data)
+    second = converter.convert_bytes(data)
+    
+    assert first == second
+    assert converter.cache.hits == 1
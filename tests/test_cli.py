@@ -81,4 +81,227 @@ def test_cli_with_custom_parameters(sample_image, tmp_path):
     
     assert result.returncode == 0
     assert output_path.exists()
-    assert "processing" in result.stdout.lower()
\ No newline at end of file
+    assert "processing" in result.stdout.lower()
+
+def test_cli_directory_batch(sample_image, tmp_path):
+    """Test recursive directory input mirrored into --output-dir."""
+    source_dir = tmp_path / "photos"
+    (source_dir / "nested").mkdir(parents=True)
+    for name in ["a.jpg", "nested/b.jpg"]:
+        (source_dir / name).write_bytes(Path(sample_image).read_bytes())
+    output_dir = tmp_path / "sketches"
+    
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "src.cli",
+            str(source_dir), "-r",
+            "--output-dir", str(output_dir),
+            "-j", "2"
+        ],
+        capture_output=True,
+        text=True
+    )
+    
+    assert result.returncode == 0
+    assert (output_dir / "a_sketch.png").exists()
+    assert (output_dir / "nested" / "b_sketch.png").exists()
+    assert "images/sec" in result.stdout
+    
+    # A second run with --skip-existing has nothing left to do
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "src.cli",
+            str(source_dir), "-r",
+            "--output-dir", str(output_dir),
+            "--skip-existing"
+        ],
+        capture_output=True,
+        text=True
+    )
+    
+    assert result.returncode == 0
+    assert "0 failed, 2 skipped" in result.stdout
+
+def test_cli_glob_and_filelist(sample_image, tmp_path):
+    """Test glob patterns and @filelist inputs."""
+    for name in ["one.jpg", "two.jpg"]:
+        (tmp_path / name).write_bytes(Path(sample_image).read_bytes())
+    filelist = tmp_path / "files.txt"
+    filelist.write_text(f"# inputs\n{sample_image}\n\n")
+    output_dir = tmp_path / "out"
+    
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "src.cli",
+            str(tmp_path / "*o.jpg"), f"@{filelist}",
+            "--output-dir", str(output_dir)
+        ],
+        capture_output=True,
+        text=True
+    )
+    
+    assert result.returncode == 0
+    assert sorted(p.name for p in output_dir.iterdir()) == [
+        "test_image_sketch.png", "two_sketch.png"
+    ]
+
+def test_cli_output_with_multiple_inputs(sample_image):
+    """Test that --output is rejected for multiple inputs."""
+    result = subprocess.run(
+        [sys.executable, "-m", "src.cli", sample_image, sample_image, "-o", "out.png"],
+        capture_output=True,
+        text=True
+    )
+    
+    assert result.returncode != 0
+    assert "--output-dir" in result.stderr
+
+def test_cli_cache_dir(sample_image, tmp_path):
+    """Test that a second run is served from --cache-dir."""
+    cache_dir = tmp_path / "cache"
+    
+    for name in ["first.png", "second.png"]:
+        result = subprocess.run(
+            [
+                sys.executable, "-m", "src.cli",
+                sample_image, "-o", str(tmp_path / name),
+                "--cache-dir", str(cache_dir), "-v"
+            ],
+            capture_output=True,
+            text=True
+        )
+        assert result.returncode == 0
+    
+    assert "1 hit(s)" in result.stdout
+    assert (tmp_path / "first.png").read_bytes() == (tmp_path / "second.png").read_bytes()
+
+def test_cli_output_format(sample_image, tmp_path):
+    """Test that --format and encoder options control the written files."""
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "src.cli",
+            sample_image, "--output-dir", str(tmp_path / "out"),
+            "--format", "jpg", "--jpeg-quality", "80"
+        ],
+        capture_output=True,
+        text=True
+    )
+    
+    assert result.returncode == 0
+    assert (tmp_path / "out" / "test_image_sketch.jpg").exists()
+    
+    result = subprocess.run(
+        [sys.executable, "-m", "src.cli", sample_image, "--jpeg-quality", "150"],
+        capture_output=True,
+        text=True
+    )
+    assert result.returncode == 1
+    assert "jpeg_quality" in result.stderr
+
+def test_cli_profile_and_metrics(sample_image, tmp_path):
+    """Test that --profile prints a stage breakdown and --metrics writes counters."""
+    metrics_path = tmp_path / "metrics.prom"
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "src.cli",
+            sample_image, "-o", str(tmp_path / "sketch.png"),
+            "--profile", "--metrics", str(metrics_path)
+        ],
+        capture_output=True,
+        text=True
+    )
+    
+    assert result.returncode == 0
+    assert "blur" in result.stdout and "share" in result.stdout
+    assert 'sketch_stage_seconds_total{stage="decode"}' in metrics_path.read_text()
+
+def test_cli_video(sample_image, tmp_path):
+    """Test that the video subcommand converts an image sequence into a video."""
+    for i in range(3):
+        cv2.imwrite(str(tmp_path / f"frame{i}.png"), cv2.imread(sample_image))
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "src.cli", "video",
+            str(tmp_path / "frame%d.png"), "-o", str(tmp_path / "sketch.avi"), "--incremental"
+        ],
+        capture_output=True,
+        text=True
+    )
+    
+    assert result.returncode == 0, result.stderr
+    assert "Converted 3 frame(s)" in result.stdout
+    assert (tmp_path / "sketch.avi").stat().st_size > 0
+
+def test_cli_input_named_like_subcommand(sample_image, tmp_path):
+    """Test that `--` converts an input named like a subcommand instead of running it."""
+    (tmp_path / "video").mkdir()
+    cv2.imwrite(str(tmp_path / "video" / "frame.png"), cv2.imread(sample_image))
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    result = subprocess.run([sys.executable, "-m", "src.cli", "--", "video"],
+                            capture_output=True, text=True, cwd=tmp_path, env=env)
+    
+    assert result.returncode == 0, result.stderr
+    assert (tmp_path / "video" / "frame_sketch.png").exists()
+    
+    result = subprocess.run([sys.executable, "-m", "src.cli", "video", "--help"],
+                            capture_output=True, text=True, cwd=tmp_path, env=env)
+    assert result.returncode == 0
+    assert "-- video" in result.stderr
+
+def test_cli_preset(sample_image, tmp_path):
+    """Test converting with a preset, overriding it and saving the result as a preset file."""
+    output_path = tmp_path / "sketch.png"
+    preset_path = tmp_path / "mine.json"
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "src.cli", sample_image, "-o", str(output_path),
+            "--preset", "colored-pencil", "-b", "11", "--save-preset", str(preset_path)
+        ],
+        capture_output=True,
+        text=True
+    )
+    
+    assert result.returncode == 0, result.stderr
+    assert cv2.imread(str(output_path), cv2.IMREAD_UNCHANGED).shape == (100, 100, 3)
+    assert '"blur_kernel_size": 11' in preset_path.read_text()
+    assert '"colored_pencil"' in preset_path.read_text()
+    
+    result = subprocess.run(
+        [sys.executable, "-m", "src.cli", sample_image, "--preset", "watercolor"],
+        capture_output=True,
+        text=True
+    )
+    assert result.returncode != 0
+    assert "Unknown preset" in result.stderr
+
+def test_cli_sysinfo_and_runtime_options(sample_image, tmp_path):
+    """Test the system report and converting with OpenCV runtime options."""
+    result = subprocess.run([sys.executable, "-m", "src.cli", "--sysinfo"],
+                            capture_output=True, text=True)
+    
+    assert result.returncode == 0, result.stderr
+    assert "parallel_framework" in result.stdout
+    assert "cpu_features" in result.stdout
+    
+    output_path = tmp_path / "sketch.png"
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "src.cli", sample_image, "-o", str(output_path),
+            "--threads", "2", "--umat", "--no-optimized"
+        ],
+        capture_output=True,
+        text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert output_path.exists()
+
+def test_startup_does_not_load_opencv():
+    """Test that importing the package and the CLI defers OpenCV and numpy until needed."""
+    code = ("import sys, src, src.cli, src.gui\n"
+            "print(sorted(name for name in ('cv2', 'numpy') if name in sys.modules))\n"
+            "src.ImageToSketchConverter\n"
+            "print('cv2' in sys.modules)\n")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["[]", "True"]
@@ -1,8 +1,13 @@
+import asyncio
 import pytest
 import cv2
 import numpy as np
 from pathlib import Path
-from src.converter import ImageToSketchConverter, convert_image_to_sketch
+from src.converter import ImageToSketchConverter, SketchPreview, convert_image_to_sketch
+from src.encoding import SketchEncoder
+from src.batch import BatchConversionError, ConversionResult
+from src.metrics import ConversionMetrics
+from src.utils import iter_image_files
 
 @pytest.fixture
 def sample_image(tmp_path):
@@ -96,4 +101,372 @@ def test_sketch_quality(sample_image, tmp_path):
     
     # Sketch should have values between 0 and 255
     assert sketch.min() >= 0
-    assert sketch.max() <= 255
\ No newline at end of file
+    assert sketch.max() <= 255
+
+def test_convert_without_saving(sample_image):
+    """Test that convert can skip writing the output file."""
+    converter = ImageToSketchConverter()
+    sketch = converter.convert(sample_image, save=False)
+    
+    input_path = Path(sample_image)
+    expected_path = input_path.parent / f"{input_path.stem}_sketch.png"
+    
+    assert sketch.shape == (100, 100)
+    assert not expected_path.exists()
+
+def test_convert_array_matches_convert(sample_image, tmp_path):
+    """Test that convert_array produces the same sketch as convert."""
+    converter = ImageToSketchConverter()
+    expected = converter.convert(sample_image, str(tmp_path / "test_sketch.png"))
+    
+    sketch = converter.convert_array(cv2.imread(sample_image))
+    
+    assert np.array_equal(sketch, expected)
+
+def test_convert_array_grayscale_and_alpha_input():
+    """Test that convert_array accepts grayscale and BGRA arrays."""
+    converter = ImageToSketchConverter()
+    bgr = np.full((40, 60, 3), 200, dtype=np.uint8)
+    
+    gray_sketch = converter.convert_array(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY))
+    bgra_sketch = converter.convert_array(cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA))
+    
+    assert gray_sketch.shape == (40, 60)
+    assert np.array_equal(gray_sketch, bgra_sketch)
+
+def test_convert_array_invalid_input():
+    """Test that convert_array rejects unsupported arrays."""
+    converter = ImageToSketchConverter()
+    
+    with pytest.raises(ValueError, match="Unsupported image"):
+        converter.convert_array(np.zeros((10, 10, 2), dtype=np.uint8))
+
+def test_convert_bytes(sample_image):
+    """Test that convert_bytes round-trips encoded images in memory."""
+    converter = ImageToSketchConverter()
+    data = Path(sample_image).read_bytes()
+    
+    encoded = converter.convert_bytes(data, "png")
+    sketch = cv2.imdecode(np.frombuffer(encoded, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    
+    assert encoded.startswith(b"\x89PNG")
+    assert np.array_equal(sketch, converter.convert_array(cv2.imread(sample_image)))
+
+def test_convert_bytes_invalid_data():
+    """Test that convert_bytes raises for undecodable data."""
+    converter = ImageToSketchConverter()
+    
+    with pytest.raises(ValueError, match="Could not decode"):
+        converter.convert_bytes(b"not an image")
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_convert_batch_parallel(sample_image, tmp_path, use_processes):
+    """Test that parallel batches produce the same outputs as sequential ones."""
+    converter = ImageToSketchConverter()
+    image_paths = []
+    for i in range(6):
+        temp_path = tmp_path / f"parallel_{i}.jpg"
+        temp_path.write_bytes(Path(sample_image).read_bytes())
+        image_paths.append(str(temp_path))
+    
+    results = converter.convert_batch(image_paths, str(tmp_path / "out"), workers=3,
+                                      use_processes=use_processes)
+    
+    assert list(results) == image_paths
+    expected = converter.convert(sample_image, save=False)
+    for output_path in results.values():
+        assert np.array_equal(cv2.imread(str(output_path), cv2.IMREAD_GRAYSCALE), expected)
+
+def test_convert_batch_collects_errors(sample_image, tmp_path):
+    """Test that one bad file does not abort the rest of the batch."""
+    converter = ImageToSketchConverter()
+    missing = str(tmp_path / "missing.jpg")
+    
+    with pytest.raises(BatchConversionError) as excinfo:
+        converter.convert_batch([missing, sample_image], str(tmp_path), workers=2)
+    
+    assert list(excinfo.value.results) == [sample_image]
+    assert isinstance(excinfo.value.errors[missing], FileNotFoundError)
+    
+    results = converter.convert_batch([missing, sample_image], str(tmp_path),
+                                      ordered=False, raise_on_error=False)
+    assert list(results) == [sample_image]
+
+def test_iter_convert_streams_results(sample_image, tmp_path):
+    """Test that iter_convert yields a record per image and reports progress."""
+    converter = ImageToSketchConverter()
+    source_dir = tmp_path / "source"
+    (source_dir / "nested").mkdir(parents=True)
+    for name in ["a.jpg", "nested/b.jpg"]:
+        (source_dir / name).write_bytes(Path(sample_image).read_bytes())
+    (source_dir / "notes.txt").write_text("not an image")
+    
+    calls = []
+    results = converter.iter_convert(
+        iter_image_files(str(source_dir)),
+        str(tmp_path / "out"),
+        progress=lambda result, completed, total: calls.append((completed, total))
+    )
+    
+    first = next(results)
+    assert isinstance(first, ConversionResult)
+    assert first.ok and first.elapsed >= 0
+    assert Path(first.output_path).exists()
+    assert calls == [(1, None)]
+    
+    rest = list(results)
+    assert [Path(r.input_path).name for r in [first] + rest] == ["a.jpg", "b.jpg"]
+    assert calls == [(1, None), (2, None)]
+
+def test_iter_convert_reports_errors(sample_image, tmp_path):
+    """Test that iter_convert yields failed images instead of raising."""
+    converter = ImageToSketchConverter()
+    missing = str(tmp_path / "missing.jpg")
+    
+    results = list(converter.iter_convert([missing, sample_image], str(tmp_path), workers=2))
+    
+    assert not results[0].ok
+    assert isinstance(results[0].error, FileNotFoundError)
+    assert results[1].ok
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_pipeline_batch_matches_sequential(sample_image, tmp_path, ordered):
+    """Test that the staged pipeline writes the same sketches and keeps errors per image."""
+    converter = ImageToSketchConverter()
+    image_paths = []
+    for i in range(8):
+        temp_path = tmp_path / f"staged_{i}.jpg"
+        temp_path.write_bytes(Path(sample_image).read_bytes())
+        image_paths.append(str(temp_path))
+    missing = str(tmp_path / "missing.jpg")
+    image_paths.insert(3, missing)
+    
+    results = list(converter.iter_convert(image_paths, str(tmp_path / "out"), workers=2,
+                                          ordered=ordered, pipeline=True, io_workers=3))
+    
+    if ordered:
+        assert [r.input_path for r in results] == image_paths
+    assert sorted(r.input_path for r in results) == sorted(image_paths)
+    expected = converter.convert(sample_image, save=False)
+    for result in results:
+        if result.input_path == missing:
+            assert isinstance(result.error, FileNotFoundError)
+            continue
+        assert result.ok
+        assert np.array_equal(cv2.imread(str(result.output_path), cv2.IMREAD_GRAYSCALE), expected)
+
+def test_pipeline_stops_early(sample_image, tmp_path):
+    """Test that abandoning a pipelined batch shuts the stages down."""
+    converter = ImageToSketchConverter()
+    results = converter.iter_convert([sample_image] * 50, str(tmp_path), pipeline=True)
+    assert next(results).ok
+    results.close()
+    
+    with pytest.raises(ValueError, match="cannot use processes"):
+        list(converter.iter_convert([sample_image], pipeline=True, use_processes=True))
+
+def test_async_batch(sample_image, tmp_path):
+    """Test the asyncio API of the staged pipeline."""
+    converter = ImageToSketchConverter()
+    missing = str(tmp_path / "missing.jpg")
+    
+    async def run():
+        streamed = [result async for result in converter.aiter_convert(
+            [sample_image, missing], str(tmp_path / "stream"))]
+        outputs = await converter.aconvert_batch([sample_image, missing], str(tmp_path / "batch"),
+                                                 raise_on_error=False)
+        return streamed, outputs
+    
+    streamed, outputs = asyncio.run(run())
+    
+    assert streamed[0].ok and not streamed[1].ok
+    assert list(outputs) == [sample_image]
+    assert Path(outputs[sample_image]).exists()
+
+@pytest.mark.parametrize("blur_kernel_size,blur_method", [(3, "exact"), (21, "exact"),
+                                                           (101, "exact"), (51, "box")])
+def test_convert_stack_matches_convert_array(blur_kernel_size, blur_method):
+    """Test that the stacked kernel matches per-image conversion exactly."""
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, size=(5, 40, 30, 3), dtype=np.uint8)
+    converter = ImageToSketchConverter(blur_kernel_size, blur_method=blur_method)
+    
+    stacked = converter.convert_stack(images, vectorize=True)
+    
+    assert stacked.shape == (5, 40, 30)
+    for image, sketch in zip(images, stacked):
+        assert np.array_equal(sketch, converter.convert_array(image))
+
+def test_convert_stack_falls_back_to_loop():
+    """Test that wide blur borders are converted one by one rather than stacked."""
+    rng = np.random.default_rng(3)
+    images = rng.integers(0, 256, size=(4, 32, 32, 3), dtype=np.uint8)
+    small = ImageToSketchConverter(3, metrics=ConversionMetrics())
+    large = ImageToSketchConverter(21, metrics=ConversionMetrics())
+    
+    small.convert_stack(images)
+    stacked = large.convert_stack(images)
+    
+    # A stack times each stage once, a loop once per image
+    assert small.metrics.to_dict()['stages']['blur']['calls'] == 1
+    assert large.metrics.to_dict()['stages']['blur']['calls'] == 4
+    np.testing.assert_array_equal(stacked, large.convert_stack(images, vectorize=True))
+
+def test_convert_stack_grayscale_and_out_buffer():
+    """Test stacks of grayscale images written to a caller-provided buffer."""
+    rng = np.random.default_rng(1)
+    images = rng.integers(0, 256, size=(3, 16, 16), dtype=np.uint8)
+    converter = ImageToSketchConverter()
+    out = np.empty((3, 16, 16), dtype=np.uint8)
+    
+    assert converter.convert_stack(images, out=out) is out
+    assert np.array_equal(out[2], converter.convert_array(images[2]))
+    
+    with pytest.raises(ValueError, match="Unsupported stack shape"):
+        converter.convert_stack(images[0, 0])
+
+def test_convert_arrays_mixed_sizes():
+    """Test that mixed-size batches are bucketed and returned in input order."""
+    rng = np.random.default_rng(2)
+    images = [rng.integers(0, 256, size=shape, dtype=np.uint8)
+              for shape in [(20, 30, 3), (10, 10, 3), (20, 30, 3), (10, 10), (20, 30, 3)]]
+    converter = ImageToSketchConverter()
+    
+    sketches = converter.convert_arrays(images, max_stack=2)
+    
+    assert len(sketches) == len(images)
+    for image, sketch in zip(images, sketches):
+        assert np.array_equal(sketch, converter.convert_array(image))
+
+def test_encoder_selects_output_format(sample_image, tmp_path):
+    """Test that the encoder decides default output paths and encoded bytes."""
+    converter = ImageToSketchConverter(encoder=SketchEncoder("webp", webp_lossless=True))
+    expected = converter.convert(sample_image, save=False)
+    
+    results = converter.convert_batch([sample_image], str(tmp_path / "webp"))
+    assert str(results[sample_image]).endswith("_sketch.webp")
+    assert np.array_equal(cv2.imread(str(results[sample_image]), cv2.IMREAD_GRAYSCALE), expected)
+    
+    # A per-batch encoder overrides the converter's
+    results = converter.convert_batch([sample_image], str(tmp_path / "jpg"),
+                                      encoder=SketchEncoder("jpg", jpeg_quality=90))
+    assert str(results[sample_image]).endswith("_sketch.jpg")
+    assert converter.encoder.format == ".webp"
+    
+    data = converter.convert_bytes(Path(sample_image).read_bytes())
+    assert data[:4] == b"RIFF"
+
+def test_max_dimension_scales_the_kernel(tmp_path):
+    """Test that capped conversions look like a shrunk full-resolution sketch."""
+    rng = np.random.default_rng(3)
+    image = cv2.GaussianBlur(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8), (9, 9), 0)
+    image_path = tmp_path / "large.png"
+    cv2.imwrite(str(image_path), image)
+    
+    converter = ImageToSketchConverter(blur_kernel_size=41, max_dimension=160)
+    preview = converter.convert(str(image_path), save=False)
+    assert preview.shape == (120, 160)
+    assert converter._sketch_params()["max_dimension"] == 160
+    
+    full = ImageToSketchConverter(blur_kernel_size=41).convert(str(image_path), save=False)
+    shrunk = cv2.resize(full, (160, 120), interpolation=cv2.INTER_AREA)
+    assert np.abs(preview.astype(int) - shrunk).mean() < 4
+    
+    encoded = converter.convert_bytes(image_path.read_bytes())
+    assert cv2.imdecode(np.frombuffer(encoded, np.uint8), cv2.IMREAD_GRAYSCALE).shape == (120, 160)
+    
+    output_path = converter.convert_tiled(str(image_path), str(tmp_path / "tiled.png"), strip_height=32)
+    assert np.array_equal(cv2.imread(output_path, cv2.IMREAD_GRAYSCALE), preview)
+    
+    with pytest.raises(ValueError, match="max_dimension"):
+        ImageToSketchConverter(max_dimension=0)
+
+def test_sketch_preview_matches_converter(tmp_path):
+    """Test that live previews render what a capped conversion would produce."""
+    rng = np.random.default_rng(5)
+    image = cv2.GaussianBlur(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8), (9, 9), 0)
+    image_path = tmp_path / "large.png"
+    cv2.imwrite(str(image_path), image)
+    
+    preview = SketchPreview.from_file(str(image_path), max_dimension=160)
+    assert preview.image.shape == (120, 160, 3)
+    assert preview.ratio == 0.25
+    
+    for kernel_size, scale, method in [(41, 256.0, "exact"), (41, 200.0, "exact"), (81, 256.0, "box")]:
+        expected = ImageToSketchConverter(kernel_size, scale, blur_method=method,
+                                          max_dimension=160).convert(str(image_path), save=False)
+        assert np.array_equal(preview.render(kernel_size, scale, method), expected)
+    
+    # Changing the scale reuses the cached blur
+    assert len(preview._divisors) == 2
+    
+    with pytest.raises(ValueError, match="odd"):
+        preview.render(20)
+
+def test_grayscale_decode_matches_color_decode(sample_image_gray, tmp_path):
+    """Test that grayscale, 16-bit and alpha inputs give the classic result."""
+    rng = np.random.default_rng(4)
+    color = cv2.GaussianBlur(rng.integers(0, 256, (60, 80, 3), dtype=np.uint8), (5, 5), 0)
+    inputs = {"gray.png": sample_image_gray}
+    for name, image in [("deep.png", color.astype(np.uint16) * 257),
+                        ("deep_gray.png", cv2.cvtColor(color, cv2.COLOR_BGR2GRAY).astype(np.uint16) * 257),
+                        ("alpha.png", cv2.cvtColor(color, cv2.COLOR_BGR2BGRA)),
+                        ("deep.tif", color.astype(np.uint16) * 257)]:
+        inputs[name] = str(tmp_path / name)
+        cv2.imwrite(inputs[name], image)
+    
+    converter = ImageToSketchConverter()
+    for name, image_path in inputs.items():
+        expected = _classic_sketch(cv2.imread(image_path, cv2.IMREAD_COLOR), 21, 256.0)
+        assert np.array_equal(converter.convert(image_path, save=False), expected), name
+    
+    # 16-bit arrays are reduced to 8 bits the same way
+    deep = cv2.imread(inputs["deep.png"], cv2.IMREAD_UNCHANGED)
+    assert deep.dtype == np.uint16
+    assert np.array_equal(converter.convert_array(deep),
+                          converter.convert(inputs["deep.png"], save=False))
+
+def test_inexact_mode_decodes_color_inputs_as_grayscale(sample_image):
+    """Test that exact=False reads color inputs straight to grayscale."""
+    converter = ImageToSketchConverter(exact=False)
+    gray = cv2.imread(sample_image, cv2.IMREAD_GRAYSCALE)
+    
+    assert np.array_equal(converter.convert(sample_image, save=False), converter.convert_array(gray))
+
+def _classic_sketch(image, blur_kernel_size, scale):
+    """Reference implementation with every intermediate allocated separately."""
+    gray_img = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    inverted = cv2.bitwise_not(gray_img)
+    blur = cv2.GaussianBlur(inverted, (blur_kernel_size, blur_kernel_size), 0)
+    inverted_blur = cv2.bitwise_not(blur)
+    return cv2.divide(gray_img, inverted_blur, scale=scale)
+
+@pytest.mark.parametrize("blur_kernel_size", [3, 21, 51])
+def test_fused_kernel_is_bit_identical(blur_kernel_size):
+    """Test that the buffer-reusing kernel matches the classic formulation exactly."""
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    converter = ImageToSketchConverter(blur_kernel_size=blur_kernel_size)
+    
+    expected = _classic_sketch(image, blur_kernel_size, 256.0)
+    first = converter.convert_array(image)
+    second = converter.convert_array(image)
+    
+    assert np.array_equal(first, expected)
+    assert np.array_equal(second, expected)
+    assert first is not second  # scratch buffers are never handed out
+
+def test_fused_kernel_out_buffer_and_inexact_mode():
+    """Test writing into a caller buffer and the inversion-free mode."""
+    rng = np.random.default_rng(1)
+    image = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    expected = _classic_sketch(image, 21, 256.0)
+    
+    out = np.empty((64, 64), dtype=np.uint8)
+    sketch = ImageToSketchConverter().convert_array(image, out=out)
+    assert sketch is out
+    assert np.array_equal(out, expected)
+    
+    fast = ImageToSketchConverter(exact=False).convert_array(image)
+    assert fast.shape == expected.shape
+    assert np.mean(fast != expected) < 0.01
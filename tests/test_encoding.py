@@ -0,0 +1,74 @@
+import pytest
+import cv2
+import numpy as np
+from src.converter import ImageToSketchConverter
+from src.encoding import SketchEncoder, compare_encoders, format_encoding_report
+
+@pytest.fixture
+def sketch():
+    """Create a smooth grayscale test image."""
+    x = np.linspace(0, 255, 64, dtype=np.float32)
+    return np.add.outer(x, x[::-1]).clip(0, 255).astype(np.uint8)
+
+def test_encoder_params():
+    """Test that each setting maps to the OpenCV flags of its own format."""
+    encoder = SketchEncoder("jpg", png_compression=1, png_strategy="rle", jpeg_quality=80,
+                            webp_lossless=True)
+    
+    assert encoder.format == ".jpg"
+    assert encoder.params(".png") == [cv2.IMWRITE_PNG_COMPRESSION, 1,
+                                      cv2.IMWRITE_PNG_STRATEGY, cv2.IMWRITE_PNG_STRATEGY_RLE]
+    assert encoder.params(".JPG") == [cv2.IMWRITE_JPEG_QUALITY, 80]
+    assert encoder.params(".webp") == [cv2.IMWRITE_WEBP_QUALITY, 101]
+    assert SketchEncoder().params(".png") == []
+
+def test_encoder_to_dict_omits_defaults():
+    """Test that default settings do not show up in cache keys or manifests."""
+    assert SketchEncoder().to_dict() == {}
+    assert SketchEncoder(".webp", webp_quality=90).to_dict() == {"format": ".webp", "webp_quality": 90}
+    
+    assert "encoding" not in ImageToSketchConverter()._sketch_params()
+    converter = ImageToSketchConverter(encoder=SketchEncoder(png_compression=0))
+    assert converter._sketch_params()["encoding"] == {"png_compression": 0}
+
+@pytest.mark.parametrize("kwargs,message", [
+    ({"format": "gif"}, "Unsupported output format"),
+    ({"png_compression": 10}, "png_compression"),
+    ({"png_strategy": "fastest"}, "Unsupported PNG strategy"),
+    ({"jpeg_quality": 101}, "jpeg_quality"),
+    ({"webp_quality": 0}, "webp_quality"),
+])
+def test_encoder_rejects_invalid_settings(kwargs, message):
+    """Test that out-of-range settings are rejected up front."""
+    with pytest.raises(ValueError, match=message):
+        SketchEncoder(**kwargs)
+
+@pytest.mark.parametrize("kwargs", [
+    {"format": ".png", "png_compression": 0},
+    {"format": ".png", "png_compression": 9, "png_strategy": "filtered"},
+    {"format": ".webp", "webp_lossless": True},
+])
+def test_lossless_settings_round_trip(sketch, kwargs):
+    """Test that lossless settings decode to the original pixels."""
+    data = SketchEncoder(**kwargs).encode(sketch)
+    decoded = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    
+    assert np.array_equal(decoded, sketch)
+
+def test_compression_level_trades_size(sketch):
+    """Test that a higher PNG level does not produce a larger file."""
+    fast = SketchEncoder(png_compression=0).encode(sketch)
+    small = SketchEncoder(png_compression=9).encode(sketch)
+    
+    assert len(small) < len(fast)
+
+def test_compare_encoders(sketch):
+    """Test the write-time vs file-size report."""
+    rows = compare_encoders(sketch, [{"format": ".png", "png_compression": 1},
+                                     {"format": ".jpg", "jpeg_quality": 50}], repeat=1)
+    
+    assert [row["settings"] for row in rows] == ["format=.png png_compression=1",
+                                                 "format=.jpg jpeg_quality=50"]
+    assert rows[0]["max_error"] == 0
+    assert all(row["bytes"] > 0 and row["seconds"] >= 0 for row in rows)
+    assert "size (KB)" in format_encoding_report(rows)
@@ -0,0 +1,103 @@
+import pytest
+import functools
+import queue
+import threading
+import cv2
+import numpy as np
+from src import gui
+from src.converter import ImageToSketchConverter
+from src.metrics import STAGES, ConversionMetrics
+
+class FakeVar:
+    """Stand-in for a Tk variable."""
+    def __init__(self):
+        self.value = None
+
+    def set(self, value):
+        self.value = value
+
+class FakeWidget(dict):
+    """Stand-in for a Tk widget: item access and configure() store options."""
+    def configure(self, **options):
+        self.update(options)
+
+class FakeRoot:
+    """Stand-in for the Tk root that records scheduled callbacks."""
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, callback, *args):
+        self.scheduled.append((callback,) + args)
+
+def make_gui():
+    """Create a SketchConverterGUI without a display, with just the state conversions use."""
+    app = gui.SketchConverterGUI.__new__(gui.SketchConverterGUI)
+    app.root = FakeRoot()
+    app.status = FakeVar()
+    app.progress = FakeWidget(value=0.0)
+    app.convert_button = FakeWidget(state="disabled")
+    app.cancel_button = FakeWidget(state="normal")
+    app.sketch_label = None
+    app.show_array = lambda sketch, label: None
+    app._events = queue.Queue()
+    app._cancel = threading.Event()
+    app._worker = object()
+    return app
+
+@pytest.mark.parametrize("preset", ['high-contrast', 'ink', 'colored-pencil'])
+def test_poll_worker_with_pipeline_stages(tmp_path, monkeypatch, preset):
+    """Test that stage events from a non-classic preset do not stop the poll loop."""
+    monkeypatch.setattr(gui.messagebox, "showinfo", lambda *args: None)
+    input_path = str(tmp_path / "input.png")
+    output_path = str(tmp_path / "sketch.png")
+    cv2.imwrite(input_path, np.random.default_rng(0).integers(0, 256, (40, 60, 3), dtype=np.uint8))
+    app = make_gui()
+    converter = ImageToSketchConverter.from_preset(
+        preset, metrics=ConversionMetrics(callback=functools.partial(app._on_stage, app._cancel, app._events)))
+    app._run_conversion(converter, input_path, output_path, app._events)
+    events = list(app._events.queue)
+    app._events.queue.clear()
+    assert {event[1] for event in events[:-1]} - set(STAGES)
+
+    # Stage events only update the status and keep the loop polling
+    for event in events[:-1]:
+        app._events.put(event)
+        app._poll_worker(app._events)
+        assert app.root.scheduled.pop() == (app._poll_worker, app._events)
+        assert app.status.value in set(gui.STAGE_STATUS.values()) | {gui.PIPELINE_STATUS}
+    assert app._worker is not None
+
+    app._events.put(events[-1])
+    app._poll_worker(app._events)
+    assert not app.root.scheduled
+    assert app._worker is None
+    assert app.convert_button['state'] == "normal"
+    assert app.cancel_button['state'] == "disabled"
+    assert app.status.value == "Saved sketch.png"
+
+def test_reset_ignores_superseded_job(monkeypatch):
+    """Test that a job abandoned by reset() cannot report into the reset window."""
+    monkeypatch.setattr(gui.messagebox, "showinfo", lambda *args: pytest.fail("stale result shown"))
+    app = make_gui()
+    for name in ["input_path", "output_path", "blur_kernel_size", "scale", "blur_method", "preset"]:
+        setattr(app, name, FakeVar())
+    app.original_label = FakeWidget()
+    app.sketch_label = FakeWidget()
+    cancel, events = app._cancel, app._events
+
+    app.reset()
+    assert cancel.is_set()
+    assert app._worker is None
+    assert app.convert_button['state'] == "normal"
+    assert app.status.value == "Ready"
+
+    # The abandoned worker stops at its next stage; whatever it still reports is dropped
+    with pytest.raises(gui.ConversionCancelled):
+        app._on_stage(cancel, events, 'blur', 0.0)
+    app._on_stage(cancel, events, 'write', 0.0)
+    events.put(('done', np.zeros((4, 4), np.uint8), "stale.png"))
+    app._poll_worker(events)
+    assert not app.root.scheduled
+    assert app._events.empty()
+    assert app.status.value == "Ready"
+    assert app.progress['value'] == 0.0
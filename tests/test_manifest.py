@@ -0,0 +1,115 @@
+import pytest
+import os
+import subprocess
+import sys
+import cv2
+import numpy as np
+from src.converter import ImageToSketchConverter
+from src import manifest as manifest_module
+from src.manifest import BatchManifest, file_hash
+
+@pytest.fixture
+def image_dir(tmp_path):
+    """Create a directory with a few test images."""
+    directory = tmp_path / "images"
+    directory.mkdir()
+    for i in range(3):
+        img = np.full((60, 60, 3), 40 * (i + 1), dtype=np.uint8)
+        cv2.circle(img, (30, 30), 15, (0, 0, 255), -1)
+        cv2.imwrite(str(directory / f"img_{i}.png"), img)
+    return directory
+
+def _image_paths(directory):
+    return sorted(str(path) for path in directory.glob("*.png") if "_sketch" not in path.name)
+
+def test_manifest_skips_unchanged_inputs(image_dir, tmp_path):
+    """Test that a rerun only converts new or changed images."""
+    converter = ImageToSketchConverter()
+    output_dir = tmp_path / "out"
+    manifest_path = tmp_path / "manifest.jsonl"
+    
+    with BatchManifest(str(manifest_path)) as manifest:
+        results = list(converter.iter_convert(_image_paths(image_dir), str(output_dir), manifest=manifest))
+    assert not any(result.skipped for result in results)
+    
+    # Change one image and only touch another
+    cv2.imwrite(str(image_dir / "img_0.png"), np.zeros((60, 60, 3), dtype=np.uint8))
+    os.utime(image_dir / "img_1.png", ns=(1, 1))
+    
+    with BatchManifest(str(manifest_path)) as manifest:
+        results = list(converter.iter_convert(_image_paths(image_dir), str(output_dir), manifest=manifest))
+        assert manifest.up_to_date == 2
+        assert manifest.recorded == 1
+    
+    assert [result.skipped for result in results] == [False, True, True]
+
+@pytest.mark.parametrize("pipeline", [False, True])
+def test_manifest_hashes_the_converted_bytes(image_dir, tmp_path, monkeypatch, pipeline):
+    """Test that recording hashes the bytes the converter read instead of reading again."""
+    paths = _image_paths(image_dir)
+    expected = {path: file_hash(path) for path in paths}
+    monkeypatch.setattr(manifest_module, "file_hash",
+                        lambda path: pytest.fail(f"{path} was read again"))
+    
+    with BatchManifest(str(tmp_path / "manifest.jsonl")) as manifest:
+        results = list(ImageToSketchConverter().iter_convert(paths, str(tmp_path / "out"),
+                                                             manifest=manifest, pipeline=pipeline))
+        entries = dict(manifest._entries)
+    
+    assert all(result.ok for result in results)
+    for path in paths:
+        entry = entries[os.path.abspath(path)]
+        assert entry['hash'] == expected[path]
+        assert entry['size'] == os.path.getsize(path)
+
+def test_manifest_tracks_parameters(image_dir, tmp_path):
+    """Test that changing converter settings invalidates recorded outputs."""
+    manifest_path = str(tmp_path / "manifest.jsonl")
+    
+    with BatchManifest(manifest_path) as manifest:
+        ImageToSketchConverter().convert_batch(_image_paths(image_dir), manifest=manifest)
+    
+    with BatchManifest(manifest_path) as manifest:
+        results = ImageToSketchConverter(blur_kernel_size=31).convert_batch(
+            _image_paths(image_dir), manifest=manifest)
+        assert manifest.up_to_date == 0
+    assert len(results) == 3
+
+def test_manifest_survives_interrupted_run(image_dir, tmp_path):
+    """Test that entries written before an interruption are kept."""
+    manifest_path = tmp_path / "manifest.jsonl"
+    converter = ImageToSketchConverter()
+    paths = _image_paths(image_dir)
+    
+    manifest = BatchManifest(str(manifest_path))
+    results = converter.iter_convert(paths, manifest=manifest)
+    next(results)
+    results.close()  # stop early without closing the manifest
+    
+    # Simulate a crash in the middle of writing a line
+    with open(manifest_path, "a") as f:
+        f.write('{"input": "trunc')
+    
+    with BatchManifest(str(manifest_path)) as manifest:
+        assert len(manifest) >= 1
+        results = list(converter.iter_convert(paths, manifest=manifest))
+        assert results[0].skipped
+    
+    with BatchManifest(str(manifest_path)) as manifest:
+        assert len(manifest) == 3
+
+def test_cli_manifest_resume(image_dir, tmp_path):
+    """Test the CLI resume summary."""
+    command = [
+        sys.executable, "-m", "src.cli", str(image_dir),
+        "--output-dir", str(tmp_path / "out"),
+        "--manifest", str(tmp_path / "manifest.jsonl")
+    ]
+    
+    first = subprocess.run(command, capture_output=True, text=True)
+    second = subprocess.run(command, capture_output=True, text=True)
+    
+    assert first.returncode == 0
+    assert second.returncode == 0
+    assert "3 image(s) already recorded" in second.stdout
+    assert "3 image(s) up to date, 0 newly recorded" in second.stdout
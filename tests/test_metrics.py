@@ -0,0 +1,93 @@
+import pytest
+import json
+import pickle
+import threading
+import cv2
+import numpy as np
+from pathlib import Path
+from src.converter import ImageToSketchConverter
+from src.metrics import STAGES, ConversionMetrics
+
+@pytest.fixture
+def image_path(tmp_path):
+    """Create a color test image."""
+    img = np.zeros((60, 80, 3), dtype=np.uint8)
+    cv2.circle(img, (40, 30), 20, (0, 128, 255), -1)
+    path = tmp_path / "input.jpg"
+    cv2.imwrite(str(path), img)
+    return str(path)
+
+def test_convert_times_every_stage(image_path, tmp_path):
+    """Test that convert() records each stage once and counts bytes and pixels."""
+    seen = []
+    metrics = ConversionMetrics(callback=lambda stage, seconds: seen.append(stage))
+    converter = ImageToSketchConverter(metrics=metrics)
+    output_path = tmp_path / "sketch.png"
+    
+    sketch = converter.convert(image_path, str(output_path))
+    snapshot = metrics.to_dict()
+    
+    assert list(snapshot['stages']) == list(STAGES)
+    assert all(stage['calls'] == 1 for stage in snapshot['stages'].values())
+    assert seen == list(STAGES)
+    assert snapshot['counters'] == {
+        'bytes_read': Path(image_path).stat().st_size,
+        'bytes_written': output_path.stat().st_size,
+        'pixels_processed': 60 * 80,
+        'images_processed': 1,
+    }
+    # Instrumentation does not change the result
+    assert (sketch == ImageToSketchConverter().convert(image_path, save=False)).all()
+    assert (cv2.imread(str(output_path), cv2.IMREAD_GRAYSCALE) == sketch).all()
+
+def test_metrics_are_shared_across_batch_threads(image_path, tmp_path):
+    """Test that counters add up when a batch runs in several threads."""
+    metrics = ConversionMetrics()
+    converter = ImageToSketchConverter(metrics=metrics)
+    
+    converter.convert_batch([(image_path, str(tmp_path / f"out_{i}.jpg")) for i in range(6)],
+                            workers=3, pipeline=True)
+    snapshot = metrics.to_dict()
+    
+    assert snapshot['counters']['images_processed'] == 6
+    assert snapshot['counters']['pixels_processed'] == 6 * 60 * 80
+    assert snapshot['stages']['encode']['calls'] == 6
+    
+    metrics.reset()
+    assert metrics.to_dict() == {'stages': {}, 'counters': dict.fromkeys(snapshot['counters'], 0)}
+
+def test_custom_stages_and_exports(tmp_path):
+    """Test user-timed stages and the JSON and Prometheus exports."""
+    metrics = ConversionMetrics()
+    with metrics.stage("upload"):
+        pass
+    metrics.record("decode", 0.5)
+    metrics.count("bytes_read", 1000)
+    
+    data = json.loads(metrics.to_json())
+    assert list(data['stages']) == ["decode", "upload"]
+    assert data['stages']['decode'] == {'calls': 1, 'seconds': 0.5}
+    
+    text = metrics.to_prometheus()
+    assert '# TYPE sketch_stage_seconds_total counter' in text
+    assert 'sketch_stage_seconds_total{stage="decode"} 0.500000' in text
+    assert 'sketch_stage_calls_total{stage="upload"} 1' in text
+    assert 'sketch_bytes_read_total 1000' in text
+    
+    metrics.write(tmp_path / "metrics.json")
+    metrics.write(tmp_path / "metrics.prom")
+    assert json.loads((tmp_path / "metrics.json").read_text()) == data
+    assert (tmp_path / "metrics.prom").read_text() == text
+    
+    profile = metrics.format_profile(elapsed=1.0)
+    assert "decode" in profile and "upload" in profile
+
+def test_metrics_survive_pickling():
+    """Test that metrics can be sent to worker processes."""
+    metrics = ConversionMetrics()
+    metrics.count("bytes_read", 5)
+    
+    copy = pickle.loads(pickle.dumps(metrics))
+    copy.count("bytes_read", 1)
+    assert copy.to_dict()['counters']['bytes_read'] == 6
+    assert isinstance(copy._lock, type(threading.Lock()))
@@ -0,0 +1,101 @@
+import pytest
+import json
+import pickle
+import cv2
+import numpy as np
+from src.converter import (
+    PRESETS,
+    ImageToSketchConverter,
+    SketchPipeline,
+    SketchPreview,
+    load_preset,
+)
+from src.options import PRESET_NAMES
+
+@pytest.fixture
+def image():
+    """Create a textured color test image."""
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (300, 90, 3), dtype=np.uint8), (0, 0), 2)
+    cv2.circle(img, (45, 150), 30, (0, 0, 255), -1)
+    return img
+
+def test_pipeline_validation():
+    """Test that bad stages fail when the pipeline is built."""
+    with pytest.raises(ValueError, match="Unknown stage"):
+        SketchPipeline([{'stage': 'watercolor'}])
+    with pytest.raises(ValueError, match="Unknown parameter"):
+        SketchPipeline([{'stage': 'edges', 'radius': 2}])
+    with pytest.raises(ValueError, match="ksize"):
+        SketchPipeline([{'stage': 'edges', 'ksize': 4}])
+    with pytest.raises(ValueError, match="gray stages first"):
+        SketchPipeline([{'stage': 'edges'}, {'stage': 'clahe'}])
+    with pytest.raises(ValueError, match="at most one color stage"):
+        SketchPipeline([{'stage': 'colored_pencil'}, {'stage': 'colored_pencil'}])
+
+    pipeline = SketchPipeline([{'stage': 'clahe'}, {'stage': 'edges', 'ksize': 5},
+                               {'stage': 'colored_pencil'}])
+    assert pipeline.channels == 3 and pipeline.reach is None and pipeline.has_gray_stages
+    assert SketchPipeline([{'stage': 'edges', 'ksize': 5}]).reach == 2
+
+def test_empty_pipeline_is_classic(image):
+    """Test that the classic preset gives exactly the plain sketch."""
+    classic = ImageToSketchConverter.from_preset('classic')
+    np.testing.assert_array_equal(classic.convert_array(image),
+                                  ImageToSketchConverter().convert_array(image))
+    assert "stages" not in classic._sketch_params()
+
+def test_preset_round_trip(tmp_path):
+    """Test saving a converter as a preset file and loading it back."""
+    converter = ImageToSketchConverter.from_preset('ink', blur_kernel_size=31)
+    path = tmp_path / "presets" / "ink.json"
+    converter.save_preset(str(path))
+
+    assert json.loads(path.read_text())['stages'] == [{'stage': 'edges', 'strength': 0.6, 'ksize': 3}]
+    loaded = ImageToSketchConverter.from_preset(str(path))
+    assert loaded.to_preset() == converter.to_preset()
+    assert pickle.loads(pickle.dumps(loaded.stages.stages[0])).config == {'strength': 0.6, 'ksize': 3}
+
+    assert tuple(PRESETS) == PRESET_NAMES
+    with pytest.raises(ValueError, match="Unknown preset"):
+        load_preset("no-such-preset")
+    with pytest.raises(ValueError, match="Unknown preset setting"):
+        load_preset({'blur': 21})
+
+@pytest.mark.parametrize("preset", PRESET_NAMES)
+def test_presets_convert(image, preset):
+    """Test that every built-in preset converts and gives its documented shape."""
+    converter = ImageToSketchConverter.from_preset(preset)
+    sketch = converter.convert_array(image)
+
+    assert sketch.dtype == np.uint8
+    assert sketch.shape == ((300, 90, 3) if preset == 'colored-pencil' else (300, 90))
+    stack = converter.convert_stack(np.stack([image, image]))
+    np.testing.assert_array_equal(stack[1], sketch)
+
+@pytest.mark.parametrize("preset", ['ink', 'textured-paper', 'colored-pencil'])
+@pytest.mark.parametrize("output_name", ["sketch.png", "sketch.npy"])
+def test_convert_tiled_with_stages(tmp_path, image, preset, output_name):
+    """Test that local stages give the same result in strips as in one piece."""
+    converter = ImageToSketchConverter.from_preset(preset)
+    output_path = converter.convert_tiled(image, str(tmp_path / output_name), strip_height=64)
+
+    if output_name.endswith(".npy"):
+        tiled = np.load(output_path)
+    else:
+        tiled = cv2.imread(output_path, cv2.IMREAD_UNCHANGED)
+    np.testing.assert_array_equal(tiled, converter.convert_array(image))
+
+def test_convert_tiled_rejects_global_stages(tmp_path, image):
+    """Test that CLAHE, which sees the whole image, is not converted in strips."""
+    converter = ImageToSketchConverter.from_preset('high-contrast')
+    with pytest.raises(ValueError, match="clahe"):
+        converter.convert_tiled(image, str(tmp_path / "sketch.png"))
+
+def test_preview_with_stages(image):
+    """Test that previews apply the stages like the converter."""
+    stages = [{'stage': 'clahe'}, {'stage': 'edges'}, {'stage': 'colored_pencil', 'amount': 0.8}]
+    preview = SketchPreview(image, stages=stages)
+    converter = ImageToSketchConverter(21, stages=stages)
+
+    np.testing.assert_array_equal(preview.render(21), converter.convert_array(image))
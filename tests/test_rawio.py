@@ -0,0 +1,90 @@
+import pytest
+import json
+import numpy as np
+from src.converter import ImageToSketchConverter
+from src.rawio import (
+    create_memmap,
+    is_mappable,
+    open_memmap,
+    open_raw,
+    read_sidecar,
+    release_rows,
+    sidecar_path,
+)
+
+@pytest.fixture
+def image():
+    """Create a textured color test image."""
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (300, 80, 3), dtype=np.uint8)
+
+def test_raw_sidecar_round_trip(tmp_path, image):
+    """Test that raw files are described by their sidecar."""
+    path = tmp_path / "image.raw"
+    mapped = create_memmap(path, image.shape)
+    mapped[:] = image
+    mapped.flush()
+
+    header = json.loads(sidecar_path(path).read_text())
+    assert header == {'shape': [300, 80, 3], 'dtype': '|u1', 'offset': 0}
+    assert read_sidecar(path)['shape'] == (300, 80, 3)
+    np.testing.assert_array_equal(open_memmap(path), image)
+    np.testing.assert_array_equal(open_raw(path, (300, 240), np.uint8), image.reshape(300, 240))
+
+    path.with_suffix(".bin").write_bytes(b"")
+    with pytest.raises(FileNotFoundError):
+        read_sidecar(path.with_suffix(".bin"))
+    with pytest.raises(ValueError):
+        open_memmap(tmp_path / "image.bin")
+
+def test_is_mappable():
+    """Test which formats are memory-mapped."""
+    assert is_mappable("a.raw") and is_mappable("a.NPY")
+    assert not is_mappable("a.png") and not is_mappable("a.jpg")
+
+def test_release_rows_keeps_data(tmp_path, image):
+    """Test that released rows of views and whole maps read back unchanged."""
+    path = tmp_path / "image.npy"
+    mapped = create_memmap(path, image.shape)
+    mapped[:] = image
+    release_rows(mapped, 0, 300)
+    release_rows(mapped[100:], 10, 150)
+    release_rows(image, 0, 300)
+
+    np.testing.assert_array_equal(mapped, image)
+    mapped.flush()
+    np.testing.assert_array_equal(np.load(path), image)
+
+@pytest.mark.parametrize("output_name", ["sketch.raw", "sketch.npy"])
+def test_convert_tiled_mapped_input_and_output(tmp_path, image, output_name):
+    """Test that mapped inputs and outputs give the same sketch as convert_array()."""
+    input_path = tmp_path / "image.raw"
+    create_memmap(input_path, image.shape)[:] = image
+    converter = ImageToSketchConverter(21)
+
+    output_path = converter.convert_tiled(str(input_path), str(tmp_path / output_name),
+                                          strip_height=64)
+
+    np.testing.assert_array_equal(open_memmap(output_path), converter.convert_array(image))
+
+def test_convert_tiled_rejects_float_input(tmp_path, image):
+    """Test that float scans fail up front with a clear error and no partial output."""
+    input_path = tmp_path / "scan.raw"
+    create_memmap(input_path, (300, 80), np.float32)[:] = image[:, :, 0] / 255
+    output_path = tmp_path / "sketch.png"
+
+    with pytest.raises(ValueError, match="float32 pixels: expected uint8 or uint16"):
+        ImageToSketchConverter(21).convert_tiled(str(input_path), str(output_path))
+    assert not output_path.exists()
+
+def test_convert_tiled_mapped_tiff(tmp_path, image):
+    """Test memory-mapped TIFF input and output with tifffile."""
+    tifffile = pytest.importorskip("tifffile")
+    input_path = tmp_path / "image.tif"
+    tifffile.imwrite(str(input_path), image)
+    converter = ImageToSketchConverter(21)
+
+    output_path = converter.convert_tiled(str(input_path), str(tmp_path / "sketch.tif"),
+                                          strip_height=64)
+
+    np.testing.assert_array_equal(tifffile.imread(output_path), converter.convert_array(image))
@@ -0,0 +1,122 @@
+import pytest
+import cv2
+import numpy as np
+from src.converter import ImageToSketchConverter
+from src.metrics import ConversionMetrics
+from src.runtime import (
+    configure_opencv,
+    format_system_info,
+    opencv_runtime,
+    opencv_settings,
+    pinned_threads,
+    pool_threads,
+    system_info,
+)
+
+@pytest.fixture(autouse=True)
+def restore_opencv():
+    """Restore OpenCV's process-wide settings after each test."""
+    previous = opencv_settings()
+    yield
+    configure_opencv(**previous)
+
+@pytest.fixture
+def image():
+    """Create a textured color test image."""
+    rng = np.random.default_rng(0)
+    return cv2.GaussianBlur(rng.integers(0, 256, (120, 160, 3), dtype=np.uint8), (0, 0), 2)
+
+def test_opencv_runtime_restores_settings():
+    """Test that settings apply inside the block and are restored after it."""
+    configure_opencv(threads=3, optimized=True)
+    with opencv_runtime(threads=2, optimized=False):
+        assert opencv_settings()['threads'] == 2
+        assert not cv2.useOptimized()
+    assert opencv_settings()['threads'] == 3
+    assert cv2.useOptimized()
+
+def test_pinned_threads_overlapping():
+    """Test that overlapping pins restore the setting from before the first one."""
+    configure_opencv(threads=8)
+    outer = pinned_threads(2)
+    outer.__enter__()
+    with pinned_threads(4):
+        assert cv2.getNumThreads() == 4
+    assert cv2.getNumThreads() == 4
+    outer.__exit__(None, None, None)
+    assert cv2.getNumThreads() == 8
+
+    assert pool_threads(4, 16) == 4
+    assert pool_threads(8, 4) == 1
+    assert pool_threads(1) >= 1
+
+def test_system_info():
+    """Test that the report covers versions, SIMD and threading."""
+    info = system_info()
+
+    assert info['opencv'] == cv2.__version__
+    assert info['parallel_framework']
+    assert isinstance(info['cpu_features'], list)
+    assert info['opencv_threads'] == cv2.getNumThreads()
+    assert "parallel_framework" in format_system_info(info)
+
+def test_converter_runtime_options_keep_output(image):
+    """Test that thread and UMat settings do not change the sketch."""
+    expected = ImageToSketchConverter(21).convert_array(image)
+
+    configure_opencv(threads=3)
+    converter = ImageToSketchConverter(21, threads=2, use_umat=True)
+    np.testing.assert_array_equal(converter.convert_array(image), expected)
+    np.testing.assert_array_equal(converter.convert_stack(image[None])[0], expected)
+    assert cv2.getNumThreads() == 2
+    inexact = ImageToSketchConverter(21, exact=False)
+    np.testing.assert_array_equal(ImageToSketchConverter(21, exact=False, use_umat=True)
+                                  .convert_array(image), inexact.convert_array(image))
+    with pytest.raises(ValueError, match="threads"):
+        ImageToSketchConverter(threads=0)
+
+def test_converter_threads_apply_once(image):
+    """Test that single calls set the threads once and multi-image runs restore them."""
+    configure_opencv(threads=3)
+    seen = []
+    metrics = ConversionMetrics(callback=lambda *args: seen.append(cv2.getNumThreads()))
+    converter = ImageToSketchConverter(21, threads=2, metrics=metrics)
+
+    # Process-wide and the last writer wins: the first call applies it for good
+    converter.convert_array(image)
+    assert set(seen) == {2} and cv2.getNumThreads() == 2
+    configure_opencv(threads=3)
+    seen.clear()
+    converter.convert_array(image)
+    assert set(seen) == {3}
+
+    seen.clear()
+    converter.convert_arrays([image, image[:60]])
+    assert set(seen) == {2} and cv2.getNumThreads() == 3
+
+    # Single calls inside a pinned run keep its setting
+    seen.clear()
+    with pinned_threads(4):
+        ImageToSketchConverter(21, threads=2, metrics=metrics).convert_bytes(
+            cv2.imencode(".png", image)[1].tobytes())
+    assert set(seen) == {4} and cv2.getNumThreads() == 3
+
+def test_batch_pins_threads(image, tmp_path):
+    """Test that worker pools share OpenCV's threads and restore them afterwards."""
+    paths = []
+    for i in range(4):
+        paths.append(str(tmp_path / f"image{i}.png"))
+        cv2.imwrite(paths[-1], image)
+    configure_opencv(threads=6)
+    seen = []
+    converter = ImageToSketchConverter(21, threads=8)
+
+    list(converter.iter_convert(paths, str(tmp_path / "out"), workers=2,
+                                progress=lambda *args: seen.append(cv2.getNumThreads())))
+
+    assert seen == [4, 4, 4, 4]
+    assert cv2.getNumThreads() == 6
+    unpinned = ImageToSketchConverter(21, pin_threads=False)
+    list(unpinned.iter_convert(paths, str(tmp_path / "out"), workers=2,
+                               progress=lambda *args: seen.append(cv2.getNumThreads())))
+    assert seen[4:] == [6, 6, 6, 6]
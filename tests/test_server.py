@@ -0,0 +1,132 @@
+import pytest
+import json
+import threading
+import urllib.error
+import urllib.request
+import cv2
+import numpy as np
+from src.converter import ImageToSketchConverter
+from src.server import SketchServer
+
+@pytest.fixture
+def image_bytes():
+    """Create an encoded color test image."""
+    img = np.zeros((60, 80, 3), dtype=np.uint8)
+    cv2.circle(img, (40, 30), 20, (0, 128, 255), -1)
+    return cv2.imencode(".jpg", img)[1].tobytes()
+
+@pytest.fixture
+def server():
+    """Run a server on a free port for the duration of a test."""
+    server = SketchServer(("127.0.0.1", 0), workers=2, queue_size=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+def request(server, path, data=None):
+    """Send a request and return (status, headers, body)."""
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=10) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+def test_sketch_endpoint_returns_encoded_sketch(server, image_bytes):
+    """Test that uploads are converted with the requested parameters."""
+    status, headers, body = request(server, "/sketch?blur_kernel_size=31&scale=200", image_bytes)
+    
+    assert status == 200
+    assert headers['Content-Type'] == "image/png"
+    assert body == ImageToSketchConverter(31, 200.0).convert_bytes(image_bytes)
+    
+    status, headers, body = request(server, "/sketch?format=jpg", image_bytes)
+    assert status == 200
+    assert headers['Content-Type'] == "image/jpeg"
+
+def test_invalid_requests_are_rejected(server, image_bytes):
+    """Test client errors for bad parameters, undecodable uploads and unknown paths."""
+    status, _, body = request(server, "/sketch?blur_kernel_size=20", image_bytes)
+    assert status == 400
+    assert "odd" in json.loads(body)['error']
+    
+    for query in ("blur_kernel_size=0", "blur_kernel_size=-3", "blur_kernel_size=100001",
+                  "blur_kernel_size=abc", "scale=0", "scale=nan", "max_dimension=-1"):
+        status, _, body = request(server, f"/sketch?{query}", image_bytes)
+        assert status == 400, query
+        assert query.split("=")[0] in json.loads(body)['error']
+    assert request(server, "/sketch?format=gif", image_bytes)[0] == 400
+    assert request(server, "/sketch", b"not an image")[0] == 400
+    assert request(server, "/other", image_bytes)[0] == 404
+
+def test_failed_warm_up_releases_resources(monkeypatch):
+    """Test that a failing warm-up stops the workers and closes the socket."""
+    def fail(self):
+        raise RuntimeError("warm-up failed")
+    closed = []
+    server_close = SketchServer.server_close
+    def record_close(self):
+        closed.append(self.socket)
+        server_close(self)
+    monkeypatch.setattr(SketchServer, "_warm_up", fail)
+    monkeypatch.setattr(SketchServer, "server_close", record_close)
+    before = set(threading.enumerate())
+    
+    with pytest.raises(RuntimeError, match="warm-up failed"):
+        SketchServer(("127.0.0.1", 0), workers=2)
+    
+    assert closed and closed[0].fileno() == -1
+    assert not [thread for thread in set(threading.enumerate()) - before
+                if thread.name.startswith("sketch-worker")]
+
+def test_full_queue_applies_backpressure(server, image_bytes):
+    """Test that uploads beyond the queue capacity get 503 instead of waiting."""
+    started = threading.Event()
+    release = threading.Event()
+    
+    class BlockingConverter:
+        def convert_bytes(self, data, format=None):
+            started.set()
+            release.wait(10)
+            return b""
+    
+    # Occupy both workers, then fill the queue
+    futures = [server.submit(BlockingConverter(), b"")]
+    started.wait(10)
+    futures.append(server.submit(BlockingConverter(), b""))
+    while server.queue_depth:
+        pass
+    futures += [server.submit(BlockingConverter(), b"") for _ in range(2)]
+    
+    status, headers, _ = request(server, "/sketch", image_bytes)
+    assert status == 503
+    assert headers['Retry-After'] == "1"
+    
+    release.set()
+    for future in futures:
+        future.result(10)
+    assert request(server, "/sketch", image_bytes)[0] == 200
+    assert server.stats['rejected'] == 1
+
+def test_health_and_metrics(server, image_bytes):
+    """Test the health endpoint and both metrics formats."""
+    request(server, "/sketch", image_bytes)
+    
+    status, _, body = request(server, "/healthz")
+    assert status == 200
+    assert json.loads(body) == {'status': 'ok', 'workers': 2, 'queue_depth': 0, 'queue_size': 2}
+    
+    status, headers, body = request(server, "/metrics")
+    text = body.decode()
+    assert status == 200
+    assert headers['Content-Type'].startswith("text/plain")
+    assert 'sketch_stage_seconds_total{stage="blur"}' in text
+    assert "sketch_server_converted_total 1" in text
+    assert "sketch_server_queue_size 2" in text
+    
+    data = json.loads(request(server, "/metrics?format=json")[2])
+    assert data['counters']['images_processed'] == 1
+    assert data['server']['requests'] == 1
@@ -0,0 +1,56 @@
+import pytest
+import cv2
+import numpy as np
+from src.converter import ImageToSketchConverter, SketchPreview
+from src.sweep import contact_sheet, sweep, sweep_image
+
+@pytest.fixture
+def image_path(tmp_path):
+    """Create a textured color test image."""
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (90, 120, 3), dtype=np.uint8), (0, 0), 2)
+    cv2.circle(img, (60, 45), 25, (0, 0, 255), -1)
+    path = tmp_path / "photo.png"
+    cv2.imwrite(str(path), img)
+    return str(path)
+
+def test_sweep_matches_individual_conversions(image_path):
+    """Test that every combination equals a conversion with those parameters."""
+    preview = SketchPreview.from_file(image_path, max_dimension=None)
+    preview.max_cached = 1
+    results = list(sweep(preview, [5, 21], [200.0, 256.0]))
+
+    assert [(k, s) for k, s, _ in results] == [(5, 200.0), (5, 256.0), (21, 200.0), (21, 256.0)]
+    for blur_kernel_size, scale, sketch in results:
+        expected = ImageToSketchConverter(blur_kernel_size, scale).convert(image_path, save=False)
+        np.testing.assert_array_equal(sketch, expected)
+    # One blur per kernel size, shared by its scales
+    assert len(preview._divisors) == 1
+
+def test_contact_sheet_layout():
+    """Test that cells are shrunk and placed in a kernel-by-scale grid."""
+    sketches = [(k, s, np.full((100, 200), 10 * i, dtype=np.uint8))
+                for i, (k, s) in enumerate([(5, 1.0), (5, 2.0), (9, 1.0), (9, 2.0)])]
+    sheet = contact_sheet(sketches, [5, 9], [1.0, 2.0], cell_size=50, padding=4)
+
+    assert sheet.ndim == 2
+    assert sheet.shape[1] == 2 * (50 + 4) + 4
+    assert sheet[4, 4] == 0 and sheet[4, 4 + 54] == 10
+    with pytest.raises(ValueError):
+        contact_sheet([], [5], [1.0])
+
+def test_sweep_image_writes_files_and_sheet(image_path, tmp_path):
+    """Test writing one file per combination and a contact sheet."""
+    paths = sweep_image(image_path, [5, 11], [256.0], output_dir=str(tmp_path / "sweep"),
+                        sheet_path=str(tmp_path / "sheet.png"), max_dimension=60)
+
+    assert sorted(paths) == [(5, 256.0), (11, 256.0)]
+    assert paths[11, 256.0].endswith("photo_b11_s256.png")
+    expected = ImageToSketchConverter(11, max_dimension=60).convert(image_path, save=False)
+    np.testing.assert_array_equal(cv2.imread(paths[11, 256.0], cv2.IMREAD_GRAYSCALE), expected)
+    assert cv2.imread(str(tmp_path / "sheet.png")) is not None
+
+    with pytest.raises(ValueError):
+        sweep_image(image_path, [5], [256.0])
+    with pytest.raises(ValueError, match="odd"):
+        sweep_image(image_path, [4], [256.0], output_dir=str(tmp_path))
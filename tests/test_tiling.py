@@ -0,0 +1,103 @@
+import pytest
+import cv2
+import numpy as np
+from src.converter import ImageToSketchConverter
+from src.encoding import SketchEncoder
+from src.tiling import plan_strips, open_strip_writer, PNGStripWriter
+
+@pytest.fixture
+def sample_array():
+    """Create a textured test image that exercises the blur at strip edges."""
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (237, 181, 3), dtype=np.uint8)
+    cv2.circle(img, (90, 120), 60, (0, 0, 255), -1)
+    return img
+
+def test_plan_strips_covers_image():
+    """Test that kept rows tile the image exactly once."""
+    strips = plan_strips(100, 30, 5)
+    
+    assert [(keep_start, keep_stop) for _, _, keep_start, keep_stop in strips] == [
+        (0, 30), (30, 60), (60, 90), (90, 100)
+    ]
+    assert strips[0][:2] == (0, 35)
+    assert strips[1][:2] == (25, 65)
+    assert strips[-1][:2] == (85, 100)
+
+@pytest.mark.parametrize("compression,strategy", [(6, "default"), (0, "default"), (1, "rle")])
+def test_png_strip_writer_round_trip(tmp_path, compression, strategy):
+    """Test that the streaming PNG writer produces a valid PNG."""
+    rng = np.random.default_rng(1)
+    image = rng.integers(0, 256, (50, 33), dtype=np.uint8)
+    output_path = tmp_path / "streamed.png"
+    
+    with PNGStripWriter(str(output_path), 33, 50, compression, strategy) as writer:
+        for start in range(0, 50, 7):
+            writer.write(image[start:start + 7])
+    
+    assert np.array_equal(cv2.imread(str(output_path), cv2.IMREAD_UNCHANGED), image)
+
+@pytest.mark.parametrize("encoder,expected", [
+    (None, (1, "rle")),
+    (SketchEncoder(), (1, "rle")),
+    (SketchEncoder(png_compression=6), (6, "default")),
+    (SketchEncoder(png_compression=6, png_strategy="rle"), (6, "rle")),
+    (SketchEncoder(png_compression=9, png_strategy="filtered"), (9, "filtered")),
+])
+def test_png_strip_writer_uses_opencv_defaults(tmp_path, encoder, expected):
+    """Test that unset PNG settings match cv2.imwrite's level 1 and RLE strategy."""
+    with open_strip_writer(str(tmp_path / "tiled.png"), 4, 2, encoder) as writer:
+        writer.write(np.zeros((2, 4), dtype=np.uint8))
+    
+    assert (writer.compression, writer.strategy) == expected
+
+@pytest.mark.parametrize("encoder", [SketchEncoder(), SketchEncoder(png_compression=6),
+                                     SketchEncoder(png_compression=9, png_strategy="filtered")])
+def test_tiled_png_matches_encoder_output(tmp_path, encoder):
+    """Test that tiled PNGs are compressed like SketchEncoder.write() with the same settings."""
+    # Repeated rows: the RLE strategy cannot match a whole previous row, the
+    # default one can, so the size shows which strategy was used
+    rng = np.random.default_rng(0)
+    image = np.repeat(rng.integers(0, 256, (1, 181, 3), dtype=np.uint8), 237, axis=0)
+    converter = ImageToSketchConverter(encoder=encoder)
+    tiled_path = converter.convert_tiled(image, str(tmp_path / "tiled.png"), strip_height=16)
+    sketch = converter.convert_array(image)
+    encoder.write(sketch, str(tmp_path / "written.png"))
+    
+    assert np.array_equal(cv2.imread(tiled_path, cv2.IMREAD_UNCHANGED), sketch)
+    tiled_size = (tmp_path / "tiled.png").stat().st_size
+    assert tiled_size == pytest.approx((tmp_path / "written.png").stat().st_size, rel=0.3)
+
+@pytest.mark.parametrize("blur_kernel_size,strip_height", [(3, 1), (21, 16), (51, 40), (21, 1000)])
+def test_convert_tiled_is_seam_free(sample_array, tmp_path, blur_kernel_size, strip_height):
+    """Test that strip-wise conversion matches a whole-image conversion."""
+    converter = ImageToSketchConverter(blur_kernel_size=blur_kernel_size)
+    output_path = tmp_path / "tiled.png"
+    
+    converter.convert_tiled(sample_array, str(output_path), strip_height=strip_height)
+    
+    expected = converter.convert_array(sample_array)
+    assert np.array_equal(cv2.imread(str(output_path), cv2.IMREAD_UNCHANGED), expected)
+
+def test_convert_tiled_from_path(tmp_path, sample_array):
+    """Test tiled conversion from a file with a non-streaming output format."""
+    input_path = tmp_path / "input.png"
+    cv2.imwrite(str(input_path), sample_array)
+    output_path = tmp_path / "tiled.bmp"
+    progress = []
+    
+    converter = ImageToSketchConverter()
+    result = converter.convert_tiled(str(input_path), str(output_path), strip_height=100,
+                                     progress=lambda done, total: progress.append((done, total)))
+    
+    assert result == str(output_path)
+    assert progress == [(100, 237), (200, 237), (237, 237)]
+    expected = converter.convert(str(input_path), save=False)
+    assert np.array_equal(cv2.imread(str(output_path), cv2.IMREAD_GRAYSCALE), expected)
+
+def test_convert_tiled_rejects_small_overlap(sample_array, tmp_path):
+    """Test that overlaps smaller than half the kernel are refused."""
+    converter = ImageToSketchConverter(blur_kernel_size=21)
+    
+    with pytest.raises(ValueError, match="overlap must be at least"):
+        converter.convert_tiled(sample_array, str(tmp_path / "out.png"), overlap=5)
@@ -2,10 +2,41 @@ import pytest
 import tempfile
 import os
 from pathlib import Path
-from src.utils import validate_image, create_output_path, display_images, get_image_info
+import cv2
+import numpy as np
+from src.utils import (validate_image, load_image, create_output_path, display_images,
+                       get_image_info, bucket_by_shape, read_image_size, decode_image_reduced,
+                       is_grayscale_encoded)
 
 # ... other tests ...
 
+def test_validate_image_rejects_bad_header(tmp_path):
+    """Test that validate_image rejects files without an image signature."""
+    fake_image = tmp_path / "fake.jpg"
+    fake_image.write_bytes(b"not really a jpeg")
+    
+    with pytest.raises(ValueError, match="File may be corrupted"):
+        validate_image(str(fake_image))
+
+def test_validate_image_missing_file():
+    """Test that validate_image raises for a missing file."""
+    with pytest.raises(FileNotFoundError):
+        validate_image("nonexistent.jpg")
+
+def test_load_image(sample_image):
+    """Test that load_image validates and decodes the image."""
+    image = load_image(sample_image)
+    
+    assert image.shape == (100, 100, 3)
+
+def test_load_image_truncated_body(tmp_path):
+    """Test that load_image fails when the header is valid but the data is not."""
+    truncated = tmp_path / "truncated.png"
+    truncated.write_bytes(b"\x89PNG\r\n\x1a\n" + b"\x00" * 16)
+    
+    with pytest.raises(ValueError, match="Could not read image"):
+        load_image(str(truncated))
+
 def test_create_output_path():
     """Test that create_output_path generates correct path."""
     input_path = "/path/to/image.jpg"
@@ -16,4 +47,61 @@ def test_create_output_path():
     
     # Test with custom suffix
     output_path_custom = create_output_path(input_path, "_pencil")
-    assert Path(output_path_custom) == Path("/path/to/image_pencil.png")
\ No newline at end of file
+    assert Path(output_path_custom) == Path("/path/to/image_pencil.png")
+
+def test_bucket_by_shape():
+    """Test that bucket_by_shape groups same-sized images and splits large groups."""
+    images = [np.full((4, 5), i, dtype=np.uint8) for i in range(5)]
+    images.insert(2, np.zeros((3, 3), dtype=np.uint8))
+    
+    buckets = bucket_by_shape(images, max_bucket=3)
+    
+    assert [indices for indices, _ in buckets] == [[0, 1, 3], [4, 5], [2]]
+    indices, stack = buckets[0]
+    assert stack.shape == (3, 4, 5)
+    assert [int(stack[i, 0, 0]) for i in range(3)] == [0, 1, 2]
+
+@pytest.mark.parametrize("extension", [".jpg", ".png", ".bmp"])
+def test_read_image_size(extension):
+    """Test that image dimensions are read from the header alone."""
+    image = np.zeros((30, 70, 3), dtype=np.uint8)
+    data = cv2.imencode(extension, image)[1].tobytes()
+    
+    assert read_image_size(data) == (70, 30)
+    assert read_image_size(data[:1024]) == (70, 30)
+    assert read_image_size(cv2.imencode(".tif", image)[1].tobytes()) is None
+
+@pytest.mark.parametrize("extension", [".jpg", ".png", ".tif"])
+def test_decode_image_reduced(extension):
+    """Test that reduced decoding caps the longest side and reports the ratio."""
+    image = np.full((400, 1000, 3), 128, dtype=np.uint8)
+    data = cv2.imencode(extension, image)[1].tobytes()
+    
+    reduced, ratio = decode_image_reduced(data, 120)
+    assert reduced.shape == (48, 120, 3)
+    assert ratio == pytest.approx(0.12)
+    
+    # Small images are left alone
+    full, ratio = decode_image_reduced(data, 2000)
+    assert full.shape == image.shape and ratio == 1.0
+
+def test_load_image_max_dimension(tmp_path):
+    """Test that load_image can decode at reduced resolution."""
+    image_path = tmp_path / "large.jpg"
+    cv2.imwrite(str(image_path), np.zeros((600, 800, 3), dtype=np.uint8))
+    
+    assert load_image(str(image_path), max_dimension=100).shape == (75, 100, 3)
+    assert load_image(str(image_path), cv2.IMREAD_GRAYSCALE, max_dimension=100).shape == (75, 100)
+
+@pytest.mark.parametrize("extension,image,expected", [
+    (".png", np.zeros((8, 8), dtype=np.uint8), True),
+    (".png", np.zeros((8, 8), dtype=np.uint16), True),
+    (".png", np.zeros((8, 8, 3), dtype=np.uint8), False),
+    (".png", np.zeros((8, 8, 4), dtype=np.uint8), False),
+    (".jpg", np.zeros((8, 8), dtype=np.uint8), True),
+    (".jpg", np.zeros((8, 8, 3), dtype=np.uint8), False),
+    (".bmp", np.zeros((8, 8), dtype=np.uint8), False),
+])
+def test_is_grayscale_encoded(extension, image, expected):
+    """Test that grayscale inputs are recognized from their header."""
+    assert is_grayscale_encoded(cv2.imencode(extension, image)[1].tobytes()) is expected
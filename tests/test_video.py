@@ -0,0 +1,95 @@
+import pytest
+import cv2
+import numpy as np
+from pathlib import Path
+from src.converter import ImageToSketchConverter
+from src.metrics import ConversionMetrics
+from src.video import ChangedRegionSketcher, convert_video
+
+def moving_frames(count=6, height=72, width=96):
+    """Create frames of a square moving over a textured background."""
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 2)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        cv2.rectangle(frame, (5 + i * 8, 20), (20 + i * 8, 35), (0, 0, 255), -1)
+        frames.append(frame)
+    return frames
+
+@pytest.fixture
+def frame_pattern(tmp_path):
+    """Write the moving frames as a lossless image sequence."""
+    for i, frame in enumerate(moving_frames()):
+        cv2.imwrite(str(tmp_path / f"frame{i:03d}.png"), frame)
+    return str(tmp_path / "frame%03d.png")
+
+@pytest.mark.parametrize("blur_method,blur_kernel_size", [("exact", 21), ("box", 31), ("pyramid", 51)])
+def test_changed_region_sketcher_matches_full_conversion(blur_method, blur_kernel_size):
+    """Test that recomputing changed regions gives the same sketches as full conversions."""
+    converter = ImageToSketchConverter(blur_kernel_size, blur_method=blur_method)
+    sketcher = ChangedRegionSketcher(converter, block_size=8)
+
+    for frame in moving_frames(height=120, width=160):
+        np.testing.assert_array_equal(sketcher.convert(frame), converter.convert_array(frame))
+
+    # An unchanged frame costs nothing
+    recomputed = sketcher.pixels_recomputed
+    sketcher.convert(frame)
+    assert sketcher.pixels_recomputed == recomputed
+    assert sketcher.recomputed < 1.0
+
+def test_convert_video_image_sequence(frame_pattern, tmp_path):
+    """Test converting an image sequence in parallel into numbered sketches."""
+    converter = ImageToSketchConverter(11)
+    done = []
+    result = converter.convert_video(frame_pattern, str(tmp_path / "out" / "%03d.png"), workers=3,
+                                     progress=done.append)
+
+    assert result.frames == 6
+    assert done == [1, 2, 3, 4, 5, 6]
+    for i, frame in enumerate(moving_frames()):
+        sketch = cv2.imread(str(tmp_path / "out" / f"{i:03d}.png"), cv2.IMREAD_GRAYSCALE)
+        np.testing.assert_array_equal(sketch, converter.convert_array(frame))
+
+def test_convert_video_incremental_to_video_file(frame_pattern, tmp_path):
+    """Test writing a video file in incremental mode with metrics."""
+    metrics = ConversionMetrics()
+    converter = ImageToSketchConverter(11, metrics=metrics)
+    output_path = tmp_path / "sketch.avi"
+
+    result = convert_video(converter, frame_pattern, str(output_path), incremental=True, max_frames=4)
+
+    assert result.frames == 4
+    assert result.recomputed < 1.0
+    assert result.fps > 0
+    capture = cv2.VideoCapture(str(output_path))
+    assert int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) == 4
+    ok, frame = capture.read()
+    capture.release()
+    assert ok and frame.shape[:2] == (72, 96)
+    assert metrics.to_dict()['counters']['bytes_written'] == output_path.stat().st_size
+
+def test_convert_video_errors(frame_pattern, tmp_path):
+    """Test missing inputs and unsupported outputs."""
+    converter = ImageToSketchConverter()
+
+    with pytest.raises(FileNotFoundError):
+        converter.convert_video(str(tmp_path / "missing.mp4"))
+    with pytest.raises(ValueError):
+        converter.convert_video(frame_pattern)
+    with pytest.raises(ValueError, match="Unsupported video format"):
+        converter.convert_video(frame_pattern, str(tmp_path / "out.xyz"))
+    assert not Path(tmp_path / "out.xyz").exists()
+
+def test_changed_region_sketcher_with_stages():
+    """Test that sketch and color stages run on every frame and gray stages are refused."""
+    converter = ImageToSketchConverter(11, stages=[{'stage': 'edges'},
+                                                   {'stage': 'colored_pencil', 'amount': 0.8}])
+    sketcher = ChangedRegionSketcher(converter, block_size=8)
+
+    for frame in moving_frames():
+        np.testing.assert_array_equal(sketcher.convert(frame), converter.convert_array(frame))
+    assert sketcher.recomputed < 1.0
+    with pytest.raises(ValueError, match="Gray stages"):
+        ChangedRegionSketcher(ImageToSketchConverter(stages=[{'stage': 'clahe'}]))